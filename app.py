@@ -3,7 +3,9 @@ Aplicación Flask principal
 """
 from flask import Flask, render_template, redirect, url_for, session, flash
 from config import Config
+from database import registrar_sesion_peticion
 import routes
+from models import Catalogo
 from auth import auth_bp
 from auth.auth_routes import requiere_autenticacion
 from auth.decorators import requiere_rol, solo_admin, solo_punto_venta, solo_recargas
@@ -11,6 +13,15 @@ from auth.decorators import requiere_rol, solo_admin, solo_punto_venta, solo_rec
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Una conexión y una transacción por petición a la API
+registrar_sesion_peticion(app)
+
+# Catálogo (productos, tipos y puntos de venta) en memoria desde el arranque del worker
+try:
+    Catalogo.precargar()
+except Exception as e:
+    print(f"No se pudo precargar el catálogo (se cargará en la primera consulta): {e}")
+
 # Registrar blueprint de autenticación
 app.register_blueprint(auth_bp)
 
@@ -107,6 +118,11 @@ def api_procesar_pago():
     """Procesar un pago con una tarjeta"""
     return routes.procesar_pago()
 
+@app.route('/api/tarjetas/pagar/lote', methods=['POST'])
+def api_procesar_pagos_lote():
+    """Procesar varios pagos en una sola transacción"""
+    return routes.procesar_pagos_lote()
+
 @app.route('/api/tarjetas/saldo/<numero_tarjeta>', methods=['GET'])
 def api_consultar_saldo(numero_tarjeta):
     """Consultar saldo de una tarjeta"""
@@ -158,11 +174,22 @@ def api_obtener_tipos_productos():
     """Obtener lista de tipos de productos"""
     return routes.obtener_tipos_productos()
 
+@app.route('/api/catalogo', methods=['GET'])
+def api_obtener_catalogo():
+    """Catálogo completo (productos, tipos y puntos de venta) con ETag"""
+    return routes.obtener_catalogo()
+
 @app.route('/api/productos', methods=['POST'])
 def api_crear_producto():
     """Crear un nuevo producto"""
     return routes.crear_producto()
 
+@app.route('/api/productos/lote', methods=['POST'])
+@solo_admin
+def api_importar_productos():
+    """Crear o actualizar varios productos (JSON o CSV) en una sola transacción"""
+    return routes.importar_productos()
+
 @app.route('/api/productos/<int:producto_id>', methods=['GET'])
 def api_obtener_producto(producto_id):
     """Obtener un producto por ID"""
@@ -206,6 +233,27 @@ def api_reporte_transacciones():
     """Obtener reporte de transacciones"""
     return routes.obtener_reporte_transacciones()
 
+@app.route('/api/reportes/transacciones/delta', methods=['GET'])
+def api_reporte_transacciones_delta():
+    """Obtener transacciones nuevas desde un id (sincronización incremental)"""
+    return routes.obtener_delta_transacciones()
+
+@app.route('/api/reportes/en-vivo', methods=['GET'])
+@solo_admin
+def api_reporte_en_vivo():
+    """Feed en vivo de pagos y recargas (Server-Sent Events)"""
+    return routes.transmitir_transacciones_en_vivo()
+
+# ============================================
+# RUTAS DE API - SISTEMA
+# ============================================
+
+@app.route('/api/sistema/estadisticas', methods=['GET'])
+@solo_admin
+def api_estadisticas_sistema():
+    """Estadísticas del pool de conexiones del worker actual"""
+    return routes.obtener_estadisticas_sistema()
+
 # ============================================
 # RUTAS DE API - PERFIL
 # ============================================
@@ -0,0 +1,166 @@
+"""
+Benchmark del formato de los reportes de transacciones en Python
+
+Compara el formato anterior (un diccionario por fila del cursor y una
+llamada a la función de formato por transacción) con ColumnasTransacciones
+sobre transacciones sintéticas. No necesita base de datos: mide solo el
+trabajo de CPU que hace el worker después de leer las filas.
+
+Uso:
+    python benchmarks/benchmark_motor_reportes.py
+    python benchmarks/benchmark_motor_reportes.py --filas 2000000 --repeticiones 5
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportes import COLUMNAS_CONSULTA, ColumnasTransacciones
+
+TAMANO_PAGINA = 100
+TAMANO_BLOQUE = 500
+COLUMNAS_CSV = [
+    'id', 'fecha_hora', 'tipo', 'monto', 'tarjeta_completa', 'asistente',
+    'punto_venta', 'estado', 'descripcion', 'saldo_anterior', 'saldo_nuevo'
+]
+
+def generar_filas(cantidad, semilla=1):
+    """Genera `cantidad` tuplas con la forma de Transaccion._consulta_transacciones"""
+    aleatorio = random.Random(semilla)
+    inicio = datetime(2026, 1, 1)
+    puntos_venta = [(1, 'Bar Principal'), (2, 'Comida'), (3, 'Tienda')]
+    filas = []
+    for i in range(cantidad, 0, -1):
+        tipo = 'pago' if aleatorio.random() < 0.8 else 'recarga'
+        monto = Decimal(aleatorio.randrange(500, 50000)) / 100
+        saldo_anterior = Decimal(aleatorio.randrange(0, 100000)) / 100
+        saldo_nuevo = saldo_anterior - monto if tipo == 'pago' else saldo_anterior + monto
+        pv_id, pv_nombre = aleatorio.choice(puntos_venta) if tipo == 'pago' else (None, None)
+        tarjeta = aleatorio.randrange(10000)
+        filas.append((
+            i, inicio + timedelta(seconds=i), tipo, monto, f'Venta #{i}' if tipo == 'pago' else None,
+            saldo_anterior, saldo_nuevo, f'TARJ-{tarjeta:06d}', f'Asistente {tarjeta}', tarjeta,
+            pv_id, pv_nombre
+        ))
+    return filas
+
+def formatear_por_fila(trans):
+    """Formato anterior del reporte: una transacción (diccionario) a la vez"""
+    numero_tarjeta = trans.get('numero_tarjeta', '')
+    ultimos_4 = numero_tarjeta[-4:] if len(numero_tarjeta) > 4 else numero_tarjeta
+    tipo_trans = trans.get('tipo', '')
+    monto = float(trans.get('monto', 0))
+    saldo_anterior = float(trans.get('saldo_anterior', 0))
+    saldo_nuevo = float(trans.get('saldo_nuevo', 0))
+    if tipo_trans == 'pago':
+        estado = 'exitosa' if saldo_anterior >= monto else 'saldo_insuficiente'
+    else:
+        estado = 'exitosa'
+    return {
+        'id': trans.get('id'),
+        'fecha_hora': trans.get('fecha_transaccion').strftime('%Y-%m-%d %H:%M:%S') if trans.get('fecha_transaccion') else None,
+        'tipo': tipo_trans,
+        'monto': monto,
+        'monto_formateado': f"${monto:.2f}",
+        'tarjeta_ultimos_4': ultimos_4,
+        'tarjeta_completa': numero_tarjeta,
+        'asistente': trans.get('asistente_nombre', 'N/A'),
+        'asistente_id': trans.get('asistente_id'),
+        'punto_venta': trans.get('punto_venta_nombre', 'N/A' if tipo_trans == 'pago' else None),
+        'punto_venta_id': trans.get('punto_venta_id'),
+        'usuario': 'Sistema',
+        'estado': estado,
+        'descripcion': trans.get('descripcion', ''),
+        'saldo_anterior': saldo_anterior,
+        'saldo_nuevo': saldo_nuevo
+    }
+
+def como_diccionarios(filas):
+    """Lo que entrega un cursor con dictionary=True"""
+    return [dict(zip(COLUMNAS_CONSULTA, fila)) for fila in filas]
+
+def reporte_por_fila(filas):
+    """Reporte completo anterior: formato de todas las filas y totales acumulados en Python"""
+    registros = [formatear_por_fila(trans) for trans in como_diccionarios(filas)]
+    totales = {'recarga': 0.0, 'pago': 0.0}
+    for registro in registros:
+        totales[registro['tipo']] += registro['monto']
+    return registros[:TAMANO_PAGINA]
+
+def pagina_por_columnas(filas):
+    """Reporte actual: la consulta trae limit + 1 filas y solo esa página se formatea"""
+    return ColumnasTransacciones(filas[:TAMANO_PAGINA + 1]).registros(0, TAMANO_PAGINA)
+
+def todas_por_columnas(filas):
+    """Formato por columnas de todas las filas (sin paginar)"""
+    return ColumnasTransacciones(filas).registros()
+
+def csv_por_fila(filas):
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=COLUMNAS_CSV, extrasaction='ignore')
+    escritor.writeheader()
+    for inicio in range(0, len(filas), TAMANO_BLOQUE):
+        for trans in como_diccionarios(filas[inicio:inicio + TAMANO_BLOQUE]):
+            escritor.writerow(formatear_por_fila(trans))
+        buffer.seek(0)
+        buffer.truncate()
+
+def csv_por_columnas(filas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUMNAS_CSV)
+    for inicio in range(0, len(filas), TAMANO_BLOQUE):
+        escritor.writerows(ColumnasTransacciones(filas[inicio:inicio + TAMANO_BLOQUE]).filas(COLUMNAS_CSV))
+        buffer.seek(0)
+        buffer.truncate()
+
+def medir(funcion, filas, repeticiones):
+    """Retorna el mejor tiempo (en segundos) de `repeticiones` ejecuciones"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(filas)
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+def verificar(filas):
+    """Comprueba que ambos formatos produzcan los mismos registros"""
+    muestra = filas[:2000]
+    esperado = [formatear_por_fila(trans) for trans in como_diccionarios(muestra)]
+    obtenido = ColumnasTransacciones(muestra).registros()
+    if esperado != obtenido:
+        raise SystemExit('[ERROR] El formato por columnas no coincide con el formato por fila')
+    print(f"[OK] Ambos formatos coinciden en {len(muestra)} registros")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark del formato de reportes por columnas')
+    parser.add_argument('--filas', type=int, default=1000000, help='Transacciones sintéticas (default: 1000000)')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Ejecuciones de cada caso (default: 3)')
+    args = parser.parse_args()
+
+    print(f"Generando {args.filas} transacciones sintéticas...")
+    filas = generar_filas(args.filas)
+    verificar(filas)
+    print("=" * 70)
+
+    casos = [
+        ('Reporte JSON', reporte_por_fila, pagina_por_columnas),
+        ('Formato de todas las filas', lambda f: [formatear_por_fila(t) for t in como_diccionarios(f)], todas_por_columnas),
+        ('Exportación CSV', csv_por_fila, csv_por_columnas),
+    ]
+    print(f"{'Caso':<30}{'Por fila':>12}{'Por columnas':>15}{'Mejora':>10}")
+    for nombre, anterior, actual in casos:
+        t_anterior = medir(anterior, filas, args.repeticiones)
+        t_actual = medir(actual, filas, args.repeticiones)
+        print(f"{nombre:<30}{t_anterior:>11.3f}s{t_actual:>14.3f}s{t_anterior / t_actual:>9.1f}x")
+    print("=" * 70)
+    print(f"Reporte JSON: antes se formateaban las {args.filas} filas para mostrar una página;")
+    print(f"ahora la consulta trae {TAMANO_PAGINA + 1} filas y solo esas se formatean.")
@@ -0,0 +1,211 @@
+"""
+Benchmark de las consultas de reportes sobre una tabla de transacciones grande
+
+Compara el filtrado anterior con DATE(fecha_transaccion) sin los índices
+compuestos contra el rango semiabierto actual con los índices de las migraciones.
+Trabaja sobre una base de datos aparte (por defecto <MYSQL_DATABASE>_benchmark)
+para no tocar los datos reales.
+
+Uso:
+    python benchmarks/benchmark_reportes.py
+    python benchmarks/benchmark_reportes.py --filas 5000000 --repeticiones 5 --conservar
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+INDICES_NUEVOS = 'idx_transacciones_tipo_fecha, idx_transacciones_pv_fecha, idx_transacciones_tarjeta_fecha'
+DIAS_EVENTO = 30
+TARJETAS = 10000
+
+# Cada consulta se ejecuta con el filtro anterior (DATE() e ignorando los
+# índices nuevos) y con el actual (rango semiabierto de Transaccion)
+CONSULTAS = {
+    'ventas de un día': """
+        SELECT t.id, t.fecha_transaccion, t.monto, tar.numero_tarjeta, a.nombre, pv.nombre
+        FROM transacciones t {indices}
+        JOIN tarjetas tar ON t.tarjeta_id = tar.id
+        JOIN asistentes a ON tar.asistente_id = a.id
+        LEFT JOIN puntos_venta pv ON t.punto_venta_id = pv.id
+        WHERE t.tipo = 'pago' {condiciones}
+        ORDER BY t.fecha_transaccion DESC
+    """,
+    'totales de una semana': """
+        SELECT COUNT(*), SUM(t.monto), AVG(t.monto)
+        FROM transacciones t {indices}
+        WHERE t.tipo = 'pago' {condiciones}
+    """,
+    'ventas por punto de venta de una semana': """
+        SELECT pv.id, pv.nombre, COUNT(*), SUM(t.monto)
+        FROM transacciones t {indices}
+        LEFT JOIN puntos_venta pv ON t.punto_venta_id = pv.id
+        WHERE t.tipo = 'pago' {condiciones}
+        GROUP BY pv.id, pv.nombre
+    """,
+    'transacciones de un punto de venta en un día': """
+        SELECT t.id, t.fecha_transaccion, t.tipo, t.monto
+        FROM transacciones t {indices}
+        WHERE 1=1 {condiciones}
+        ORDER BY t.fecha_transaccion DESC
+    """,
+}
+
+RANGOS = {
+    'ventas de un día': (0, None),
+    'totales de una semana': (6, None),
+    'ventas por punto de venta de una semana': (6, None),
+    'transacciones de un punto de venta en un día': (0, 2),
+}
+
+def poblar(cursor, connection, filas):
+    """Genera asistentes, tarjetas y `filas` transacciones repartidas en DIAS_EVENTO días"""
+    cursor.execute("SELECT COUNT(*) FROM transacciones")
+    existentes = cursor.fetchone()[0]
+    if existentes >= filas:
+        print(f"[OK] Reutilizando {existentes} transacciones existentes")
+        return
+
+    cursor.execute("SELECT COUNT(*) FROM tarjetas")
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany(
+            "INSERT INTO asistentes (nombre, email) VALUES (%s, %s)",
+            [(f'Asistente {i}', f'asistente{i}@benchmark.local') for i in range(TARJETAS)]
+        )
+        cursor.execute("""
+            INSERT INTO tarjetas (asistente_id, numero_tarjeta, saldo)
+            SELECT id, CONCAT('TARJ-', LPAD(id, 6, '0')), 100000 FROM asistentes
+        """)
+        connection.commit()
+
+    inicio_evento = date.today() - timedelta(days=DIAS_EVENTO)
+    cursor.execute("SELECT MIN(id), MAX(id) FROM tarjetas")
+    min_tarjeta, max_tarjeta = cursor.fetchone()
+    cursor.execute("SELECT MIN(id), MAX(id) FROM puntos_venta")
+    min_pv, max_pv = cursor.fetchone()
+
+    if existentes == 0:
+        cursor.execute(f"""
+            INSERT INTO transacciones
+                (tarjeta_id, punto_venta_id, tipo, monto, saldo_anterior, saldo_nuevo, fecha_transaccion, descripcion)
+            SELECT
+                {min_tarjeta} + FLOOR(RAND() * ({max_tarjeta} - {min_tarjeta} + 1)),
+                {min_pv} + FLOOR(RAND() * ({max_pv} - {min_pv} + 1)),
+                'pago', 50, 100, 50,
+                %s + INTERVAL FLOOR(RAND() * {DIAS_EVENTO * 86400}) SECOND,
+                'Benchmark'
+            FROM tarjetas
+        """, (inicio_evento,))
+        connection.commit()
+        existentes = cursor.rowcount
+
+    # Duplicar la tabla con fechas, tarjetas, puntos y tipos aleatorios hasta llegar a `filas`
+    while existentes < filas:
+        cursor.execute(f"""
+            INSERT INTO transacciones
+                (tarjeta_id, punto_venta_id, tipo, monto, saldo_anterior, saldo_nuevo, fecha_transaccion, descripcion)
+            SELECT
+                {min_tarjeta} + FLOOR(RAND() * ({max_tarjeta} - {min_tarjeta} + 1)),
+                IF(RAND() < 0.8, {min_pv} + FLOOR(RAND() * ({max_pv} - {min_pv} + 1)), NULL),
+                IF(RAND() < 0.8, 'pago', 'recarga'),
+                ROUND(10 + RAND() * 200, 2), 500, 400,
+                %s + INTERVAL FLOOR(RAND() * {DIAS_EVENTO * 86400}) SECOND,
+                descripcion
+            FROM transacciones
+            LIMIT %s
+        """, (inicio_evento, filas - existentes))
+        connection.commit()
+        existentes += cursor.rowcount
+        print(f"  ... {existentes} transacciones")
+
+    cursor.execute("ANALYZE TABLE transacciones")
+    cursor.fetchall()
+
+def condiciones_antes(fecha_inicio, fecha_fin, punto_venta_id):
+    """Filtro usado antes de los rangos semiabiertos"""
+    condiciones = " AND DATE(t.fecha_transaccion) >= %s AND DATE(t.fecha_transaccion) <= %s"
+    params = [fecha_inicio, fecha_fin]
+    if punto_venta_id:
+        condiciones += " AND t.punto_venta_id = %s"
+        params.append(punto_venta_id)
+    return condiciones, params
+
+def medir(cursor, sql, params, repeticiones):
+    """Retorna (mejor tiempo en ms, filas, plan de transacciones)"""
+    cursor.execute("EXPLAIN " + sql, params)
+    columnas = [c[0] for c in cursor.description]
+    plan = next(dict(zip(columnas, fila)) for fila in cursor.fetchall() if fila[columnas.index('table')] == 't')
+
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(sql, params)
+        filas = len(cursor.fetchall())
+        duracion = (time.perf_counter() - inicio) * 1000
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, filas, plan
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de las consultas de reportes')
+    parser.add_argument('--filas', type=int, default=3000000, help='Transacciones a generar (default: 3000000)')
+    parser.add_argument('--base', default=f'{Config.MYSQL_DATABASE}_benchmark', help='Base de datos del benchmark')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Ejecuciones por consulta (se toma la mejor)')
+    parser.add_argument('--conservar', action='store_true', help='No borrar la base de datos al terminar')
+    args = parser.parse_args()
+
+    if args.base == Config.MYSQL_DATABASE:
+        sys.exit("[ERROR] El benchmark no debe ejecutarse sobre la base de datos de la aplicación")
+
+    # La conexión del pool se crea con Config, así que basta con cambiar la base antes de usarlo
+    Config.MYSQL_DATABASE = args.base
+    from schema import init_database
+    from database import get_db_connection
+    from models import Transaccion
+
+    print(f"Preparando {args.filas} transacciones en {args.base}...")
+    print("=" * 50)
+    init_database()
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        poblar(cursor, connection, args.filas)
+        dia = date.today() - timedelta(days=DIAS_EVENTO // 2)
+        print("=" * 50)
+
+        for nombre, sql in CONSULTAS.items():
+            dias_atras, punto_venta_id = RANGOS[nombre]
+            fecha_inicio = (dia - timedelta(days=dias_atras)).isoformat()
+            fecha_fin = dia.isoformat()
+
+            condiciones, params = condiciones_antes(fecha_inicio, fecha_fin, punto_venta_id)
+            antes = medir(cursor, sql.format(indices=f'IGNORE INDEX ({INDICES_NUEVOS})', condiciones=condiciones),
+                          tuple(params), args.repeticiones)
+
+            condiciones, params = Transaccion._filtros_transacciones(fecha_inicio, fecha_fin, punto_venta_id)
+            despues = medir(cursor, sql.format(indices='', condiciones=condiciones),
+                            tuple(params), args.repeticiones)
+
+            print(f"{nombre} ({antes[1]} filas)")
+            for etiqueta, (ms, filas, plan) in (('antes', antes), ('después', despues)):
+                print(f"  {etiqueta:8} {ms:10.1f} ms   type={plan['type']} key={plan['key']} "
+                      f"rows={plan['rows']} extra={plan['Extra']}")
+            if antes[1] != despues[1]:
+                print(f"  [ERROR] Resultados distintos: {antes[1]} vs {despues[1]} filas")
+            print(f"  mejora: x{antes[0] / despues[0]:.1f}")
+    finally:
+        cursor.close()
+        connection.close()
+
+    if not args.conservar:
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        cursor.execute(f"DROP DATABASE {args.base}")
+        cursor.close()
+        connection.close()
+        print(f"[OK] Base de datos {args.base} eliminada")
+    print("=" * 50)
@@ -0,0 +1,348 @@
+"""
+Cachés en memoria del proceso (uno por worker de gunicorn)
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_FALTANTE = object()
+
+# Todos los cachés creados en el proceso (para las estadísticas del sistema)
+_caches = []
+
+class CacheLRU:
+    """
+    Caché LRU acotado y seguro para hilos, con expiración opcional
+
+    Args:
+        nombre (str): Nombre para identificar el caché en las estadísticas
+        max_entradas (int): Número máximo de entradas (se descartan las menos usadas)
+        ttl (float, optional): Segundos de vida de cada entrada (None = sin expiración)
+    """
+
+    def __init__(self, nombre, max_entradas=1024, ttl=None):
+        self.nombre = nombre
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._aciertos = 0
+        self._fallos = 0
+        self._descartes = 0
+        _caches.append(self)
+
+    def obtener(self, clave, predeterminado=None):
+        """
+        Retorna el valor guardado para la clave o `predeterminado` si no está o expiró
+        """
+        with self._lock:
+            entrada = self._datos.get(clave, _FALTANTE)
+            if entrada is not _FALTANTE:
+                valor, expira = entrada
+                if expira is None or expira > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self._aciertos += 1
+                    return valor
+                del self._datos[clave]
+            self._fallos += 1
+            return predeterminado
+
+    def poner(self, clave, valor, ttl=_FALTANTE):
+        """
+        Guarda un valor; `ttl` permite sobrescribir la expiración por defecto
+        """
+        with self._lock:
+            self._guardar(clave, valor, ttl)
+
+    def _guardar(self, clave, valor, ttl):
+        """Guarda una entrada (con el lock ya tomado)"""
+        ttl = self.ttl if ttl is _FALTANTE else ttl
+        expira = time.monotonic() + ttl if ttl is not None else None
+        self._datos[clave] = (valor, expira)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+            self._descartes += 1
+
+    def invalidar(self, clave):
+        """Elimina una entrada (si existe)"""
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        """Elimina todas las entradas"""
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        """
+        Retorna tamaño, aciertos, fallos, descartes y tasa de aciertos del caché
+        """
+        with self._lock:
+            consultas = self._aciertos + self._fallos
+            return {
+                'nombre': self.nombre,
+                'entradas': len(self._datos),
+                'max_entradas': self.max_entradas,
+                'aciertos': self._aciertos,
+                'fallos': self._fallos,
+                'descartes': self._descartes,
+                'tasa_aciertos': round(self._aciertos / consultas, 4) if consultas else 0.0
+            }
+
+class CacheReportes(CacheLRU):
+    """
+    Caché de resultados de reportes validado con una marca de agua del historial
+
+    Cada entrada guarda el mayor id de transacciones que existía al calcularla
+    y las generaciones de los `ambitos` de los que toma nombres (productos,
+    puntos de venta). Como las transacciones solo se agregan, el resultado
+    sigue siendo válido mientras ese id no cambie; los rangos de fechas ya
+    cerrados no reciben transacciones nuevas y no consultan la marca. Un
+    cambio de generación (p. ej. un producto renombrado) descarta la entrada
+    en ambos casos.
+
+    Args:
+        nombre (str): Nombre para identificar el caché en las estadísticas
+        max_entradas (int): Número máximo de resultados guardados
+        ttl_abierto (float): Segundos de vida de los resultados de rangos abiertos;
+            acota el caso de una transacción con id menor que se confirma tarde
+        ttl_cerrado (float): Segundos de vida de los resultados de rangos cerrados;
+            acota lo que se confirme tarde en el rango después de darlo por cerrado
+        ambitos (tuple): Ámbitos de invalidacion.py que invalidan los resultados
+        tabla: Tabla de generaciones (ver invalidacion.py); necesaria con `ambitos`
+    """
+
+    def __init__(self, nombre, max_entradas=128, ttl_abierto=300, ttl_cerrado=3600,
+                 ambitos=(), tabla=None):
+        super().__init__(nombre, max_entradas)
+        self.ttl_abierto = ttl_abierto
+        self.ttl_cerrado = ttl_cerrado
+        self.ambitos = tuple(ambitos)
+        self.tabla = tabla
+        self._obsoletas = 0
+
+    def _generaciones_actuales(self):
+        return tuple(self.tabla.generacion(ambito) for ambito in self.ambitos)
+
+    def obtener_o_calcular(self, clave, marca_agua, cerrado, calcular):
+        """
+        Retorna el resultado guardado si sigue vigente o lo calcula y lo guarda
+
+        Args:
+            clave (tuple): Filtros normalizados del reporte
+            marca_agua (callable): Retorna el mayor id actual de transacciones
+            cerrado (bool): El rango de fechas ya terminó (el resultado no cambia)
+            calcular (callable): Calcula el resultado del reporte
+        """
+        # Las generaciones se toman antes de calcular: si algo cambia durante
+        # el cálculo, la próxima consulta vuelve a calcular
+        generaciones = self._generaciones_actuales()
+        entrada = self.obtener(clave, _FALTANTE)
+        marca = None
+        if entrada is not _FALTANTE:
+            generaciones_guardadas, marca_guardada, valor = entrada
+            if generaciones == generaciones_guardadas:
+                if cerrado:
+                    return valor
+                marca = marca_agua()
+                if marca == marca_guardada:
+                    return valor
+            with self._lock:
+                # Se contó como acierto, pero hubo que recalcular
+                self._aciertos -= 1
+                self._fallos += 1
+                self._obsoletas += 1
+
+        if marca is None:
+            marca = marca_agua()
+        valor = calcular()
+        self.poner(clave, (generaciones, marca, valor),
+                   ttl=self.ttl_cerrado if cerrado else self.ttl_abierto)
+        return valor
+
+    def estadisticas(self):
+        datos = super().estadisticas()
+        with self._lock:
+            datos['obsoletas'] = self._obsoletas
+        return datos
+
+class CacheVersionado(CacheLRU):
+    """
+    Caché LRU que no guarda valores leídos antes de la última invalidación
+
+    Cada clave tiene un contador que aumenta al invalidarla. Quien lee de la
+    base de datos toma la versión antes de consultar y guarda con
+    poner_si_vigente: si mientras tanto otra petición modificó (e invalidó)
+    la clave, el valor leído puede estar desactualizado y se descarta.
+
+    Con `tabla` (ver invalidacion.py) los contadores se comparten entre
+    procesos: cada entrada recuerda la versión con la que se leyó y deja de
+    servirse en cuanto otro worker invalida la clave.
+    """
+
+    def __init__(self, nombre, max_entradas=1024, ttl=None, tabla=None):
+        super().__init__(nombre, max_entradas, ttl)
+        self.tabla = tabla
+        self._versiones = {}
+        self._rechazadas = 0
+        self._invalidadas = 0
+
+    def _version(self, clave):
+        """Versión actual de la clave (con el lock ya tomado)"""
+        if self.tabla is not None:
+            return self.tabla.generacion(self.nombre, clave)
+        return self._versiones.get(clave, 0)
+
+    def version(self, clave):
+        """Retorna la versión actual de la clave"""
+        with self._lock:
+            return self._version(clave)
+
+    def obtener(self, clave, predeterminado=None):
+        """
+        Retorna el valor guardado si no expiró ni se invalidó desde que se leyó
+        """
+        with self._lock:
+            entrada = self._datos.get(clave, _FALTANTE)
+            if entrada is not _FALTANTE:
+                (version, valor), expira = entrada
+                if expira is not None and expira <= time.monotonic():
+                    del self._datos[clave]
+                elif version != self._version(clave):
+                    # Invalidada por otro proceso
+                    del self._datos[clave]
+                    self._invalidadas += 1
+                else:
+                    self._datos.move_to_end(clave)
+                    self._aciertos += 1
+                    return valor
+            self._fallos += 1
+            return predeterminado
+
+    def poner(self, clave, valor, ttl=_FALTANTE):
+        with self._lock:
+            self._guardar(clave, (self._version(clave), valor), ttl)
+
+    def poner_si_vigente(self, clave, valor, version, ttl=_FALTANTE):
+        """
+        Guarda el valor solo si la clave no se invalidó desde `version`
+
+        Returns:
+            bool: True si se guardó
+        """
+        with self._lock:
+            if self._version(clave) != version:
+                self._rechazadas += 1
+                return False
+            self._guardar(clave, (version, valor), ttl)
+            return True
+
+    def invalidar(self, clave):
+        """Elimina la entrada y descarta las lecturas en curso de la clave"""
+        with self._lock:
+            if self.tabla is not None:
+                self.tabla.incrementar(self.nombre, clave)
+            else:
+                self._versiones[clave] = self._versiones.get(clave, 0) + 1
+            self._datos.pop(clave, None)
+
+    def estadisticas(self):
+        datos = super().estadisticas()
+        with self._lock:
+            datos['rechazadas'] = self._rechazadas
+            datos['invalidadas'] = self._invalidadas
+        return datos
+
+class CacheReferencia:
+    """
+    Datos de referencia (catálogos) cargados completos en memoria
+
+    Guarda un único valor, calculado por la función de carga, mientras no
+    cambie la generación de ninguno de los `ambitos` en la tabla de
+    invalidación (los modelos publican un cambio al confirmar cada escritura).
+
+    Args:
+        nombre (str): Nombre para identificar el caché en las estadísticas
+        ambitos (tuple): Ámbitos de invalidacion.py de los que depende el valor
+        tabla: Tabla de generaciones (ver invalidacion.py)
+    """
+
+    def __init__(self, nombre, ambitos, tabla):
+        self.nombre = nombre
+        self.ambitos = tuple(ambitos)
+        self.tabla = tabla
+        self._valor = _FALTANTE
+        self._generaciones = None
+        self._lock = threading.Lock()
+        # Una sola carga a la vez: los demás hilos esperan y usan su resultado
+        self._lock_carga = threading.Lock()
+        self._aciertos = 0
+        self._cargas = 0
+        _caches.append(self)
+
+    def _generaciones_actuales(self):
+        return tuple(self.tabla.generacion(ambito) for ambito in self.ambitos)
+
+    def _vigente(self, generaciones):
+        with self._lock:
+            if self._valor is not _FALTANTE and self._generaciones == generaciones:
+                self._aciertos += 1
+                return self._valor
+            return _FALTANTE
+
+    def obtener_o_cargar(self, cargar):
+        """
+        Retorna el valor guardado o lo vuelve a cargar si algún ámbito cambió
+
+        Args:
+            cargar (callable): Función sin argumentos que lee los datos de la base
+                y retorna (valor, guardar); con guardar=False el valor solo se
+                retorna (p. ej. se leyó en medio de una transacción)
+        """
+        valor = self._vigente(self._generaciones_actuales())
+        if valor is not _FALTANTE:
+            return valor
+        with self._lock_carga:
+            # Las generaciones se toman antes de leer: si algo cambia durante
+            # la carga, la próxima consulta vuelve a cargar
+            generaciones = self._generaciones_actuales()
+            valor = self._vigente(generaciones)
+            if valor is not _FALTANTE:
+                return valor
+            valor, guardar = cargar()
+            with self._lock:
+                if guardar:
+                    self._valor = valor
+                    self._generaciones = generaciones
+                self._cargas += 1
+            return valor
+
+    def limpiar(self):
+        """Descarta el valor (se vuelve a cargar en la próxima consulta)"""
+        with self._lock:
+            self._valor = _FALTANTE
+            self._generaciones = None
+
+    def estadisticas(self):
+        """
+        Retorna si hay un valor cargado, aciertos y cargas desde la base de datos
+        """
+        with self._lock:
+            total = self._aciertos + self._cargas
+            return {
+                'nombre': self.nombre,
+                'cargado': self._valor is not _FALTANTE,
+                'aciertos': self._aciertos,
+                'cargas': self._cargas,
+                'tasa_aciertos': round(self._aciertos / total, 4) if total else 0.0
+            }
+
+def obtener_estadisticas_caches():
+    """
+    Retorna las estadísticas de todos los cachés del proceso actual
+
+    Returns:
+        list: Estadísticas de cada caché
+    """
+    return [c.estadisticas() for c in _caches]
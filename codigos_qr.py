@@ -0,0 +1,107 @@
+"""
+Generación de los códigos QR de las tarjetas con caché
+
+El QR de una tarjeta depende solo de su número y de los parámetros de
+dibujo, así que cada imagen se identifica por un hash de ambos: ese hash es
+el ETag de la respuesta y el nombre del archivo en el almacén en disco
+(opcional, QR_CACHE_DIR), compartido por todos los workers y reinicios.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import qrcode
+import qrcode.image.svg
+from cache import CacheLRU
+from config import Config
+
+try:
+    from qrcode.image.pil import PilImage
+except ImportError:  # Sin Pillow solo se puede generar SVG
+    PilImage = None
+
+# Parámetros de dibujo; cambiarlos cambia la versión (y el hash) de todas las imágenes
+QR_BOX_SIZE = 10
+QR_BORDE = 4
+VERSION_RENDER = f'qr1-L-{QR_BOX_SIZE}-{QR_BORDE}'
+
+FORMATOS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+_cache = CacheLRU('qr', max_entradas=2048)
+
+def huella(contenido, formato):
+    """
+    Identificador del QR (hash del contenido, el formato y los parámetros de dibujo)
+    """
+    return hashlib.sha256(f'{VERSION_RENDER}:{formato}:{contenido}'.encode('utf-8')).hexdigest()
+
+def _dibujar(contenido, formato):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=QR_BOX_SIZE,
+        border=QR_BORDE,
+    )
+    qr.add_data(contenido)
+    qr.make(fit=True)
+
+    if formato == 'svg':
+        # SvgPathImage usa xml.etree: no necesita Pillow
+        return qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).to_string(encoding='unicode').encode('utf-8')
+
+    if PilImage is None:
+        raise RuntimeError('Pillow no está instalado: use formato=svg')
+    img = qr.make_image(image_factory=PilImage, fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def _ruta_disco(id_qr, formato):
+    return os.path.join(Config.QR_CACHE_DIR, id_qr[:2], f'{id_qr}.{formato}')
+
+def _leer_disco(id_qr, formato):
+    try:
+        with open(_ruta_disco(id_qr, formato), 'rb') as archivo:
+            return archivo.read()
+    except OSError:
+        return None
+
+def _guardar_disco(id_qr, formato, datos):
+    """Escribe el archivo de forma atómica (otro worker puede estar escribiendo el mismo)"""
+    ruta = _ruta_disco(id_qr, formato)
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as archivo:
+            archivo.write(datos)
+        os.replace(temporal, ruta)
+    except OSError as e:
+        print(f"No se pudo guardar el QR en {ruta}: {e}")
+
+def obtener_qr(contenido, formato='png'):
+    """
+    Retorna la imagen del QR, desde memoria, desde disco o dibujándola
+
+    Args:
+        contenido (str): Texto que codifica el QR (número de tarjeta)
+        formato (str): 'png' o 'svg'
+
+    Returns:
+        tuple: (huella, bytes de la imagen)
+    """
+    id_qr = huella(contenido, formato)
+    datos = _cache.obtener(id_qr)
+    if datos is not None:
+        return id_qr, datos
+
+    if Config.QR_CACHE_DIR:
+        datos = _leer_disco(id_qr, formato)
+    if datos is None:
+        datos = _dibujar(contenido, formato)
+        if Config.QR_CACHE_DIR:
+            _guardar_disco(id_qr, formato, datos)
+    _cache.poner(id_qr, datos)
+    return id_qr, datos
@@ -21,6 +21,23 @@ class Config:
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD') or os.environ.get('DATABASE_PASSWORD') or ''
     MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE') or os.environ.get('DATABASE_NAME') or 'tarjetas_evento'
     
+    # Pool de conexiones MySQL (uno por proceso / worker de gunicorn)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # segundos, 0 = nunca
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    
+    # Feed en vivo del dashboard (cada conexión ocupa un hilo del worker)
+    EVENTOS_MAX_SUSCRIPTORES = int(os.environ.get('EVENTOS_MAX_SUSCRIPTORES', 4))
+    
+    # Invalidación de cachés entre workers del mismo servidor (archivo en memoria compartida)
+    INVALIDACION_COMPARTIDA = os.environ.get('INVALIDACION_COMPARTIDA', 'True').lower() == 'true'
+    INVALIDACION_RUTA = os.environ.get('INVALIDACION_RUTA')  # default: run/ junto a la aplicación
+    
+    # Almacén en disco de los códigos QR generados (opcional, compartido por los workers)
+    QR_CACHE_DIR = os.environ.get('QR_CACHE_DIR')
+    
     # Configuración de la aplicación
     DEBUG = os.environ.get('FLASK_DEBUG', os.environ.get('DEBUG', 'False')).lower() == 'true'
     FLASK_ENV = os.environ.get('FLASK_ENV', 'development')
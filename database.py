@@ -1,26 +1,419 @@
 """
 Módulo para manejo de conexión a la base de datos MySQL
+Las conexiones se obtienen de un pool por proceso (un pool por worker de gunicorn)
+y, dentro de una petición a la API, se comparten en una única transacción
 """
+import os
+import threading
+import time
 import mysql.connector
 from mysql.connector import Error
+from flask import g, has_app_context, jsonify
 from config import Config
 
-def get_db_connection():
+class PoolAgotadoError(Error):
+    """Se lanza cuando no hay conexiones libres antes de que venza el timeout"""
+    pass
+
+class ConexionPool:
     """
-    Crea y retorna una conexión a la base de datos MySQL
-    
-    Returns:
-        mysql.connector.connection: Conexión a la base de datos
+    Envoltura de una conexión obtenida del pool
+
+    Se comporta igual que una conexión de mysql.connector, pero close()
+    la devuelve al pool en lugar de cerrar el socket.
     """
-    try:
-        connection = mysql.connector.connect(
+
+    def __init__(self, pool, conexion):
+        self._pool = pool
+        self._conexion = conexion
+        self._devuelta = False
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def close(self):
+        """Devuelve la conexión al pool (se puede llamar varias veces)"""
+        if not self._devuelta:
+            self._devuelta = True
+            self._pool._devolver(self._conexion)
+
+class PoolConexiones:
+    """
+    Pool de conexiones MySQL con validación, desborde y timeout de espera
+
+    Args:
+        tamano (int): Conexiones que se mantienen abiertas en reposo
+        max_desborde (int): Conexiones extra permitidas en picos (se cierran al devolverse)
+        timeout (float): Segundos máximos de espera por una conexión libre
+        reciclar (int): Segundos de vida de una conexión antes de reabrirla (0 = nunca)
+        pre_ping (bool): Validar la conexión con un ping antes de entregarla
+    """
+
+    def __init__(self, tamano=5, max_desborde=10, timeout=10, reciclar=1800, pre_ping=True):
+        self.tamano = tamano
+        self.max_desborde = max_desborde
+        self.timeout = timeout
+        self.reciclar = reciclar
+        self.pre_ping = pre_ping
+
+        self._condicion = threading.Condition()
+        self._inactivas = []  # Pila LIFO: se reutiliza primero la más reciente
+        self._creadas_en = {}
+        self._abiertas = 0
+        self._estadisticas = {
+            'prestamos': 0,
+            'conexiones_creadas': 0,
+            'conexiones_recicladas': 0,
+            'conexiones_descartadas': 0,
+            'esperas': 0,
+            'timeouts': 0,
+            'tiempo_espera_total': 0.0
+        }
+
+    def _crear_conexion(self):
+        conexion = mysql.connector.connect(
             host=Config.MYSQL_HOST,
             port=Config.MYSQL_PORT,
             user=Config.MYSQL_USER,
             password=Config.MYSQL_PASSWORD,
             database=Config.MYSQL_DATABASE
         )
-        return connection
+        # La conexión se abre fuera del lock; el registro se hace con él tomado
+        with self._condicion:
+            self._creadas_en[id(conexion)] = time.monotonic()
+            self._estadisticas['conexiones_creadas'] += 1
+        return conexion
+
+    def _cerrar(self, conexion):
+        with self._condicion:
+            self._creadas_en.pop(id(conexion), None)
+        try:
+            conexion.close()
+        except Error:
+            pass
+
+    def _es_valida(self, conexion):
+        """Verifica antigüedad y (opcionalmente) que el servidor responda"""
+        with self._condicion:
+            creada_en = self._creadas_en.get(id(conexion), 0)
+            if self.reciclar and time.monotonic() - creada_en > self.reciclar:
+                self._estadisticas['conexiones_recicladas'] += 1
+                return False
+        # El ping va fuera del lock para no bloquear a otros hilos
+        if self.pre_ping:
+            try:
+                conexion.ping(reconnect=False)
+            except Error:
+                with self._condicion:
+                    self._estadisticas['conexiones_descartadas'] += 1
+                return False
+        return True
+
+    def obtener(self):
+        """
+        Presta una conexión del pool
+
+        Returns:
+            ConexionPool: Conexión lista para usar (close() la devuelve)
+
+        Raises:
+            PoolAgotadoError: Si no hay conexiones libres antes del timeout
+        """
+        limite = time.monotonic() + self.timeout
+        espero = False
+        inicio = time.monotonic()
+
+        while True:
+            with self._condicion:
+                conexion = None
+                crear = False
+                while conexion is None and not crear:
+                    if self._inactivas:
+                        conexion = self._inactivas.pop()
+                    elif self._abiertas < self.tamano + self.max_desborde:
+                        self._abiertas += 1
+                        crear = True
+                    else:
+                        restante = limite - time.monotonic()
+                        if restante <= 0:
+                            self._estadisticas['timeouts'] += 1
+                            raise PoolAgotadoError(
+                                msg=f"No hay conexiones disponibles en el pool tras {self.timeout}s"
+                            )
+                        espero = True
+                        self._condicion.wait(restante)
+
+            # Crear o validar fuera del lock para no bloquear a otros hilos
+            if crear:
+                try:
+                    conexion = self._crear_conexion()
+                except Exception:
+                    with self._condicion:
+                        self._abiertas -= 1
+                        self._condicion.notify()
+                    raise
+            elif not self._es_valida(conexion):
+                self._cerrar(conexion)
+                with self._condicion:
+                    self._abiertas -= 1
+                continue
+
+            with self._condicion:
+                self._estadisticas['prestamos'] += 1
+                if espero:
+                    self._estadisticas['esperas'] += 1
+                    self._estadisticas['tiempo_espera_total'] += time.monotonic() - inicio
+            return ConexionPool(self, conexion)
+
+    def _devolver(self, conexion):
+        """Devuelve una conexión al pool descartando cualquier transacción abierta"""
+        try:
+            if conexion.in_transaction:
+                conexion.rollback()
+            reutilizable = conexion.is_connected()
+        except Error:
+            reutilizable = False
+
+        with self._condicion:
+            if reutilizable and len(self._inactivas) < self.tamano:
+                self._inactivas.append(conexion)
+                conexion = None
+            else:
+                self._abiertas -= 1
+                if not reutilizable:
+                    self._estadisticas['conexiones_descartadas'] += 1
+            self._condicion.notify()
+
+        if conexion is not None:
+            self._cerrar(conexion)
+
+    def estadisticas(self):
+        """
+        Obtiene las estadísticas actuales del pool
+
+        Returns:
+            dict: Tamaño, conexiones en uso/inactivas y contadores acumulados
+        """
+        with self._condicion:
+            inactivas = len(self._inactivas)
+            datos = dict(self._estadisticas)
+            datos.update({
+                'pid': os.getpid(),
+                'tamano': self.tamano,
+                'max_desborde': self.max_desborde,
+                'timeout': self.timeout,
+                'abiertas': self._abiertas,
+                'inactivas': inactivas,
+                'en_uso': self._abiertas - inactivas
+            })
+        datos['tiempo_espera_total'] = round(datos['tiempo_espera_total'], 4)
+        return datos
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def obtener_pool():
+    """
+    Retorna el pool del proceso actual, creándolo si es necesario
+
+    Se crea uno nuevo tras un fork (cada worker de gunicorn tiene el suyo),
+    porque los sockets heredados del proceso padre no se pueden compartir.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = PoolConexiones(
+                    tamano=Config.DB_POOL_SIZE,
+                    max_desborde=Config.DB_POOL_MAX_OVERFLOW,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    reciclar=Config.DB_POOL_RECYCLE,
+                    pre_ping=Config.DB_POOL_PRE_PING
+                )
+                _pool_pid = pid
+    return _pool
+
+class ConexionSesion:
+    """
+    Conexión compartida por todos los modelos durante una petición
+
+    commit() y close() no hacen nada: la sesión confirma una sola vez al
+    final de la petición. rollback() marca la sesión como fallida para que
+    no se confirme nada de lo hecho hasta ese momento.
+    """
+
+    def __init__(self, sesion, conexion):
+        self._sesion = sesion
+        self._conexion = conexion
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def cursor(self, *args, **kwargs):
+        # Varios modelos abren cursores sobre la misma conexión: con cursores
+        # con buffer no quedan resultados sin leer entre una consulta y otra
+        kwargs.setdefault('buffered', True)
+        return self._conexion.cursor(*args, **kwargs)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self._sesion.fallida = True
+        self._conexion.rollback()
+
+    def close(self):
+        pass
+
+class SesionPeticion:
+    """
+    Unidad de trabajo de una petición: una conexión y una transacción
+
+    La conexión se pide al pool la primera vez que un modelo la necesita,
+    así que las peticiones que no tocan la base de datos no ocupan ninguna.
+    """
+
+    def __init__(self):
+        self.conexion = None
+        self.fallida = False
+        self._al_confirmar = []
+
+    def obtener_conexion(self):
+        if self.conexion is None:
+            self.conexion = obtener_pool().obtener()
+        return ConexionSesion(self, self.conexion)
+
+    def al_confirmar(self, funcion):
+        self._al_confirmar.append(funcion)
+
+    def confirmar(self):
+        """Confirma la transacción (o la descarta si algún modelo hizo rollback)"""
+        if self.conexion is not None:
+            if self.fallida:
+                self.conexion.rollback()
+                self._al_confirmar = []
+                return
+            self.conexion.commit()
+        funciones, self._al_confirmar = self._al_confirmar, []
+        for funcion in funciones:
+            funcion()
+
+    def descartar(self):
+        self._al_confirmar = []
+        if self.conexion is not None:
+            self.conexion.rollback()
+
+    def cerrar(self):
+        if self.conexion is not None:
+            self.conexion.close()
+            self.conexion = None
+
+def obtener_sesion():
+    """
+    Retorna la sesión de la petición actual o None fuera de una petición a la API
+    """
+    if not has_app_context():
+        return None
+    return g.get('sesion_bd')
+
+def al_confirmar(funcion):
+    """
+    Ejecuta una función cuando los cambios de la petición queden confirmados
+
+    Fuera de una sesión (scripts, init_db) cada modelo confirma por sí mismo,
+    así que la función se ejecuta inmediatamente.
+    """
+    sesion = obtener_sesion()
+    if sesion is None:
+        funcion()
+    else:
+        sesion.al_confirmar(funcion)
+
+def registrar_sesion_peticion(app, prefijo='/api/'):
+    """
+    Registra la unidad de trabajo por petición en la aplicación Flask
+
+    Cada petición bajo `prefijo` usa una sola conexión del pool. Al terminar
+    se confirma una vez si la respuesta es exitosa (< 400) y se descarta en
+    cualquier otro caso, de modo que las operaciones de una petición son atómicas.
+    """
+    from flask import request
+
+    @app.before_request
+    def _iniciar_sesion_bd():
+        if request.path.startswith(prefijo):
+            g.sesion_bd = SesionPeticion()
+
+    @app.after_request
+    def _finalizar_sesion_bd(response):
+        sesion = g.pop('sesion_bd', None)
+        if sesion is None:
+            return response
+        try:
+            if response.status_code < 400:
+                sesion.confirmar()
+            else:
+                sesion.descartar()
+        except Error as e:
+            sesion.descartar()
+            response = jsonify({
+                'success': False,
+                'error': str(e)
+            })
+            response.status_code = 500
+        finally:
+            sesion.cerrar()
+        return response
+
+    @app.teardown_request
+    def _cerrar_sesion_bd(exc=None):
+        # Solo queda sesión si la vista lanzó una excepción sin manejar
+        sesion = g.pop('sesion_bd', None)
+        if sesion is not None:
+            try:
+                sesion.descartar()
+            except Error:
+                pass
+            sesion.cerrar()
+
+def get_db_connection():
+    """
+    Obtiene una conexión a la base de datos MySQL
+
+    Dentro de una petición a la API retorna la conexión compartida de la
+    sesión; fuera de ella, una conexión del pool.
+
+    Returns:
+        Conexión a la base de datos (close() la devuelve al pool)
+    """
+    try:
+        sesion = obtener_sesion()
+        if sesion is not None:
+            return sesion.obtener_conexion()
+        return obtener_pool().obtener()
     except Error as e:
         print(f"Error al conectar a MySQL: {e}")
         raise
+
+def obtener_conexion_pool():
+    """
+    Obtiene una conexión propia del pool, fuera de la sesión de la petición
+
+    Para lecturas largas (reportes en streaming) que siguen después de que
+    la petición confirmó su transacción y devolvió su conexión.
+
+    Returns:
+        Conexión a la base de datos (close() la devuelve al pool)
+    """
+    return obtener_pool().obtener()
+
+def obtener_estadisticas_pool():
+    """
+    Retorna las estadísticas del pool de conexiones del proceso actual
+
+    Returns:
+        dict: Estadísticas del pool
+    """
+    return obtener_pool().estadisticas()
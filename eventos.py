@@ -0,0 +1,128 @@
+"""
+Canal de eventos en memoria del proceso (uno por worker de gunicorn)
+
+Los modelos publican los pagos y recargas cuando su transacción queda
+confirmada y cada conexión del feed en vivo del dashboard recibe una copia
+en su propia cola. El feed solo lo usa para despertar al instante: las
+transacciones las lee de la base de datos, porque los pagos de otros
+workers no pasan por este canal (esos avisan con la generación
+'transacciones' de invalidacion.py).
+"""
+import queue
+import threading
+from config import Config
+
+class CanalLleno(Exception):
+    """Se lanza al suscribirse cuando ya se alcanzó el máximo de suscriptores"""
+    pass
+
+class Suscripcion:
+    """
+    Cola de eventos de un suscriptor del canal
+
+    Si el suscriptor no alcanza a leer y se llenan `max_pendientes` lotes,
+    la suscripción queda desbordada: se dejan de encolar eventos y el
+    suscriptor debe volver a cargar el estado completo.
+    """
+
+    def __init__(self, canal, max_pendientes):
+        self._canal = canal
+        self._cola = queue.Queue(max_pendientes)
+        self.desbordada = False
+
+    def _recibir(self, eventos):
+        if self.desbordada:
+            return
+        try:
+            self._cola.put_nowait(eventos)
+        except queue.Full:
+            self.desbordada = True
+
+    def esperar(self, timeout):
+        """
+        Espera hasta `timeout` segundos por eventos nuevos
+
+        Returns:
+            list: Eventos pendientes (vacía si no llegó ninguno)
+        """
+        try:
+            eventos = list(self._cola.get(timeout=timeout))
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                eventos.extend(self._cola.get_nowait())
+            except queue.Empty:
+                return eventos
+
+    def cerrar(self):
+        """Deja de recibir eventos (se puede llamar varias veces)"""
+        self._canal._desuscribir(self)
+
+class CanalEventos:
+    """
+    Difusión de eventos a todos los suscriptores del proceso
+
+    Args:
+        nombre (str): Nombre para identificar el canal en las estadísticas
+        max_suscriptores (int): Suscripciones simultáneas permitidas
+        max_pendientes (int): Lotes sin leer que admite cada suscriptor
+    """
+
+    def __init__(self, nombre, max_suscriptores=20, max_pendientes=1000):
+        self.nombre = nombre
+        self.max_suscriptores = max_suscriptores
+        self.max_pendientes = max_pendientes
+        self._suscriptores = set()
+        self._lock = threading.Lock()
+        self._publicados = 0
+        self._desbordes = 0
+
+    def suscribir(self):
+        """
+        Crea una suscripción (hay que cerrarla al terminar)
+
+        Raises:
+            CanalLleno: Si ya hay `max_suscriptores` suscripciones abiertas
+        """
+        with self._lock:
+            if len(self._suscriptores) >= self.max_suscriptores:
+                raise CanalLleno(f"El canal '{self.nombre}' ya tiene {self.max_suscriptores} suscriptores")
+            suscripcion = Suscripcion(self, self.max_pendientes)
+            self._suscriptores.add(suscripcion)
+            return suscripcion
+
+    def _desuscribir(self, suscripcion):
+        with self._lock:
+            if suscripcion in self._suscriptores:
+                self._suscriptores.discard(suscripcion)
+                if suscripcion.desbordada:
+                    self._desbordes += 1
+
+    def publicar(self, eventos):
+        """
+        Entrega una lista de eventos a todos los suscriptores (sin bloquear)
+        """
+        if not eventos:
+            return
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+            self._publicados += len(eventos)
+        for suscripcion in suscriptores:
+            suscripcion._recibir(eventos)
+
+    def estadisticas(self):
+        """
+        Retorna suscriptores activos, eventos publicados y suscripciones desbordadas
+        """
+        with self._lock:
+            return {
+                'nombre': self.nombre,
+                'suscriptores': len(self._suscriptores),
+                'max_suscriptores': self.max_suscriptores,
+                'publicados': self._publicados,
+                'desbordes': self._desbordes
+            }
+
+# Ids de los pagos y recargas confirmados en este worker
+canal_transacciones = CanalEventos('transacciones', max_suscriptores=Config.EVENTOS_MAX_SUSCRIPTORES)
@@ -0,0 +1,118 @@
+"""
+Script para importar recargas masivas desde un archivo CSV
+(pulseras precargadas de patrocinadores, paquetes VIP, etc.)
+
+Formato del CSV (la fila de encabezado es opcional):
+    numero_tarjeta,monto[,descripcion]
+    TARJ-123456,500.00,Paquete VIP
+
+Uso:
+    python importar_recargas.py recargas.csv
+    python importar_recargas.py recargas.csv --lote 2000 --errores fallidas.csv
+"""
+import argparse
+import csv
+import sys
+import time
+from models import Tarjeta
+
+def leer_filas(archivo):
+    """
+    Lee el CSV fila por fila (sin cargarlo completo en memoria)
+
+    Yields:
+        tuple: (numero_linea, numero_tarjeta, monto, descripcion, error)
+    """
+    for numero_linea, fila in enumerate(csv.reader(archivo), start=1):
+        if not fila or not any(c.strip() for c in fila):
+            continue
+
+        numero_tarjeta = fila[0].strip().upper()
+        if numero_linea == 1 and numero_tarjeta == 'NUMERO_TARJETA':
+            continue  # Encabezado
+
+        descripcion = fila[2].strip() if len(fila) > 2 and fila[2].strip() else None
+
+        if not numero_tarjeta.startswith('TARJ-') or len(numero_tarjeta) != 11:
+            yield numero_linea, numero_tarjeta, None, descripcion, 'Formato de tarjeta inválido'
+            continue
+        try:
+            monto = float(fila[1]) if len(fila) > 1 else None
+        except ValueError:
+            monto = None
+        if monto is None or monto <= 0:
+            yield numero_linea, numero_tarjeta, None, descripcion, 'Monto inválido'
+            continue
+
+        yield numero_linea, numero_tarjeta, monto, descripcion, None
+
+def importar_recargas(archivo, tamano_lote=1000):
+    """
+    Importa recargas desde un CSV en transacciones de `tamano_lote` filas
+
+    Args:
+        archivo: Archivo CSV abierto en modo texto
+        tamano_lote (int): Filas por transacción
+
+    Returns:
+        dict: {'aplicadas', 'monto_total', 'fallidas': [(linea, numero, motivo)]}
+    """
+    resumen = {'aplicadas': 0, 'monto_total': 0.0, 'fallidas': []}
+    lote = []
+
+    def aplicar(lote):
+        try:
+            resultados = Tarjeta.acreditar_lote([(n, m, d) for _, n, m, d in lote])
+        except Exception as e:
+            resumen['fallidas'].extend((linea, numero, f'Error de base de datos: {e}') for linea, numero, _, _ in lote)
+            return
+        for (linea, numero, monto, _), resultado in zip(lote, resultados):
+            if resultado['estado'] == 'ok':
+                resumen['aplicadas'] += 1
+                resumen['monto_total'] += monto
+            else:
+                resumen['fallidas'].append((linea, numero, 'Tarjeta no encontrada'))
+
+    for linea, numero, monto, descripcion, error in leer_filas(archivo):
+        if error:
+            resumen['fallidas'].append((linea, numero, error))
+            continue
+        lote.append((linea, numero, monto, descripcion))
+        if len(lote) >= tamano_lote:
+            aplicar(lote)
+            lote = []
+    if lote:
+        aplicar(lote)
+
+    resumen['monto_total'] = round(resumen['monto_total'], 2)
+    return resumen
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Importar recargas masivas desde CSV')
+    parser.add_argument('archivo', help='Archivo CSV con numero_tarjeta,monto[,descripcion]')
+    parser.add_argument('--lote', type=int, default=1000, help='Filas por transacción (default: 1000)')
+    parser.add_argument('--errores', help='Guardar las filas fallidas en este CSV')
+    args = parser.parse_args()
+
+    print(f"Importando recargas desde {args.archivo}...")
+    print("=" * 50)
+    inicio = time.monotonic()
+    with open(args.archivo, newline='', encoding='utf-8-sig') as archivo:
+        resumen = importar_recargas(archivo, tamano_lote=args.lote)
+    duracion = time.monotonic() - inicio
+
+    print(f"[OK] Recargas aplicadas: {resumen['aplicadas']} (${resumen['monto_total']:.2f}) en {duracion:.1f}s")
+    if resumen['fallidas']:
+        print(f"[ERROR] Filas fallidas: {len(resumen['fallidas'])}")
+        for linea, numero, motivo in resumen['fallidas'][:20]:
+            print(f"  Línea {linea}: {numero} - {motivo}")
+        if len(resumen['fallidas']) > 20:
+            print(f"  ... y {len(resumen['fallidas']) - 20} más")
+        if args.errores:
+            with open(args.errores, 'w', newline='', encoding='utf-8') as salida:
+                escritor = csv.writer(salida)
+                escritor.writerow(['linea', 'numero_tarjeta', 'motivo'])
+                escritor.writerows(resumen['fallidas'])
+            print(f"[OK] Detalle de filas fallidas guardado en {args.errores}")
+    print("=" * 50)
+    sys.exit(1 if resumen['fallidas'] else 0)
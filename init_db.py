@@ -1,16 +1,37 @@
 """
-Script para inicializar la base de datos
-Ejecutar este archivo para crear todas las tablas necesarias
+Script para inicializar y actualizar la base de datos
+Crea la base de datos si no existe y aplica las migraciones pendientes
+
+Uso:
+    python init_db.py              # Aplicar migraciones pendientes
+    python init_db.py --dry-run    # Mostrar el plan sin modificar nada
+    python init_db.py --estado     # Listar migraciones aplicadas y pendientes
 """
-from schema import init_database
+import argparse
+from schema import init_database, obtener_estado_migraciones
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inicializar y migrar la base de datos')
+    parser.add_argument('--dry-run', action='store_true', help='Mostrar el SQL que se ejecutaría sin aplicarlo')
+    parser.add_argument('--estado', action='store_true', help='Listar migraciones aplicadas y pendientes')
+    args = parser.parse_args()
+
     print("Inicializando base de datos...")
     print("=" * 50)
     try:
-        init_database()
-        print("=" * 50)
-        print("[OK] Base de datos lista para usar")
+        if args.estado:
+            for migracion in obtener_estado_migraciones():
+                estado = f"aplicada {migracion['fecha_aplicacion']}" if migracion['fecha_aplicacion'] else 'pendiente'
+                print(f"{migracion['version']:04d} {migracion['nombre']:30} {estado}")
+        elif args.dry_run:
+            pendientes = init_database(simular=True)
+            print("=" * 50)
+            print(f"[OK] Migraciones pendientes: {len(pendientes)} (no se modificó la base de datos)")
+        else:
+            aplicadas = init_database()
+            print("=" * 50)
+            print(f"[OK] Migraciones aplicadas: {len(aplicadas)}")
+            print("[OK] Base de datos lista para usar")
     except Exception as e:
         print("=" * 50)
         print(f"[ERROR] Error: {e}")
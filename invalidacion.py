@@ -0,0 +1,161 @@
+"""
+Invalidación de cachés entre procesos del mismo servidor
+
+Cada worker de gunicorn tiene sus propios cachés en memoria. Para que una
+escritura hecha en un proceso se note en los demás (otros workers, o scripts
+como importar_recargas.py), todos mapean el mismo archivo como una tabla de
+contadores de generación en memoria compartida (mmap). Publicar un cambio
+incrementa el contador de la posición de la clave; un caché guarda la
+generación con la que leyó cada valor y lo descarta en cuanto el contador
+cambia. Varias claves pueden compartir posición: eso solo produce
+invalidaciones de más, nunca valores desactualizados.
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: no hay bloqueo de archivos entre procesos
+    fcntl = None
+
+_CONTADOR = struct.Struct('<Q')
+
+def _posicion(ambito, clave, posiciones):
+    """Posición de la clave en la tabla (la misma en todos los procesos)"""
+    nombre = ambito if clave is None else f'{ambito}:{clave}'
+    return zlib.crc32(nombre.encode('utf-8')) % posiciones
+
+class TablaGeneraciones:
+    """
+    Contadores de generación compartidos entre procesos a través de un archivo mapeado
+
+    Args:
+        ruta (str): Archivo de la tabla (se crea si no existe)
+        posiciones (int): Número de contadores de la tabla
+    """
+
+    compartida = True
+
+    def __init__(self, ruta, posiciones=65536):
+        self.ruta = ruta
+        self.posiciones = posiciones
+        tamano = posiciones * _CONTADOR.size
+        self._fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(self._fd).st_size < tamano:
+                os.ftruncate(self._fd, tamano)
+            self._mapa = mmap.mmap(self._fd, tamano)
+        except OSError:
+            os.close(self._fd)
+            raise
+        # fcntl bloquea entre procesos pero no entre hilos del mismo proceso
+        self._lock = threading.Lock()
+        self._publicados = 0
+
+    def generacion(self, ambito, clave=None):
+        """Retorna el contador actual de la clave (o del ámbito completo si clave es None)"""
+        desplazamiento = _posicion(ambito, clave, self.posiciones) * _CONTADOR.size
+        return _CONTADOR.unpack_from(self._mapa, desplazamiento)[0]
+
+    def incrementar(self, ambito, clave=None):
+        """
+        Publica un cambio de la clave incrementando su contador
+
+        Returns:
+            int: Nueva generación
+        """
+        desplazamiento = _posicion(ambito, clave, self.posiciones) * _CONTADOR.size
+        with self._lock:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, _CONTADOR.size, desplazamiento)
+            try:
+                generacion = _CONTADOR.unpack_from(self._mapa, desplazamiento)[0] + 1
+                _CONTADOR.pack_into(self._mapa, desplazamiento, generacion)
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, _CONTADOR.size, desplazamiento)
+            self._publicados += 1
+            return generacion
+
+    def estadisticas(self):
+        """Retorna ruta, tamaño y cambios publicados por este proceso"""
+        with self._lock:
+            return {
+                'compartida': self.compartida,
+                'ruta': self.ruta,
+                'posiciones': self.posiciones,
+                'publicados': self._publicados
+            }
+
+class TablaLocal:
+    """
+    Misma interfaz que TablaGeneraciones, solo dentro del proceso
+
+    Se usa cuando no se puede crear el archivo compartido o está desactivado
+    (INVALIDACION_COMPARTIDA=False); con un único worker no hace falta más.
+    """
+
+    compartida = False
+
+    def __init__(self, posiciones=65536):
+        self.ruta = None
+        self.posiciones = posiciones
+        self._contadores = {}
+        self._lock = threading.Lock()
+        self._publicados = 0
+
+    def generacion(self, ambito, clave=None):
+        return self._contadores.get(_posicion(ambito, clave, self.posiciones), 0)
+
+    def incrementar(self, ambito, clave=None):
+        posicion = _posicion(ambito, clave, self.posiciones)
+        with self._lock:
+            generacion = self._contadores.get(posicion, 0) + 1
+            self._contadores[posicion] = generacion
+            self._publicados += 1
+            return generacion
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'compartida': self.compartida,
+                'ruta': self.ruta,
+                'posiciones': self.posiciones,
+                'publicados': self._publicados
+            }
+
+# Directorio por defecto del archivo: junto a la aplicación y no en /tmp,
+# donde systemd-tmpfiles o tmpreaper pueden borrarlo con los workers
+# funcionando (cada uno seguiría con su copia y dejarían de avisarse)
+DIRECTORIO_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run')
+
+def _crear_tabla():
+    if not Config.INVALIDACION_COMPARTIDA:
+        print("Invalidación de cachés solo dentro del proceso (INVALIDACION_COMPARTIDA=False)")
+        return TablaLocal()
+    ruta = Config.INVALIDACION_RUTA or os.path.join(
+        DIRECTORIO_DEFAULT, f'{Config.MYSQL_DATABASE}-generaciones-cache.bin'
+    )
+    try:
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        tabla = TablaGeneraciones(ruta)
+    except OSError as e:
+        print(f"No se pudo abrir la tabla de invalidación compartida ({ruta}): {e}")
+        return TablaLocal()
+    print(f"Tabla de invalidación compartida: {ruta}")
+    return tabla
+
+# Tabla del proceso; todos los procesos con la misma ruta comparten los contadores
+tabla_generaciones = _crear_tabla()
+
+def publicar(ambito, clave=None):
+    """Avisa a todos los procesos que la clave (o el ámbito completo) cambió"""
+    return tabla_generaciones.incrementar(ambito, clave)
+
+def generacion(ambito, clave=None):
+    """Generación actual de la clave (o del ámbito completo)"""
+    return tabla_generaciones.generacion(ambito, clave)
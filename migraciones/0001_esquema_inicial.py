@@ -0,0 +1,138 @@
+"""
+Tablas base de la aplicación y datos por defecto
+"""
+DESCRIPCION = 'Tablas base (asistentes, tarjetas, puntos de venta, productos, transacciones, usuarios)'
+
+def aplicar(m):
+    # Almacena información de cada asistente al evento
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS asistentes (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            email VARCHAR(100) UNIQUE,
+            telefono VARCHAR(20),
+            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            activo BOOLEAN DEFAULT TRUE
+        )
+    """)
+
+    # Cada tarjeta está vinculada a un asistente y tiene un saldo
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS tarjetas (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            asistente_id INT NOT NULL,
+            numero_tarjeta VARCHAR(20) UNIQUE NOT NULL,
+            saldo DECIMAL(10, 2) DEFAULT 0.00,
+            fecha_asignacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            activa BOOLEAN DEFAULT TRUE,
+            FOREIGN KEY (asistente_id) REFERENCES asistentes(id) ON DELETE CASCADE
+        )
+    """)
+
+    # Restaurante, cafetería, tienda, etc.
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS puntos_venta (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            tipo VARCHAR(50) NOT NULL,
+            activo BOOLEAN DEFAULT TRUE
+        )
+    """)
+
+    # Productos disponibles en los puntos de venta
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS productos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            precio DECIMAL(10, 2) NOT NULL,
+            tipo VARCHAR(50) NOT NULL,
+            punto_venta_id INT,
+            descripcion TEXT,
+            activo BOOLEAN DEFAULT TRUE,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (punto_venta_id) REFERENCES puntos_venta(id) ON DELETE SET NULL
+        )
+    """)
+
+    # Registra todas las operaciones: recargas y pagos
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS transacciones (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            tarjeta_id INT NOT NULL,
+            punto_venta_id INT,
+            tipo ENUM('recarga', 'pago') NOT NULL,
+            monto DECIMAL(10, 2) NOT NULL,
+            saldo_anterior DECIMAL(10, 2) NOT NULL,
+            saldo_nuevo DECIMAL(10, 2) NOT NULL,
+            fecha_transaccion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            descripcion TEXT,
+            FOREIGN KEY (tarjeta_id) REFERENCES tarjetas(id) ON DELETE CASCADE,
+            FOREIGN KEY (punto_venta_id) REFERENCES puntos_venta(id) ON DELETE SET NULL
+        )
+    """)
+
+    # Perfiles de los usuarios del sistema (admin, punto de venta, recargas)
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            usuario VARCHAR(50) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            rol ENUM('admin', 'punto_venta', 'recargas') NOT NULL,
+            nombre_completo VARCHAR(100),
+            email VARCHAR(100),
+            telefono VARCHAR(20),
+            foto_perfil VARCHAR(500),
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            activo BOOLEAN DEFAULT TRUE
+        )
+    """)
+
+    m.insertar_si_vacia('puntos_venta', """
+        INSERT INTO puntos_venta (nombre, tipo) VALUES (%s, %s)
+    """, [
+        ('Restaurante Principal', 'restaurante'),
+        ('Cafetería', 'cafeteria'),
+        ('Tienda de Souvenirs', 'souvenirs'),
+        ('Estacionamiento', 'estacionamiento'),
+        ('Bar', 'bar')
+    ])
+
+    m.insertar_si_vacia('usuarios', """
+        INSERT INTO usuarios (usuario, password, rol, nombre_completo, email, telefono, foto_perfil) 
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [
+        ('admin', 'admin123', 'admin', 'Administrador Principal', 'admin@evento.com', None, None),
+        ('punto_venta', 'venta123', 'punto_venta', 'Usuario Punto de Venta', 'venta@evento.com', None, None),
+        ('recargas', 'recarga123', 'recargas', 'Usuario Recargas', 'recargas@evento.com', None, None),
+    ])
+
+    m.insertar_si_vacia('productos', """
+        INSERT INTO productos (nombre, precio, tipo, punto_venta_id, descripcion) 
+        VALUES (%s, %s, %s, %s, %s)
+    """, [
+        # Restaurante
+        ('Hamburguesa', 80.00, 'restaurante', 1, 'Hamburguesa completa'),
+        ('Hot Dog', 50.00, 'restaurante', 1, 'Hot dog con papas'),
+        ('Pizza', 120.00, 'restaurante', 1, 'Pizza mediana'),
+        # Cafetería
+        ('Café', 30.00, 'cafeteria', 2, 'Café americano'),
+        ('Café con leche', 35.00, 'cafeteria', 2, 'Café con leche'),
+        ('Té', 25.00, 'cafeteria', 2, 'Té de hierbas'),
+        # Bebidas
+        ('Agua', 15.00, 'bebida', 1, 'Agua embotellada'),
+        ('Refresco', 25.00, 'bebida', 1, 'Refresco 500ml'),
+        ('Jugo', 30.00, 'bebida', 1, 'Jugo natural'),
+        # Comida
+        ('Tacos', 40.00, 'comida', 1, 'Orden de 3 tacos'),
+        ('Quesadillas', 45.00, 'comida', 1, 'Quesadillas de queso'),
+        # Postres
+        ('Postre', 45.00, 'postre', 1, 'Postre del día'),
+        ('Helado', 35.00, 'postre', 1, 'Helado de vainilla'),
+        # Ropa
+        ('Playera', 150.00, 'ropa', 3, 'Playera del evento'),
+        ('Gorra', 80.00, 'ropa', 3, 'Gorra con logo'),
+        # Souvenirs
+        ('Llavero', 25.00, 'souvenir', 3, 'Llavero conmemorativo'),
+        ('Taza', 60.00, 'souvenir', 3, 'Taza del evento'),
+    ])
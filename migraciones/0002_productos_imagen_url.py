@@ -0,0 +1,7 @@
+"""
+Imagen de los productos
+"""
+DESCRIPCION = 'Columna imagen_url en productos'
+
+def aplicar(m):
+    m.agregar_columna('productos', 'imagen_url', 'VARCHAR(500) AFTER descripcion')
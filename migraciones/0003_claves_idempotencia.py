@@ -0,0 +1,19 @@
+"""
+Claves de idempotencia de pagos y recargas
+"""
+DESCRIPCION = 'Tabla claves_idempotencia'
+
+def aplicar(m):
+    # Guarda la respuesta de pagos y recargas para que un reintento no cobre dos veces
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS claves_idempotencia (
+            endpoint VARCHAR(50) NOT NULL,
+            clave VARCHAR(100) NOT NULL,
+            huella CHAR(64) NOT NULL,
+            codigo_estado SMALLINT,
+            respuesta MEDIUMTEXT,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (endpoint, clave),
+            INDEX idx_claves_idempotencia_fecha (fecha_creacion)
+        )
+    """)
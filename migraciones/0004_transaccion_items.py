@@ -0,0 +1,18 @@
+"""
+Productos vendidos en cada pago
+"""
+DESCRIPCION = 'Tabla transaccion_items'
+
+def aplicar(m):
+    # Reemplaza el parseo de la descripción para reportes de productos
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS transaccion_items (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            transaccion_id INT NOT NULL,
+            producto_id INT,
+            cantidad INT NOT NULL,
+            precio_unitario DECIMAL(10, 2) NOT NULL,
+            FOREIGN KEY (transaccion_id) REFERENCES transacciones(id) ON DELETE CASCADE,
+            FOREIGN KEY (producto_id) REFERENCES productos(id) ON DELETE SET NULL
+        )
+    """)
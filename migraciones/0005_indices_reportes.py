@@ -0,0 +1,14 @@
+"""
+Índices compuestos para los reportes por rango de fechas
+"""
+DESCRIPCION = 'Índices (tipo|punto_venta_id|tarjeta_id, fecha_transaccion) en transacciones'
+
+def aplicar(m):
+    # (tipo, fecha) sirve a los reportes de ventas; monto y punto_venta_id lo
+    # vuelven de cobertura para los totales, que se resuelven sin leer la fila
+    m.crear_indice('transacciones', 'idx_transacciones_tipo_fecha',
+                   'tipo, fecha_transaccion, punto_venta_id, monto')
+    m.crear_indice('transacciones', 'idx_transacciones_pv_fecha',
+                   'punto_venta_id, fecha_transaccion')
+    m.crear_indice('transacciones', 'idx_transacciones_tarjeta_fecha',
+                   'tarjeta_id, fecha_transaccion')
@@ -0,0 +1,8 @@
+"""
+Índice para el historial paginado de una tarjeta
+"""
+DESCRIPCION = 'Índice (tarjeta_id, id) en transacciones'
+
+def aplicar(m):
+    # El historial se recorre por id descendente desde un cursor (before_id)
+    m.crear_indice('transacciones', 'idx_transacciones_tarjeta_id', 'tarjeta_id, id')
@@ -0,0 +1,36 @@
+"""
+Tablas de resumen por hora para los reportes de ventas
+"""
+DESCRIPCION = 'Tablas resumen_transacciones_hora y resumen_productos_hora (llenar con reconstruir_resumenes.py)'
+
+def aplicar(m):
+    # punto_venta_id y producto_id usan 0 para "sin punto de venta"/"producto eliminado"
+    # porque forman parte de la clave primaria
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS resumen_transacciones_hora (
+            hora DATETIME NOT NULL,
+            tipo ENUM('recarga', 'pago') NOT NULL,
+            punto_venta_id INT NOT NULL DEFAULT 0,
+            fragmento TINYINT NOT NULL DEFAULT 0,
+            cantidad INT NOT NULL DEFAULT 0,
+            monto DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+            PRIMARY KEY (hora, tipo, punto_venta_id, fragmento)
+        )
+    """)
+    m.ejecutar("""
+        CREATE TABLE IF NOT EXISTS resumen_productos_hora (
+            hora DATETIME NOT NULL,
+            punto_venta_id INT NOT NULL DEFAULT 0,
+            tipo_producto VARCHAR(50) NOT NULL DEFAULT '',
+            producto_id INT NOT NULL DEFAULT 0,
+            fragmento TINYINT NOT NULL DEFAULT 0,
+            cantidad INT NOT NULL DEFAULT 0,
+            monto DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+            PRIMARY KEY (hora, punto_venta_id, tipo_producto, producto_id, fragmento)
+        )
+    """)
+
+    # Solo estructura: los datos existentes se cargan después con
+    # python reconstruir_resumenes.py, que recorre el historial por rangos
+    # de fechas en transacciones cortas en lugar de una sola sentencia
+    # sobre todas las transacciones
@@ -0,0 +1,13 @@
+"""
+Migraciones versionadas del esquema de la base de datos
+
+Cada archivo NNNN_nombre.py define:
+    DESCRIPCION (str): Texto que se muestra en el plan
+    aplicar(m): Recibe un schema.Migrador y ejecuta los cambios a través de él
+
+Las migraciones se aplican en orden numérico y se registran en schema_version.
+Deben poder ejecutarse sobre una base de datos que ya tenga los cambios
+(instalaciones anteriores a schema_version), por eso usan las operaciones
+del Migrador que verifican antes de crear. Una migración aplicada no se edita:
+los cambios nuevos van en un archivo nuevo.
+"""
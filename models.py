@@ -2,8 +2,13 @@
 Modelos de datos para interactuar con la base de datos MySQL
 Cada clase contiene métodos estáticos para realizar operaciones CRUD
 """
-from database import get_db_connection
-from mysql.connector import Error
+from datetime import datetime, timedelta
+from decimal import Decimal
+from database import get_db_connection, obtener_conexion_pool, al_confirmar
+from eventos import canal_transacciones
+from cache import CacheLRU, CacheVersionado, CacheReferencia
+from invalidacion import tabla_generaciones, publicar
+from mysql.connector import Error, errorcode
 
 class Asistente:
     """Modelo para manejar asistentes al evento"""
@@ -101,6 +106,25 @@ class Asistente:
 class Tarjeta:
     """Modelo para manejar tarjetas inteligentes"""
     
+    # Tarjetas activas por número (consulta de saldo, escaneo de QR, POS).
+    # Las operaciones que modifican una tarjeta la invalidan en todos los
+    # workers; el TTL solo cubre cambios hechos fuera de la aplicación
+    _cache = CacheVersionado('tarjetas', max_entradas=10000, ttl=300, tabla=tabla_generaciones)
+    
+    @staticmethod
+    def invalidar_cache(*numeros_tarjeta):
+        """
+        Quita tarjetas del caché de obtener_por_numero en todos los workers
+        
+        Hay que llamarla después de connection.commit(): la invalidación se
+        publica cuando el cambio ya es visible para las demás conexiones, así
+        ninguna lectura anterior vuelve a guardar el valor viejo.
+        """
+        def invalidar():
+            for numero in numeros_tarjeta:
+                Tarjeta._cache.invalidar(numero)
+        al_confirmar(invalidar)
+    
     @staticmethod
     def generar_numero():
         """
@@ -148,6 +172,7 @@ class Tarjeta:
                 VALUES (%s, %s, 0.00)
             """, (asistente_id, numero_tarjeta))
             connection.commit()
+            Tarjeta.invalidar_cache(numero_tarjeta)
             tarjeta_id = cursor.lastrowid
             return tarjeta_id, numero_tarjeta
         except Error as e:
@@ -188,7 +213,17 @@ class Tarjeta:
         Returns:
             dict: Datos de la tarjeta con información del asistente o None
         """
+        tarjeta = Tarjeta._cache.obtener(numero_tarjeta)
+        if tarjeta is not None:
+            return dict(tarjeta)
+        
+        # Se lee con la conexión de la petición (no se pide otra al pool), pero
+        # solo se guarda en el caché si esta consulta abre la transacción: así
+        # toma una instantánea nueva y no ve cambios propios sin confirmar. Más
+        # adelante la instantánea puede ser vieja y el valor solo se retorna
+        version = Tarjeta._cache.version(numero_tarjeta)
         connection = get_db_connection()
+        guardar = not connection.in_transaction
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute("""
@@ -197,7 +232,10 @@ class Tarjeta:
                 JOIN asistentes a ON t.asistente_id = a.id
                 WHERE t.numero_tarjeta = %s AND t.activa = TRUE
             """, (numero_tarjeta,))
-            return cursor.fetchone()
+            tarjeta = cursor.fetchone()
+            if tarjeta is not None and guardar:
+                Tarjeta._cache.poner_si_vigente(numero_tarjeta, dict(tarjeta), version)
+            return tarjeta
         finally:
             cursor.close()
             connection.close()
@@ -289,7 +327,358 @@ class Tarjeta:
             cursor.execute("""
                 UPDATE tarjetas SET saldo = %s WHERE id = %s
             """, (nuevo_saldo, tarjeta_id))
+            cursor.execute("SELECT numero_tarjeta FROM tarjetas WHERE id = %s", (tarjeta_id,))
+            fila = cursor.fetchone()
+            connection.commit()
+            if fila:
+                Tarjeta.invalidar_cache(fila[0])
+        except Error as e:
+            connection.rollback()
+            raise e
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def _diagnosticar_rechazo(cursor, numero_tarjeta):
+        """
+        Determina por qué un cargo condicionado no afectó ninguna fila
+
+        Returns:
+            dict: {'exito': False, 'motivo': ..., 'saldo_actual': ...}
+                  motivo es 'no_encontrada', 'bloqueada' o 'saldo_insuficiente'
+        """
+        cursor.execute("SELECT saldo, activa FROM tarjetas WHERE numero_tarjeta = %s", (numero_tarjeta,))
+        fila = cursor.fetchone()
+        if not fila:
+            return {'exito': False, 'motivo': 'no_encontrada', 'saldo_actual': None}
+        if not fila['activa']:
+            return {'exito': False, 'motivo': 'bloqueada', 'saldo_actual': float(fila['saldo'])}
+        return {'exito': False, 'motivo': 'saldo_insuficiente', 'saldo_actual': float(fila['saldo'])}
+
+    @staticmethod
+    def debitar(numero_tarjeta, monto, punto_venta_id, descripcion=None, items=None):
+        """
+        Cobra un monto a una tarjeta y registra el pago en una sola transacción
+
+        El descuento es un UPDATE condicionado (tarjeta activa y saldo >= monto),
+        así que dos cobros simultáneos no pueden perder actualizaciones ni dejar
+        el saldo negativo. La tarjeta se bloquea en la misma sentencia si el
+        saldo llega a 0, y la misma sentencia retorna el saldo nuevo: un cobro
+        es ese UPDATE más las inserciones de la transacción y sus productos.
+
+        Args:
+            numero_tarjeta (str): Número de la tarjeta
+            monto (float): Monto a cobrar (mayor a 0)
+            punto_venta_id (int): ID del punto de venta
+            descripcion (str, optional): Descripción del pago
+            items (list, optional): Productos del carrito como tuplas
+                (producto_id, cantidad, precio_unitario); se guardan en
+                transaccion_items en la misma transacción
+
+        Returns:
+            dict: Si se cobró: {'exito': True, 'tarjeta', 'transaccion_id',
+                  'saldo_anterior', 'saldo_nuevo', 'tarjeta_bloqueada'}.
+                  Si no: {'exito': False, 'motivo', 'saldo_actual'}
+        """
+        # En centavos exactos, como en debitar_lote: los saldos que se guardan
+        # en la transacción cuadran con el monto descontado
+        monto = Decimal(str(monto)).quantize(Decimal('0.01'))
+        # Id y asistente no cambian con un cobro: salen del caché de tarjetas
+        # activas. El saldo y el estado del caché no se usan
+        tarjeta = Tarjeta.obtener_por_numero(numero_tarjeta)
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            if tarjeta is None:
+                return Tarjeta._diagnosticar_rechazo(cursor, numero_tarjeta)
+
+            # MySQL evalúa las asignaciones de izquierda a derecha: "activa" se
+            # calcula con el saldo ya descontado, y LAST_INSERT_ID(expr) deja
+            # ese saldo (en centavos) en el insert_id de la respuesta del
+            # UPDATE, así no hace falta volver a leer la tarjeta
+            cursor.execute("""
+                UPDATE tarjetas
+                SET saldo = saldo - %s, activa = (LAST_INSERT_ID(ROUND(saldo * 100)) > 0)
+                WHERE id = %s AND activa = TRUE AND saldo >= %s
+            """, (monto, tarjeta['id'], monto))
+            if cursor.rowcount == 0:
+                return Tarjeta._diagnosticar_rechazo(cursor, numero_tarjeta)
+
+            saldo_nuevo = Decimal(cursor.lastrowid or 0).scaleb(-2)
+            saldo_anterior = saldo_nuevo + monto
+            tarjeta.update(saldo=saldo_nuevo, activa=saldo_nuevo > 0)
+
+            cursor.execute("""
+                INSERT INTO transacciones
+                (tarjeta_id, punto_venta_id, tipo, monto, saldo_anterior, saldo_nuevo, descripcion)
+                VALUES (%s, %s, 'pago', %s, %s, %s, %s)
+            """, (tarjeta['id'], punto_venta_id, monto, saldo_anterior, saldo_nuevo, descripcion))
+            transaccion_id = cursor.lastrowid
+
+            if items:
+                cursor.executemany("""
+                    INSERT INTO transaccion_items (transaccion_id, producto_id, cantidad, precio_unitario)
+                    VALUES (%s, %s, %s, %s)
+                """, [(transaccion_id, producto_id, cantidad, precio) for producto_id, cantidad, precio in items])
+            ResumenVentas.acumular(cursor, [transaccion_id], con_items=bool(items))
+            connection.commit()
+            Tarjeta.invalidar_cache(numero_tarjeta)
+
+            return {
+                'exito': True,
+                'tarjeta': tarjeta,
+                'transaccion_id': transaccion_id,
+                'saldo_anterior': float(saldo_anterior),
+                'saldo_nuevo': float(saldo_nuevo),
+                'tarjeta_bloqueada': not tarjeta['activa']
+            }
+        except Error as e:
+            connection.rollback()
+            raise e
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def debitar_lote(pagos):
+        """
+        Cobra una lista de pagos en una sola transacción
+
+        Las tarjetas involucradas se bloquean con un único SELECT ... FOR UPDATE,
+        los saldos se calculan en orden sobre esa lectura exacta y luego se
+        escriben con un executemany para las tarjetas y una inserción de varias
+        filas para las transacciones. Los pagos rechazados no modifican nada.
+
+        Args:
+            pagos (list): Diccionarios con numero_tarjeta, punto_venta_id,
+                monto (float > 0) y descripcion (opcional)
+
+        Returns:
+            list: Un diccionario por pago, en el mismo orden, con 'estado'
+                ('ok', 'no_encontrada', 'bloqueada', 'saldo_insuficiente' o
+                'punto_venta_no_encontrado') y, si se cobró, transaccion_id y los saldos
+        """
+        if not pagos:
+            return []
+
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            numeros = sorted({p['numero_tarjeta'] for p in pagos})
+            marcadores = ', '.join(['%s'] * len(numeros))
+            cursor.execute(f"""
+                SELECT id, numero_tarjeta, saldo, activa
+                FROM tarjetas
+                WHERE numero_tarjeta IN ({marcadores})
+                ORDER BY id
+                FOR UPDATE
+            """, tuple(numeros))
+            tarjetas = {t['numero_tarjeta']: t for t in cursor.fetchall()}
+
+            pv_ids = sorted({int(p['punto_venta_id']) for p in pagos})
+            marcadores = ', '.join(['%s'] * len(pv_ids))
+            cursor.execute(f"SELECT id, nombre FROM puntos_venta WHERE id IN ({marcadores})", tuple(pv_ids))
+            puntos_venta = {pv['id']: pv['nombre'] for pv in cursor.fetchall()}
+
+            resultados = []
+            transacciones = []
+            modificadas = {}
+            for pago in pagos:
+                tarjeta = tarjetas.get(pago['numero_tarjeta'])
+                punto_venta_id = int(pago['punto_venta_id'])
+                monto = Decimal(str(pago['monto'])).quantize(Decimal('0.01'))
+
+                if punto_venta_id not in puntos_venta:
+                    resultados.append({'estado': 'punto_venta_no_encontrado'})
+                    continue
+                if not tarjeta:
+                    resultados.append({'estado': 'no_encontrada'})
+                    continue
+                if not tarjeta['activa']:
+                    resultados.append({'estado': 'bloqueada', 'saldo_actual': float(tarjeta['saldo'])})
+                    continue
+                if tarjeta['saldo'] < monto:
+                    resultados.append({'estado': 'saldo_insuficiente', 'saldo_actual': float(tarjeta['saldo'])})
+                    continue
+
+                saldo_anterior = tarjeta['saldo']
+                tarjeta['saldo'] = saldo_anterior - monto
+                tarjeta['activa'] = tarjeta['saldo'] > 0
+                modificadas[tarjeta['id']] = tarjeta
+
+                transacciones.append((
+                    tarjeta['id'], punto_venta_id, 'pago', monto, saldo_anterior, tarjeta['saldo'],
+                    pago.get('descripcion') or f'Pago en {puntos_venta[punto_venta_id]}'
+                ))
+                resultados.append({
+                    'estado': 'ok',
+                    'transaccion_id': None,
+                    'saldo_anterior': float(saldo_anterior),
+                    'saldo_nuevo': float(tarjeta['saldo']),
+                    'tarjeta_bloqueada': not tarjeta['activa']
+                })
+
+            if modificadas:
+                cursor.executemany(
+                    "UPDATE tarjetas SET saldo = %s, activa = %s WHERE id = %s",
+                    [(t['saldo'], t['activa'], t['id']) for t in modificadas.values()]
+                )
+                transaccion_ids = Transaccion.insertar_lote(cursor, transacciones)
+                ResumenVentas.acumular(cursor, transaccion_ids)
+                # Las transacciones están en el orden de los pagos cobrados
+                cobrados = [r for r in resultados if r['estado'] == 'ok']
+                for resultado, transaccion_id in zip(cobrados, transaccion_ids):
+                    resultado['transaccion_id'] = transaccion_id
+            connection.commit()
+            Tarjeta.invalidar_cache(*(t['numero_tarjeta'] for t in modificadas.values()))
+            return resultados
+        except Error as e:
+            connection.rollback()
+            raise e
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def acreditar(numero_tarjeta, monto, descripcion=None):
+        """
+        Recarga un monto a una tarjeta y registra la recarga en una sola transacción
+
+        El saldo se incrementa en SQL (sin leer-modificar-escribir) y la tarjeta
+        se desbloquea en la misma sentencia, así que una recarga no puede pisar
+        un pago simultáneo.
+
+        Args:
+            numero_tarjeta (str): Número de la tarjeta
+            monto (float): Monto a recargar (mayor a 0)
+            descripcion (str, optional): Descripción de la recarga
+
+        Returns:
+            dict: {'tarjeta', 'transaccion_id', 'saldo_anterior', 'saldo_nuevo',
+                  'tarjeta_desbloqueada'} o None si la tarjeta no existe
+        """
+        # En centavos exactos, como en acreditar_lote (ver debitar)
+        monto = Decimal(str(monto)).quantize(Decimal('0.01'))
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            # A la derecha de la asignación, "activa" todavía es el valor
+            # anterior: LAST_INSERT_ID(activa) lo deja en el insert_id de la
+            # respuesta del UPDATE y la expresión vale TRUE en ambos casos
+            cursor.execute("""
+                UPDATE tarjetas
+                SET saldo = saldo + %s, activa = (LAST_INSERT_ID(activa) >= 0)
+                WHERE numero_tarjeta = %s
+            """, (monto, numero_tarjeta))
+            if cursor.rowcount == 0:
+                return None
+            activa_anterior = bool(cursor.lastrowid)
+
+            # La fila queda bloqueada por el UPDATE hasta el commit: el saldo leído es exacto
+            cursor.execute("""
+                SELECT t.*, a.nombre as asistente_nombre
+                FROM tarjetas t
+                JOIN asistentes a ON t.asistente_id = a.id
+                WHERE t.numero_tarjeta = %s
+            """, (numero_tarjeta,))
+            tarjeta = cursor.fetchone()
+            saldo_nuevo = Decimal(tarjeta['saldo'])
+            saldo_anterior = saldo_nuevo - monto
+
+            cursor.execute("""
+                INSERT INTO transacciones
+                (tarjeta_id, punto_venta_id, tipo, monto, saldo_anterior, saldo_nuevo, descripcion)
+                VALUES (%s, NULL, 'recarga', %s, %s, %s, %s)
+            """, (tarjeta['id'], monto, saldo_anterior, saldo_nuevo, descripcion))
+            transaccion_id = cursor.lastrowid
+            ResumenVentas.acumular(cursor, [transaccion_id])
+            connection.commit()
+            Tarjeta.invalidar_cache(numero_tarjeta)
+
+            return {
+                'tarjeta': tarjeta,
+                'transaccion_id': transaccion_id,
+                'saldo_anterior': float(saldo_anterior),
+                'saldo_nuevo': float(saldo_nuevo),
+                'tarjeta_desbloqueada': not activa_anterior and bool(tarjeta['activa'])
+            }
+        except Error as e:
+            connection.rollback()
+            raise e
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def acreditar_lote(recargas):
+        """
+        Aplica una lista de recargas en una sola transacción
+
+        Las tarjetas se buscan por el índice único de numero_tarjeta con un solo
+        SELECT ... FOR UPDATE; los saldos se actualizan con un executemany y las
+        transacciones se insertan como un INSERT de varias filas. Las recargas
+        desbloquean la tarjeta igual que Tarjeta.acreditar.
+
+        Args:
+            recargas (list): Tuplas (numero_tarjeta, monto, descripcion) con monto > 0;
+                descripcion puede ser None
+
+        Returns:
+            list: Un diccionario por recarga, en el mismo orden, con 'estado'
+                ('ok' o 'no_encontrada') y los saldos si se aplicó
+        """
+        if not recargas:
+            return []
+
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            numeros = sorted({numero for numero, _, _ in recargas})
+            marcadores = ', '.join(['%s'] * len(numeros))
+            cursor.execute(f"""
+                SELECT id, numero_tarjeta, saldo
+                FROM tarjetas
+                WHERE numero_tarjeta IN ({marcadores})
+                ORDER BY id
+                FOR UPDATE
+            """, tuple(numeros))
+            tarjetas = {t['numero_tarjeta']: t for t in cursor.fetchall()}
+
+            resultados = []
+            transacciones = []
+            modificadas = {}
+            for numero_tarjeta, monto, descripcion in recargas:
+                tarjeta = tarjetas.get(numero_tarjeta)
+                if not tarjeta:
+                    resultados.append({'estado': 'no_encontrada'})
+                    continue
+
+                monto = Decimal(str(monto)).quantize(Decimal('0.01'))
+                saldo_anterior = tarjeta['saldo']
+                tarjeta['saldo'] = saldo_anterior + monto
+                modificadas[tarjeta['id']] = tarjeta
+
+                transacciones.append((
+                    tarjeta['id'], None, 'recarga', monto, saldo_anterior, tarjeta['saldo'],
+                    descripcion or f'Recarga de ${monto:.2f}'
+                ))
+                resultados.append({
+                    'estado': 'ok',
+                    'saldo_anterior': float(saldo_anterior),
+                    'saldo_nuevo': float(tarjeta['saldo'])
+                })
+
+            if modificadas:
+                cursor.executemany(
+                    "UPDATE tarjetas SET saldo = %s, activa = TRUE WHERE id = %s",
+                    [(t['saldo'], t['id']) for t in modificadas.values()]
+                )
+                transaccion_ids = Transaccion.insertar_lote(cursor, transacciones)
+                ResumenVentas.acumular(cursor, transaccion_ids)
             connection.commit()
+            Tarjeta.invalidar_cache(*(t['numero_tarjeta'] for t in modificadas.values()))
+            return resultados
         except Error as e:
             connection.rollback()
             raise e
@@ -318,15 +707,17 @@ class Transaccion:
             int: ID de la transacción creada
         """
         connection = get_db_connection()
-        cursor = connection.cursor()
+        cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute("""
                 INSERT INTO transacciones 
                 (tarjeta_id, punto_venta_id, tipo, monto, saldo_anterior, saldo_nuevo, descripcion)
                 VALUES (%s, %s, %s, %s, %s, %s, %s)
             """, (tarjeta_id, punto_venta_id, tipo, monto, saldo_anterior, saldo_nuevo, descripcion))
+            transaccion_id = cursor.lastrowid
+            ResumenVentas.acumular(cursor, [transaccion_id])
             connection.commit()
-            return cursor.lastrowid
+            return transaccion_id
         except Error as e:
             connection.rollback()
             raise e
@@ -335,12 +726,113 @@ class Transaccion:
             connection.close()
     
     @staticmethod
-    def obtener_por_tarjeta(numero_tarjeta):
+    def insertar_lote(cursor, transacciones):
+        """
+        Inserta varias transacciones con una sola sentencia y retorna sus ids
+
+        No se supone que los ids sean consecutivos (auto_increment_increment,
+        innodb_autoinc_lock_mode=2): se leen de vuelta las filas de las
+        tarjetas del lote con id desde el primero asignado. El llamador debe
+        tener las tarjetas bloqueadas (SELECT ... FOR UPDATE), así ninguna
+        otra transacción puede estar insertando movimientos de esas tarjetas.
+
+        Args:
+            cursor: Cursor (dictionary=True) de la transacción
+            transacciones (list): Tuplas (tarjeta_id, punto_venta_id, tipo, monto,
+                saldo_anterior, saldo_nuevo, descripcion)
+
+        Returns:
+            list: IDs de las transacciones, en el mismo orden
         """
-        Obtiene todas las transacciones de una tarjeta ordenadas por fecha
+        # mysql.connector agrupa este executemany en un solo INSERT de varias filas
+        cursor.executemany("""
+            INSERT INTO transacciones
+            (tarjeta_id, punto_venta_id, tipo, monto, saldo_anterior, saldo_nuevo, descripcion)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, transacciones)
+        primer_id = cursor.lastrowid
+
+        tarjeta_ids = sorted({t[0] for t in transacciones})
+        marcadores = ', '.join(['%s'] * len(tarjeta_ids))
+        cursor.execute(f"""
+            SELECT id, tarjeta_id FROM transacciones
+            WHERE id >= %s AND tarjeta_id IN ({marcadores})
+            ORDER BY id
+        """, (primer_id, *tarjeta_ids))
+        # Las filas de una misma tarjeta se insertaron en el orden de la lista
+        ids_por_tarjeta = {}
+        for fila in cursor.fetchall():
+            ids_por_tarjeta.setdefault(fila['tarjeta_id'], []).append(fila['id'])
+        for ids in ids_por_tarjeta.values():
+            ids.reverse()
+        return [ids_por_tarjeta[t[0]].pop() for t in transacciones]
+    
+    @staticmethod
+    def obtener_ultimo_id():
+        """
+        Obtiene el mayor id de transacciones (marca de agua para los cachés de reportes)
+        
+        Returns:
+            int: Último id o 0 si no hay transacciones
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM transacciones")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @staticmethod
+    def obtener_inicio_en_vivo(margen_segundos):
+        """
+        Obtiene el punto de partida del feed en vivo según el reloj de MySQL
+        
+        Dentro de una petición a la API se lee en la misma transacción que
+        obtener_totales_transacciones, así que los ids recientes son justo
+        los incluidos en esos totales.
+        
+        Args:
+            margen_segundos (int): Antigüedad a partir de la cual una transacción
+                ya no puede aparecer con un id menor (ver DELTA_MARGEN_SEGUNDOS)
+                
+        Returns:
+            tuple: (CURDATE() de MySQL, id de la última transacción con más de
+                `margen_segundos`, ids mayores a ese ya confirmados)
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT CURDATE(), NOW() - INTERVAL %s SECOND", (margen_segundos,))
+            hoy, limite_fecha = cursor.fetchone()
+            # Recorre la clave primaria desde el final: solo pasa por las recientes
+            cursor.execute("""
+                SELECT id FROM transacciones
+                WHERE fecha_transaccion < %s
+                ORDER BY id DESC LIMIT 1
+            """, (limite_fecha,))
+            fila = cursor.fetchone()
+            desde = fila[0] if fila else 0
+            cursor.execute("SELECT id FROM transacciones WHERE id > %s", (desde,))
+            return hoy, desde, [fila[0] for fila in cursor.fetchall()]
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @staticmethod
+    def obtener_por_tarjeta(numero_tarjeta, before_id=None, limite=None):
+        """
+        Obtiene las transacciones de una tarjeta, de la más reciente a la más antigua
+        
+        Pagina por cursor en lugar de OFFSET: cada página pide las transacciones
+        con id menor al último recibido, y el índice (tarjeta_id, id) entrega
+        solo esas filas ya ordenadas, sin importar cuántas tenga la tarjeta.
         
         Args:
             numero_tarjeta (str): Número de la tarjeta
+            before_id (int, optional): Solo transacciones con id menor a este
+            limite (int, optional): Máximo de transacciones a retornar (None = todas)
             
         Returns:
             list: Lista de diccionarios con las transacciones
@@ -348,23 +840,455 @@ class Transaccion:
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         try:
-            cursor.execute("""
+            query = """
                 SELECT t.*, pv.nombre as punto_venta_nombre
                 FROM transacciones t
                 LEFT JOIN puntos_venta pv ON t.punto_venta_id = pv.id
                 JOIN tarjetas tar ON t.tarjeta_id = tar.id
                 WHERE tar.numero_tarjeta = %s
-                ORDER BY t.fecha_transaccion DESC
-            """, (numero_tarjeta,))
+            """
+            params = [numero_tarjeta]
+            
+            if before_id:
+                query += " AND t.id < %s"
+                params.append(before_id)
+            
+            query += " ORDER BY t.id DESC"
+            
+            if limite:
+                query += " LIMIT %s"
+                params.append(limite)
+            
+            cursor.execute(query, tuple(params))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @staticmethod
+    def contar_por_tarjeta(tarjeta_id):
+        """
+        Cuenta las transacciones de una tarjeta
+        
+        Se resuelve solo con el índice (tarjeta_id, id), sin leer las filas.
+        
+        Args:
+            tarjeta_id (int): ID de la tarjeta
+            
+        Returns:
+            int: Número de transacciones
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM transacciones WHERE tarjeta_id = %s", (tarjeta_id,))
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @staticmethod
+    def obtener_resumen_tarjeta(tarjeta_id):
+        """
+        Obtiene los totales de todas las transacciones de una tarjeta
+        
+        Args:
+            tarjeta_id (int): ID de la tarjeta
+            
+        Returns:
+            dict: total_transacciones, total_recargas, monto_recargas,
+                  total_pagos, monto_pagos y ultima_transaccion
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT 
+                    COUNT(*) as total_transacciones,
+                    COALESCE(SUM(tipo = 'recarga'), 0) as total_recargas,
+                    COALESCE(SUM(CASE WHEN tipo = 'recarga' THEN monto END), 0) as monto_recargas,
+                    COALESCE(SUM(tipo = 'pago'), 0) as total_pagos,
+                    COALESCE(SUM(CASE WHEN tipo = 'pago' THEN monto END), 0) as monto_pagos,
+                    MAX(fecha_transaccion) as ultima_transaccion
+                FROM transacciones
+                WHERE tarjeta_id = %s
+            """, (tarjeta_id,))
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @staticmethod
+    def obtener_ventas(fecha_inicio=None, fecha_fin=None, punto_venta_id=None, before_id=None, limite=None,
+                       como_tuplas=False):
+        """
+        Obtiene las transacciones de tipo 'pago' (ventas) con información completa,
+        de la más reciente a la más antigua
+        
+        Args:
+            fecha_inicio (str, optional): Fecha de inicio (YYYY-MM-DD)
+            fecha_fin (str, optional): Fecha de fin (YYYY-MM-DD)
+            punto_venta_id (int, optional): ID del punto de venta para filtrar
+            before_id (int, optional): Solo ventas con id menor a este (paginación por cursor)
+            limite (int, optional): Máximo de ventas a retornar (None = todas)
+            como_tuplas (bool): Retornar tuplas en el orden de reportes.COLUMNAS_CONSULTA
+            
+        Returns:
+            list: Lista de diccionarios (o tuplas) con las ventas
+        """
+        return Transaccion.obtener_todas_transacciones(
+            fecha_inicio, fecha_fin, 'pago', punto_venta_id, before_id, limite, como_tuplas
+        )
+    
+    @staticmethod
+    def _consulta_transacciones(fecha_inicio=None, fecha_fin=None, tipo=None, punto_venta_id=None, before_id=None, limite=None,
+                                since_id=None):
+        """
+        Construye la consulta del reporte de transacciones, de la más reciente a la más antigua
+        (o de la más antigua a la más reciente si se indica `since_id`)
+
+        Returns:
+            tuple: (consulta SQL, tupla de parámetros)
+
+        Raises:
+            ValueError: Si alguna fecha no tiene el formato YYYY-MM-DD
+        """
+        query = """
+            SELECT 
+                t.id,
+                t.fecha_transaccion,
+                t.tipo,
+                t.monto,
+                t.descripcion,
+                t.saldo_anterior,
+                t.saldo_nuevo,
+                tar.numero_tarjeta,
+                a.nombre as asistente_nombre,
+                a.id as asistente_id,
+                pv.id as punto_venta_id,
+                pv.nombre as punto_venta_nombre
+            FROM transacciones t
+            JOIN tarjetas tar ON t.tarjeta_id = tar.id
+            JOIN asistentes a ON tar.asistente_id = a.id
+            LEFT JOIN puntos_venta pv ON t.punto_venta_id = pv.id
+            WHERE 1=1
+        """
+        condiciones, params = Transaccion._filtros_transacciones(fecha_inicio, fecha_fin, punto_venta_id, tipo)
+        query += condiciones
+
+        if before_id:
+            query += " AND t.id < %s"
+            params.append(before_id)
+
+        if since_id is not None:
+            query += " AND t.id > %s ORDER BY t.id ASC"
+            params.append(since_id)
+        else:
+            query += " ORDER BY t.id DESC"
+
+        if limite:
+            query += " LIMIT %s"
+            params.append(limite)
+
+        return query, tuple(params)
+
+    @staticmethod
+    def obtener_todas_transacciones(fecha_inicio=None, fecha_fin=None, tipo=None, punto_venta_id=None, before_id=None, limite=None,
+                                    como_tuplas=False):
+        """
+        Obtiene las transacciones (recargas y pagos) con información completa
+        
+        Args:
+            fecha_inicio (str, optional): Fecha de inicio (YYYY-MM-DD)
+            fecha_fin (str, optional): Fecha de fin (YYYY-MM-DD)
+            tipo (str, optional): 'recarga' o 'pago' para filtrar
+            punto_venta_id (int, optional): ID del punto de venta para filtrar
+            before_id (int, optional): Solo transacciones con id menor a este (paginación por cursor)
+            limite (int, optional): Máximo de transacciones a retornar (None = todas)
+            como_tuplas (bool): Retornar tuplas en el orden de reportes.COLUMNAS_CONSULTA
+            
+        Returns:
+            list: Lista de diccionarios (o tuplas) con las transacciones
+        """
+        query, params = Transaccion._consulta_transacciones(
+            fecha_inicio, fecha_fin, tipo, punto_venta_id, before_id, limite
+        )
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=not como_tuplas)
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @staticmethod
+    def obtener_transacciones_desde(since_id, limite, tipo=None, punto_venta_id=None):
+        """
+        Obtiene las transacciones con id mayor a `since_id`, de la más antigua a la más reciente
+        
+        Recorre la clave primaria desde `since_id`, así que el costo depende
+        solo del tamaño de la página y no del total de transacciones.
+        
+        Args:
+            since_id (int): Último id que el cliente ya tiene (0 = desde el principio)
+            limite (int): Máximo de transacciones a retornar
+            tipo (str, optional): 'recarga' o 'pago' para filtrar
+            punto_venta_id (int, optional): ID del punto de venta para filtrar
+            
+        Returns:
+            tuple: (hora actual del servidor MySQL, tuplas en el orden de reportes.COLUMNAS_CONSULTA)
+        """
+        query, params = Transaccion._consulta_transacciones(
+            tipo=tipo, punto_venta_id=punto_venta_id, limite=limite, since_id=since_id
+        )
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT NOW()")
+            ahora = cursor.fetchone()[0]
+            cursor.execute(query, params)
+            return ahora, cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @staticmethod
+    def iterar_bloques_transacciones(fecha_inicio=None, fecha_fin=None, tipo=None, punto_venta_id=None, tamano_bloque=500):
+        """
+        Recorre las transacciones del reporte por bloques, sin cargarlas todas en memoria
+        
+        Usa una conexión propia del pool (no la de la petición, que se confirma
+        antes de que empiece a enviarse la respuesta) y un cursor sin buffer,
+        que lee las filas del servidor en bloques de `tamano_bloque`.
+        Los filtros se validan al llamar a la función, antes de empezar a iterar.
+        
+        Args:
+            fecha_inicio (str, optional): Fecha de inicio (YYYY-MM-DD)
+            fecha_fin (str, optional): Fecha de fin (YYYY-MM-DD)
+            tipo (str, optional): 'recarga' o 'pago' para filtrar
+            punto_venta_id (int, optional): ID del punto de venta para filtrar
+            tamano_bloque (int): Filas que se leen del servidor en cada bloque
+            
+        Returns:
+            generator: Listas de tuplas en el orden de reportes.COLUMNAS_CONSULTA
+            
+        Raises:
+            ValueError: Si alguna fecha no tiene el formato YYYY-MM-DD
+        """
+        query, params = Transaccion._consulta_transacciones(fecha_inicio, fecha_fin, tipo, punto_venta_id)
+        
+        def bloques():
+            connection = obtener_conexion_pool()
+            cursor = connection.cursor(buffered=False)
+            try:
+                cursor.execute(query, params)
+                while True:
+                    bloque = cursor.fetchmany(tamano_bloque)
+                    if not bloque:
+                        break
+                    yield bloque
+            finally:
+                try:
+                    cursor.close()
+                except Error:
+                    pass  # Quedaron filas sin leer: el pool descarta la conexión
+                connection.close()
+        
+        return bloques()
+    
+    @staticmethod
+    def obtener_totales_transacciones(fecha_inicio=None, fecha_fin=None, tipo=None, punto_venta_id=None):
+        """
+        Obtiene cantidad y monto de recargas y pagos con los filtros del reporte
+        
+        Returns:
+            dict: {'recarga': {'cantidad', 'monto'}, 'pago': {'cantidad', 'monto'}}
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            condiciones, params = Transaccion._filtros_transacciones(fecha_inicio, fecha_fin, punto_venta_id, tipo)
+            cursor.execute(f"""
+                SELECT t.tipo, COUNT(*) as cantidad, SUM(t.monto) as monto
+                FROM transacciones t
+                WHERE 1=1 {condiciones}
+                GROUP BY t.tipo
+            """, tuple(params))
+            totales = {
+                'recarga': {'cantidad': 0, 'monto': 0.0},
+                'pago': {'cantidad': 0, 'monto': 0.0}
+            }
+            for fila in cursor.fetchall():
+                totales[fila['tipo']] = {'cantidad': int(fila['cantidad']), 'monto': float(fila['monto'] or 0)}
+            return totales
+        finally:
+            cursor.close()
+            connection.close()
+    
+    @staticmethod
+    def _filtros_transacciones(fecha_inicio=None, fecha_fin=None, punto_venta_id=None, tipo=None,
+                               alias='t', columna_fecha='fecha_transaccion'):
+        """
+        Construye las condiciones de fecha, punto de venta y tipo para los reportes
+
+        Las fechas se comparan como un rango semiabierto sobre la columna
+        (fecha_transaccion >= inicio AND fecha_transaccion < día siguiente al fin)
+        en lugar de DATE(fecha_transaccion), para que MySQL pueda usar los
+        índices compuestos de transacciones en vez de recorrer toda la tabla.
+
+        Args:
+            alias (str): Alias de la tabla en la consulta
+            columna_fecha (str): Columna de fecha ('hora' en las tablas de resumen)
+
+        Returns:
+            tuple: (condiciones SQL que empiezan con AND, lista de parámetros)
+
+        Raises:
+            ValueError: Si alguna fecha no tiene el formato YYYY-MM-DD
+        """
+        condiciones = ""
+        params = []
+
+        if fecha_inicio:
+            condiciones += f" AND {alias}.{columna_fecha} >= %s"
+            params.append(datetime.strptime(fecha_inicio, '%Y-%m-%d'))
+
+        if fecha_fin:
+            condiciones += f" AND {alias}.{columna_fecha} < %s"
+            params.append(datetime.strptime(fecha_fin, '%Y-%m-%d') + timedelta(days=1))
+
+        if tipo:
+            condiciones += f" AND {alias}.tipo = %s"
+            params.append(tipo)
+
+        if punto_venta_id:
+            condiciones += f" AND {alias}.punto_venta_id = %s"
+            params.append(punto_venta_id)
+
+        return condiciones, params
+
+    @staticmethod
+    def obtener_items_ventas(transaccion_ids):
+        """
+        Obtiene los productos vendidos (transaccion_items) de las ventas indicadas
+
+        Args:
+            transaccion_ids (list): IDs de las ventas (las de la página del reporte)
+
+        Returns:
+            dict: {transaccion_id: [{producto_id, nombre, cantidad, precio_unitario}, ...]}
+        """
+        if not transaccion_ids:
+            return {}
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            marcadores = ', '.join(['%s'] * len(transaccion_ids))
+            cursor.execute(f"""
+                SELECT 
+                    ti.transaccion_id,
+                    ti.producto_id,
+                    p.nombre,
+                    ti.cantidad,
+                    ti.precio_unitario
+                FROM transaccion_items ti
+                LEFT JOIN productos p ON ti.producto_id = p.id
+                WHERE ti.transaccion_id IN ({marcadores})
+                ORDER BY ti.transaccion_id, ti.id
+            """, tuple(transaccion_ids))
+            items = {}
+            for item in cursor.fetchall():
+                items.setdefault(item.pop('transaccion_id'), []).append(item)
+            return items
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def obtener_productos_mas_vendidos(fecha_inicio=None, fecha_fin=None, punto_venta_id=None, limite=10):
+        """
+        Obtiene los productos más vendidos desde resumen_productos_hora
+
+        Args:
+            fecha_inicio (str, optional): Fecha de inicio (YYYY-MM-DD)
+            fecha_fin (str, optional): Fecha de fin (YYYY-MM-DD)
+            punto_venta_id (int, optional): ID del punto de venta para filtrar
+            limite (int): Número de productos a retornar
+
+        Returns:
+            list: Lista de diccionarios con producto_id, producto, cantidad y total
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            condiciones, params = Transaccion._filtros_transacciones(
+                fecha_inicio, fecha_fin, punto_venta_id, alias='r', columna_fecha='hora'
+            )
+            params.append(limite)
+            cursor.execute(f"""
+                SELECT 
+                    NULLIF(r.producto_id, 0) as producto_id,
+                    p.nombre as producto,
+                    CAST(SUM(r.cantidad) AS SIGNED) as cantidad,
+                    SUM(r.monto) as total
+                FROM resumen_productos_hora r
+                LEFT JOIN productos p ON r.producto_id = p.id
+                WHERE 1=1 {condiciones}
+                GROUP BY r.producto_id, p.nombre
+                ORDER BY cantidad DESC
+                LIMIT %s
+            """, tuple(params))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def obtener_ventas_por_tipo(fecha_inicio=None, fecha_fin=None, punto_venta_id=None):
+        """
+        Obtiene unidades y monto vendidos por tipo de producto desde resumen_productos_hora
+
+        Args:
+            fecha_inicio (str, optional): Fecha de inicio (YYYY-MM-DD)
+            fecha_fin (str, optional): Fecha de fin (YYYY-MM-DD)
+            punto_venta_id (int, optional): ID del punto de venta para filtrar
+
+        Returns:
+            list: Lista de diccionarios con tipo, cantidad y total (de mayor a menor monto)
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            condiciones, params = Transaccion._filtros_transacciones(
+                fecha_inicio, fecha_fin, punto_venta_id, alias='r', columna_fecha='hora'
+            )
+            cursor.execute(f"""
+                SELECT 
+                    r.tipo_producto as tipo,
+                    CAST(SUM(r.cantidad) AS SIGNED) as cantidad,
+                    SUM(r.monto) as total
+                FROM resumen_productos_hora r
+                WHERE 1=1 {condiciones}
+                GROUP BY r.tipo_producto
+                ORDER BY total DESC
+            """, tuple(params))
             return cursor.fetchall()
         finally:
             cursor.close()
             connection.close()
-    
+
     @staticmethod
-    def obtener_ventas(fecha_inicio=None, fecha_fin=None, punto_venta_id=None):
+    def obtener_resumen_ventas(fecha_inicio=None, fecha_fin=None, punto_venta_id=None):
         """
-        Obtiene todas las transacciones de tipo 'pago' (ventas) con información completa
+        Obtiene resumen de ventas: totales, por punto de venta y por hora
+        
+        Lee resumen_transacciones_hora (unas filas por hora y punto de venta)
+        en lugar de agregar todas las filas de transacciones. Una sola consulta
+        agrupada WITH ROLLUP retorna las celdas (punto de venta, hora), el
+        subtotal de cada punto de venta y el total general, así que todas las
+        cifras salen de la misma lectura. Las columnas del resumen nunca son
+        NULL, de modo que un NULL en el grupo identifica una fila de ROLLUP.
         
         Args:
             fecha_inicio (str, optional): Fecha de inicio (YYYY-MM-DD)
@@ -372,194 +1296,279 @@ class Transaccion:
             punto_venta_id (int, optional): ID del punto de venta para filtrar
             
         Returns:
-            list: Lista de diccionarios con las ventas
+            dict: {'totales', 'ventas_por_punto_venta', 'ventas_por_hora'}
         """
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         try:
-            query = """
+            condiciones, params = Transaccion._filtros_transacciones(
+                fecha_inicio, fecha_fin, punto_venta_id, alias='r', columna_fecha='hora'
+            )
+            cursor.execute(f"""
                 SELECT 
-                    t.id,
-                    t.fecha_transaccion,
-                    t.monto,
-                    t.descripcion,
-                    t.saldo_anterior,
-                    t.saldo_nuevo,
-                    tar.numero_tarjeta,
-                    a.nombre as asistente_nombre,
-                    a.id as asistente_id,
-                    pv.id as punto_venta_id,
-                    pv.nombre as punto_venta_nombre
-                FROM transacciones t
-                JOIN tarjetas tar ON t.tarjeta_id = tar.id
-                JOIN asistentes a ON tar.asistente_id = a.id
-                LEFT JOIN puntos_venta pv ON t.punto_venta_id = pv.id
-                WHERE t.tipo = 'pago'
-            """
-            params = []
-            
-            if fecha_inicio:
-                query += " AND DATE(t.fecha_transaccion) >= %s"
-                params.append(fecha_inicio)
+                    r.punto_venta_id,
+                    r.hora,
+                    MAX(pv.nombre) as nombre,
+                    CAST(SUM(r.cantidad) AS SIGNED) as total_ventas,
+                    SUM(r.monto) as total_monto
+                FROM resumen_transacciones_hora r
+                LEFT JOIN puntos_venta pv ON r.punto_venta_id = pv.id
+                WHERE r.tipo = 'pago' {condiciones}
+                GROUP BY r.punto_venta_id, r.hora WITH ROLLUP
+            """, tuple(params))
             
-            if fecha_fin:
-                query += " AND DATE(t.fecha_transaccion) <= %s"
-                params.append(fecha_fin)
+            totales = {'total_ventas': 0, 'total_monto': None, 'promedio_venta': None}
+            ventas_por_pv = []
+            ventas_por_hora = {}
+            for fila in cursor.fetchall():
+                if fila['punto_venta_id'] is None:
+                    # Total general
+                    totales['total_ventas'] = fila['total_ventas']
+                    totales['total_monto'] = fila['total_monto']
+                    if fila['total_ventas']:
+                        totales['promedio_venta'] = fila['total_monto'] / fila['total_ventas']
+                elif fila['hora'] is None:
+                    # Subtotal del punto de venta
+                    ventas_por_pv.append({
+                        'id': fila['punto_venta_id'] or None,
+                        'nombre': fila['nombre'],
+                        'total_ventas': fila['total_ventas'],
+                        'total_monto': fila['total_monto']
+                    })
+                else:
+                    hora = ventas_por_hora.setdefault(
+                        fila['hora'], {'hora': fila['hora'], 'total_ventas': 0, 'total_monto': 0}
+                    )
+                    hora['total_ventas'] += fila['total_ventas']
+                    hora['total_monto'] += fila['total_monto']
             
-            if punto_venta_id:
-                query += " AND t.punto_venta_id = %s"
-                params.append(punto_venta_id)
-            
-            query += " ORDER BY t.fecha_transaccion DESC"
-            
-            cursor.execute(query, tuple(params))
-            return cursor.fetchall()
+            ventas_por_pv.sort(key=lambda pv: pv['total_monto'], reverse=True)
+            return {
+                'totales': totales,
+                'ventas_por_punto_venta': ventas_por_pv,
+                'ventas_por_hora': [ventas_por_hora[hora] for hora in sorted(ventas_por_hora)]
+            }
         finally:
             cursor.close()
             connection.close()
-    
+
+class ResumenVentas:
+    """
+    Tablas de resumen por hora de transacciones y productos vendidos
+
+    resumen_transacciones_hora y resumen_productos_hora se actualizan en la
+    misma transacción que cada pago o recarga, así que siempre coinciden con
+    transacciones y transaccion_items. Los productos se resumen por tipo y
+    producto: el tipo se guarda al vender, así un cambio de tipo posterior no
+    mueve las ventas ya resumidas. Cada combinación se reparte en FRAGMENTOS
+    filas según la tarjeta, para que los cobros simultáneos en un mismo punto
+    de venta no esperen todos el bloqueo de una sola fila.
+    """
+
+    FRAGMENTOS = 4
+
+    # Las mismas agrupaciones sirven para acumular transacciones recién
+    # insertadas y para reconstruir un rango completo; {filtro} se completa
+    # con la condición sobre t y el orden de clave primaria evita que dos
+    # lotes se bloqueen en orden cruzado. Las columnas del UPDATE llevan el
+    # nombre de la tabla porque transacciones y transaccion_items también
+    # tienen monto y cantidad
+    _SQL_TRANSACCIONES = f"""
+        INSERT INTO resumen_transacciones_hora (hora, tipo, punto_venta_id, fragmento, cantidad, monto)
+        SELECT 
+            DATE_FORMAT(t.fecha_transaccion, '%Y-%m-%d %H:00:00') as hora_resumen,
+            t.tipo,
+            COALESCE(t.punto_venta_id, 0),
+            t.tarjeta_id % {FRAGMENTOS},
+            COUNT(*),
+            SUM(t.monto)
+        FROM transacciones t
+        WHERE {{filtro}}
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON DUPLICATE KEY UPDATE
+            cantidad = resumen_transacciones_hora.cantidad + VALUES(cantidad),
+            monto = resumen_transacciones_hora.monto + VALUES(monto)
+    """
+    _SQL_PRODUCTOS = f"""
+        INSERT INTO resumen_productos_hora
+        (hora, punto_venta_id, tipo_producto, producto_id, fragmento, cantidad, monto)
+        SELECT 
+            DATE_FORMAT(t.fecha_transaccion, '%Y-%m-%d %H:00:00') as hora_resumen,
+            COALESCE(t.punto_venta_id, 0),
+            COALESCE(p.tipo, ''),
+            COALESCE(ti.producto_id, 0),
+            t.tarjeta_id % {FRAGMENTOS},
+            SUM(ti.cantidad),
+            SUM(ti.cantidad * ti.precio_unitario)
+        FROM transaccion_items ti
+        JOIN transacciones t ON ti.transaccion_id = t.id
+        LEFT JOIN productos p ON ti.producto_id = p.id
+        WHERE {{filtro}}
+        GROUP BY 1, 2, 3, 4, 5
+        ORDER BY 1, 2, 3, 4, 5
+        ON DUPLICATE KEY UPDATE
+            cantidad = resumen_productos_hora.cantidad + VALUES(cantidad),
+            monto = resumen_productos_hora.monto + VALUES(monto)
+    """
+
     @staticmethod
-    def obtener_todas_transacciones(fecha_inicio=None, fecha_fin=None, tipo=None, punto_venta_id=None):
+    def acumular(cursor, transaccion_ids, con_items=False):
         """
-        Obtiene todas las transacciones (recargas y pagos) con información completa
-        
+        Suma transacciones recién insertadas a las filas de resumen de su hora
+
+        Las filas se agrupan en SQL desde las transacciones insertadas, así la
+        hora sale del mismo fecha_transaccion sin leerlo de vuelta. Al
+        confirmarse la transacción se avisa al feed en vivo del dashboard
+        (eventos.canal_transacciones y la generación 'transacciones').
+
         Args:
-            fecha_inicio (str, optional): Fecha de inicio (YYYY-MM-DD)
-            fecha_fin (str, optional): Fecha de fin (YYYY-MM-DD)
-            tipo (str, optional): 'recarga' o 'pago' para filtrar
-            punto_venta_id (int, optional): ID del punto de venta para filtrar
-            
+            cursor: Cursor de la transacción que las insertó
+            transaccion_ids (list): IDs de las transacciones
+            con_items (bool): Si alguna tiene productos en transaccion_items
+        """
+        marcadores = ', '.join(['%s'] * len(transaccion_ids))
+        filtro = f"t.id IN ({marcadores})"
+        cursor.execute(ResumenVentas._SQL_TRANSACCIONES.format(filtro=filtro), tuple(transaccion_ids))
+        if con_items:
+            cursor.execute(ResumenVentas._SQL_PRODUCTOS.format(filtro=filtro), tuple(transaccion_ids))
+
+        ids = list(transaccion_ids)
+        def avisar():
+            # Despierta el feed en vivo de este worker y, por la tabla de
+            # generaciones, el de los demás procesos
+            canal_transacciones.publicar(ids)
+            publicar('transacciones')
+        al_confirmar(avisar)
+
+    @staticmethod
+    def reconstruir(desde=None, dias_por_bloque=1, al_avanzar=None):
+        """
+        Recalcula las filas de resumen a partir de transacciones y transaccion_items
+
+        Sirve para llenar los resúmenes después de la migración 0007, para
+        repararlos o para incluir transacciones escritas por una versión
+        anterior de la aplicación. Recorre el historial por rangos de fechas
+        y confirma cada rango por separado, así ninguna transacción bloquea
+        por mucho tiempo las filas de resumen ni el historial completo.
+
+        Args:
+            desde (datetime, optional): Recalcular solo desde esta hora (None = todo)
+            dias_por_bloque (int): Días de transacciones por cada transacción de la reconstrucción
+            al_avanzar (callable, optional): Se llama con el fin de cada rango confirmado
+
         Returns:
-            list: Lista de diccionarios con las transacciones
+            int: Filas de resumen de transacciones generadas
         """
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
         try:
-            query = """
-                SELECT 
-                    t.id,
-                    t.fecha_transaccion,
-                    t.tipo,
-                    t.monto,
-                    t.descripcion,
-                    t.saldo_anterior,
-                    t.saldo_nuevo,
-                    tar.numero_tarjeta,
-                    a.nombre as asistente_nombre,
-                    a.id as asistente_id,
-                    pv.id as punto_venta_id,
-                    pv.nombre as punto_venta_nombre
-                FROM transacciones t
-                JOIN tarjetas tar ON t.tarjeta_id = tar.id
-                JOIN asistentes a ON tar.asistente_id = a.id
-                LEFT JOIN puntos_venta pv ON t.punto_venta_id = pv.id
-                WHERE 1=1
-            """
-            params = []
-            
-            if fecha_inicio:
-                query += " AND DATE(t.fecha_transaccion) >= %s"
-                params.append(fecha_inicio)
-            
-            if fecha_fin:
-                query += " AND DATE(t.fecha_transaccion) <= %s"
-                params.append(fecha_fin)
-            
-            if tipo:
-                query += " AND t.tipo = %s"
-                params.append(tipo)
-            
-            if punto_venta_id:
-                query += " AND t.punto_venta_id = %s"
-                params.append(punto_venta_id)
-            
-            query += " ORDER BY t.fecha_transaccion DESC"
-            
-            cursor.execute(query, tuple(params))
-            return cursor.fetchall()
+            desde = desde.replace(minute=0, second=0, microsecond=0) if desde else datetime(1970, 1, 1)
+            cursor.execute(
+                "SELECT MIN(fecha_transaccion), MAX(fecha_transaccion) FROM transacciones WHERE fecha_transaccion >= %s",
+                (desde,)
+            )
+            primera, ultima = cursor.fetchone()
+
+            filas = 0
+            filtro = "t.fecha_transaccion >= %s AND t.fecha_transaccion < %s"
+            inicio = desde
+            while True:
+                # El primer rango cubre también las horas vacías antes de la
+                # primera transacción y el último queda abierto (incluye lo que
+                # se cobre mientras tanto y borra resúmenes sin transacciones)
+                fin = max(inicio, primera or inicio).replace(minute=0, second=0, microsecond=0)
+                fin += timedelta(days=dias_por_bloque)
+                ultimo_bloque = ultima is None or fin > ultima
+                if ultimo_bloque:
+                    fin = datetime(9999, 1, 1)
+                cursor.execute("DELETE FROM resumen_transacciones_hora WHERE hora >= %s AND hora < %s", (inicio, fin))
+                cursor.execute("DELETE FROM resumen_productos_hora WHERE hora >= %s AND hora < %s", (inicio, fin))
+                cursor.execute(ResumenVentas._SQL_TRANSACCIONES.format(filtro=filtro), (inicio, fin))
+                filas += cursor.rowcount
+                cursor.execute(ResumenVentas._SQL_PRODUCTOS.format(filtro=filtro), (inicio, fin))
+                connection.commit()
+                if al_avanzar:
+                    al_avanzar(min(fin, ultima or fin))
+                if ultimo_bloque:
+                    return filas
+                inicio = fin
+        except Error as e:
+            connection.rollback()
+            raise e
         finally:
             cursor.close()
             connection.close()
+
+class Catalogo:
+    """
+    Productos, tipos y puntos de venta en memoria del proceso
+    
+    Se consultan en cada carga del POS y en cada venta pero cambian muy poco:
+    se leen completos de una vez y se reutilizan hasta que PuntoVenta o
+    Producto publican un cambio (en cualquier worker, ver invalidacion.py).
+    Los valores retornados son copias: se pueden modificar sin afectar al caché.
+    """
+    
+    _cache = CacheReferencia('catalogo', ('productos', 'puntos_venta'), tabla_generaciones)
     
     @staticmethod
-    def obtener_resumen_ventas(fecha_inicio=None, fecha_fin=None, punto_venta_id=None):
+    def _cargar():
         """
-        Obtiene resumen de ventas por punto de venta y productos más vendidos
+        Lee el catálogo completo con la conexión de la petición
         
-        Args:
-            fecha_inicio (str, optional): Fecha de inicio (YYYY-MM-DD)
-            fecha_fin (str, optional): Fecha de fin (YYYY-MM-DD)
-            punto_venta_id (int, optional): ID del punto de venta para filtrar
-            
         Returns:
-            dict: Resumen con totales y estadísticas
+            tuple: (catálogo, si se puede guardar en el caché). Solo se guarda lo
+                leído al abrir la transacción: instantánea nueva y sin cambios
+                propios sin confirmar (ver Tarjeta.obtener_por_numero)
         """
         connection = get_db_connection()
+        guardar = not connection.in_transaction
         cursor = connection.cursor(dictionary=True)
         try:
-            # Totales generales
-            query_total = """
-                SELECT 
-                    COUNT(*) as total_ventas,
-                    SUM(t.monto) as total_monto,
-                    AVG(t.monto) as promedio_venta
-                FROM transacciones t
-                WHERE t.tipo = 'pago'
-            """
-            params_total = []
-            
-            if fecha_inicio:
-                query_total += " AND DATE(t.fecha_transaccion) >= %s"
-                params_total.append(fecha_inicio)
-            
-            if fecha_fin:
-                query_total += " AND DATE(t.fecha_transaccion) <= %s"
-                params_total.append(fecha_fin)
-            
-            if punto_venta_id:
-                query_total += " AND t.punto_venta_id = %s"
-                params_total.append(punto_venta_id)
-            
-            cursor.execute(query_total, tuple(params_total))
-            totales = cursor.fetchone()
-            
-            # Ventas por punto de venta
-            query_pv = """
-                SELECT 
-                    pv.id,
-                    pv.nombre,
-                    COUNT(*) as total_ventas,
-                    SUM(t.monto) as total_monto
-                FROM transacciones t
-                LEFT JOIN puntos_venta pv ON t.punto_venta_id = pv.id
-                WHERE t.tipo = 'pago'
-            """
-            params_pv = []
-            
-            if fecha_inicio:
-                query_pv += " AND DATE(t.fecha_transaccion) >= %s"
-                params_pv.append(fecha_inicio)
-            
-            if fecha_fin:
-                query_pv += " AND DATE(t.fecha_transaccion) <= %s"
-                params_pv.append(fecha_fin)
-            
-            if punto_venta_id:
-                query_pv += " AND t.punto_venta_id = %s"
-                params_pv.append(punto_venta_id)
-            
-            query_pv += " GROUP BY pv.id, pv.nombre ORDER BY total_monto DESC"
-            
-            cursor.execute(query_pv, tuple(params_pv))
-            ventas_por_pv = cursor.fetchall()
-            
+            cursor.execute("SELECT * FROM puntos_venta ORDER BY nombre")
+            puntos_venta = cursor.fetchall()
+            cursor.execute("""
+                SELECT p.*, pv.nombre as punto_venta_nombre 
+                FROM productos p
+                LEFT JOIN puntos_venta pv ON p.punto_venta_id = pv.id
+                WHERE p.activo = TRUE 
+                ORDER BY p.tipo, p.nombre
+            """)
+            productos = cursor.fetchall()
+            cursor.execute("SELECT DISTINCT tipo FROM productos WHERE activo = TRUE ORDER BY tipo")
+            tipos = [row['tipo'] for row in cursor.fetchall()]
+            productos_por_punto_venta = {}
+            for producto in productos:
+                productos_por_punto_venta.setdefault(producto['punto_venta_id'], []).append(producto)
             return {
-                'totales': totales,
-                'ventas_por_punto_venta': ventas_por_pv
-            }
+                'puntos_venta': {pv['id']: pv for pv in puntos_venta},
+                'puntos_venta_activos': [pv for pv in puntos_venta if pv['activo']],
+                'productos': productos,
+                'productos_por_id': {p['id']: p for p in productos},
+                'productos_por_punto_venta': productos_por_punto_venta,
+                'tipos': tipos
+            }, guardar
         finally:
             cursor.close()
             connection.close()
+    
+    @staticmethod
+    def obtener():
+        """
+        Retorna el catálogo vigente (cargándolo si cambió)
+        
+        Returns:
+            dict: puntos_venta (por id), puntos_venta_activos, productos (activos),
+                productos_por_id, productos_por_punto_venta y tipos.
+                No modificar: usar las copias de los modelos.
+        """
+        return Catalogo._cache.obtener_o_cargar(Catalogo._cargar)
+    
+    @staticmethod
+    def precargar():
+        """Carga el catálogo al iniciar el worker, antes de la primera petición"""
+        Catalogo.obtener()
 
 class PuntoVenta:
     """Modelo para manejar puntos de venta"""
@@ -572,14 +1581,7 @@ class PuntoVenta:
         Returns:
             list: Lista de diccionarios con los puntos de venta
         """
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        try:
-            cursor.execute("SELECT * FROM puntos_venta WHERE activo = TRUE ORDER BY nombre")
-            return cursor.fetchall()
-        finally:
-            cursor.close()
-            connection.close()
+        return [dict(pv) for pv in Catalogo.obtener()['puntos_venta_activos']]
     
     @staticmethod
     def obtener_por_id(punto_venta_id):
@@ -592,14 +1594,18 @@ class PuntoVenta:
         Returns:
             dict: Datos del punto de venta o None
         """
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM puntos_venta WHERE id = %s", (punto_venta_id,))
-            return cursor.fetchone()
-        finally:
-            cursor.close()
-            connection.close()
+            punto_venta_id = int(punto_venta_id)
+        except (TypeError, ValueError):
+            return None  # Los formularios lo envían como texto
+        punto_venta = Catalogo.obtener()['puntos_venta'].get(punto_venta_id)
+        return dict(punto_venta) if punto_venta else None
+    
+    @staticmethod
+    def _leer_por_id(cursor, punto_venta_id):
+        """Lee el punto de venta en la transacción actual (sin pasar por el catálogo)"""
+        cursor.execute("SELECT * FROM puntos_venta WHERE id = %s", (punto_venta_id,))
+        return cursor.fetchone()
 
     @staticmethod
     def crear(nombre, tipo, activo=True):
@@ -622,8 +1628,8 @@ class PuntoVenta:
                 VALUES (%s, %s, %s)
             """, (nombre, tipo, activo))
             connection.commit()
-            pv_id = cursor.lastrowid
-            return PuntoVenta.obtener_por_id(pv_id)
+            al_confirmar(lambda: publicar('puntos_venta'))
+            return PuntoVenta._leer_por_id(cursor, cursor.lastrowid)
         except Error as e:
             connection.rollback()
             raise e
@@ -643,7 +1649,7 @@ class PuntoVenta:
         cursor = connection.cursor(dictionary=True)
         try:
             # Verificar existe
-            actual = PuntoVenta.obtener_por_id(punto_venta_id)
+            actual = PuntoVenta._leer_por_id(cursor, punto_venta_id)
             if not actual:
                 return None
 
@@ -666,7 +1672,8 @@ class PuntoVenta:
             values.append(punto_venta_id)
             cursor.execute(f"UPDATE puntos_venta SET {', '.join(updates)} WHERE id = %s", values)
             connection.commit()
-            return PuntoVenta.obtener_por_id(punto_venta_id)
+            al_confirmar(lambda: publicar('puntos_venta'))
+            return PuntoVenta._leer_por_id(cursor, punto_venta_id)
         except Error as e:
             connection.rollback()
             raise e
@@ -690,20 +1697,7 @@ class Producto:
         Returns:
             list: Lista de diccionarios con los productos
         """
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        try:
-            cursor.execute("""
-                SELECT p.*, pv.nombre as punto_venta_nombre 
-                FROM productos p
-                LEFT JOIN puntos_venta pv ON p.punto_venta_id = pv.id
-                WHERE p.activo = TRUE 
-                ORDER BY p.tipo, p.nombre
-            """)
-            return cursor.fetchall()
-        finally:
-            cursor.close()
-            connection.close()
+        return [dict(p) for p in Catalogo.obtener()['productos']]
     
     @staticmethod
     def listar_por_tipo(tipo):
@@ -716,20 +1710,27 @@ class Producto:
         Returns:
             list: Lista de productos del tipo especificado
         """
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        try:
-            cursor.execute("""
-                SELECT p.*, pv.nombre as punto_venta_nombre 
-                FROM productos p
-                LEFT JOIN puntos_venta pv ON p.punto_venta_id = pv.id
-                WHERE p.activo = TRUE AND p.tipo = %s
-                ORDER BY p.nombre
-            """, (tipo,))
-            return cursor.fetchall()
-        finally:
-            cursor.close()
-            connection.close()
+        # Como en MySQL (collation _ci), el tipo se compara sin distinguir mayúsculas
+        tipo = tipo.casefold()
+        return [dict(p) for p in Catalogo.obtener()['productos'] if p['tipo'].casefold() == tipo]
+    
+    @staticmethod
+    def listar_por_punto_venta(punto_venta_id, tipo=None):
+        """
+        Lista el menú de un punto de venta (productos activos asignados a él)
+        
+        Args:
+            punto_venta_id (int): ID del punto de venta
+            tipo (str, optional): Tipo de producto para filtrar
+            
+        Returns:
+            list: Productos del punto de venta, ordenados por tipo y nombre
+        """
+        productos = Catalogo.obtener()['productos_por_punto_venta'].get(punto_venta_id, [])
+        if tipo:
+            tipo = tipo.casefold()
+            productos = [p for p in productos if p['tipo'].casefold() == tipo]
+        return [dict(p) for p in productos]
     
     @staticmethod
     def obtener_tipos():
@@ -739,14 +1740,7 @@ class Producto:
         Returns:
             list: Lista de tipos de productos
         """
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        try:
-            cursor.execute("SELECT DISTINCT tipo FROM productos WHERE activo = TRUE ORDER BY tipo")
-            return [row[0] for row in cursor.fetchall()]
-        finally:
-            cursor.close()
-            connection.close()
+        return list(Catalogo.obtener()['tipos'])
     
     @staticmethod
     def crear(nombre, precio, tipo, punto_venta_id=None, descripcion=None, imagen_url=None):
@@ -772,6 +1766,7 @@ class Producto:
                 VALUES (%s, %s, %s, %s, %s, %s)
             """, (nombre, precio, tipo, punto_venta_id, descripcion, imagen_url))
             connection.commit()
+            al_confirmar(lambda: publicar('productos'))
             producto_id = cursor.lastrowid
             cursor.execute("SELECT * FROM productos WHERE id = %s", (producto_id,))
             return cursor.fetchone()
@@ -799,6 +1794,20 @@ class Producto:
             cursor.close()
             connection.close()
     
+    @staticmethod
+    def obtener_por_ids(producto_ids):
+        """
+        Obtiene varios productos activos por su ID (del catálogo en memoria)
+        
+        Args:
+            producto_ids (list): IDs de los productos
+            
+        Returns:
+            dict: {producto_id: datos del producto} (solo los que existen y están activos)
+        """
+        productos = Catalogo.obtener()['productos_por_id']
+        return {pid: dict(productos[pid]) for pid in producto_ids if pid in productos}
+    
     @staticmethod
     def actualizar(producto_id, nombre=None, precio=None, tipo=None, punto_venta_id=None, descripcion=None, imagen_url=None, activo=None):
         """
@@ -852,11 +1861,147 @@ class Producto:
             query = f"UPDATE productos SET {', '.join(updates)} WHERE id = %s"
             cursor.execute(query, values)
             connection.commit()
+            al_confirmar(lambda: publicar('productos'))
             return Producto.obtener_por_id(producto_id)
         finally:
             cursor.close()
             connection.close()
     
+    # Columnas que se pueden cargar o modificar con guardar_lote
+    COLUMNAS_LOTE = ('nombre', 'precio', 'tipo', 'punto_venta_id', 'descripcion', 'imagen_url', 'activo')
+    
+    @staticmethod
+    def guardar_lote(productos):
+        """
+        Crea o actualiza varios productos en una sola transacción
+        
+        Cada producto con `id` actualiza ese producto; sin `id` se busca uno con
+        el mismo nombre (sin distinguir mayúsculas) en el mismo punto de venta y,
+        si no existe, se crea. Las columnas que no vienen se conservan. Las
+        actualizaciones se escriben con un INSERT ... ON DUPLICATE KEY UPDATE de
+        varias filas y los productos nuevos con un INSERT aparte, del que se
+        leen los ids asignados. Si algún `id` no existe, a algún producto nuevo
+        le falta nombre, precio o tipo, o dos productos del lote son el mismo,
+        no se escribe nada.
+        
+        Args:
+            productos (list): Diccionarios ya validados con `id` o `nombre` y
+                las columnas de COLUMNAS_LOTE que se quieren guardar
+                
+        Returns:
+            list: Un diccionario por producto con 'estado' ('creado', 'actualizado',
+                'sin_cambios', 'no_encontrado', 'incompleto' o 'duplicado') e 'id'
+        """
+        if not productos:
+            return []
+        
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            ids = sorted({p['id'] for p in productos if p.get('id') is not None})
+            nombres = sorted({p['nombre'] for p in productos if p.get('id') is None})
+            condiciones = []
+            if ids:
+                condiciones.append(f"id IN ({', '.join(['%s'] * len(ids))})")
+            if nombres:
+                condiciones.append(f"nombre IN ({', '.join(['%s'] * len(nombres))})")
+            cursor.execute(f"""
+                SELECT * FROM productos WHERE {' OR '.join(condiciones)} ORDER BY id FOR UPDATE
+            """, tuple(ids) + tuple(nombres))
+            existentes = cursor.fetchall()
+            por_id = {p['id']: p for p in existentes}
+            por_nombre = {}
+            for p in existentes:
+                por_nombre.setdefault((p['nombre'].casefold(), p['punto_venta_id']), p)
+            
+            resultados = []
+            actualizados = []
+            nuevos = []
+            vistos = set()
+            for producto in productos:
+                if producto.get('id') is not None:
+                    actual = por_id.get(producto['id'])
+                    if actual is None:
+                        resultados.append({'estado': 'no_encontrado', 'id': producto['id']})
+                        continue
+                else:
+                    actual = por_nombre.get((producto['nombre'].casefold(), producto.get('punto_venta_id')))
+                
+                # Dos filas que terminan en el mismo producto (mismo id, o el mismo
+                # nombre nuevo en el mismo punto de venta) no se pueden aplicar juntas
+                if actual is not None:
+                    clave = ('id', actual['id'])
+                else:
+                    clave = ('nuevo', producto['nombre'].casefold(), producto.get('punto_venta_id'))
+                if clave in vistos:
+                    resultados.append({'estado': 'duplicado', 'id': actual['id'] if actual else None})
+                    continue
+                vistos.add(clave)
+                
+                if actual is None:
+                    if not all(c in producto for c in ('nombre', 'precio', 'tipo')):
+                        resultados.append({'estado': 'incompleto', 'id': None})
+                        continue
+                    nuevo = {'punto_venta_id': None, 'descripcion': None, 'imagen_url': None, 'activo': True}
+                    nuevo.update((c, producto[c]) for c in Producto.COLUMNAS_LOTE if c in producto)
+                    resultado = {'estado': 'creado', 'id': None}
+                    nuevos.append((resultado, tuple(nuevo[c] for c in Producto.COLUMNAS_LOTE)))
+                    resultados.append(resultado)
+                    continue
+                
+                cambios = {
+                    c: producto[c] for c in Producto.COLUMNAS_LOTE
+                    if c in producto and producto[c] != (bool(actual[c]) if c == 'activo' else actual[c])
+                }
+                if cambios:
+                    actual.update(cambios)
+                    actualizados.append((actual['id'],) + tuple(actual[c] for c in Producto.COLUMNAS_LOTE))
+                resultados.append({'estado': 'actualizado' if cambios else 'sin_cambios', 'id': actual['id']})
+            
+            rechazado = any(r['estado'] in ('no_encontrado', 'incompleto', 'duplicado') for r in resultados)
+            if rechazado or not (actualizados or nuevos):
+                return resultados
+            
+            if actualizados:
+                # mysql.connector agrupa este executemany en un solo INSERT de varias
+                # filas; todos los ids existen, así que cada fila actualiza su producto
+                cursor.executemany("""
+                    INSERT INTO productos (id, nombre, precio, tipo, punto_venta_id, descripcion, imagen_url, activo)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        nombre = VALUES(nombre), precio = VALUES(precio), tipo = VALUES(tipo),
+                        punto_venta_id = VALUES(punto_venta_id), descripcion = VALUES(descripcion),
+                        imagen_url = VALUES(imagen_url), activo = VALUES(activo)
+                """, actualizados)
+            
+            if nuevos:
+                cursor.executemany("""
+                    INSERT INTO productos (nombre, precio, tipo, punto_venta_id, descripcion, imagen_url, activo)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, [fila for _, fila in nuevos])
+                # lastrowid es el id de la primera fila del INSERT: las filas con id
+                # desde ahí y alguno de estos nombres son las recién creadas (el
+                # SELECT ... FOR UPDATE de arriba impide que otra transacción cree
+                # los mismos nombres mientras tanto, y en el lote no se repiten)
+                nombres_nuevos = sorted({fila[0] for _, fila in nuevos})
+                cursor.execute(f"""
+                    SELECT id, nombre, punto_venta_id FROM productos
+                    WHERE id >= %s AND nombre IN ({', '.join(['%s'] * len(nombres_nuevos))})
+                """, (cursor.lastrowid,) + tuple(nombres_nuevos))
+                ids_nuevos = {(p['nombre'].casefold(), p['punto_venta_id']): p['id'] for p in cursor.fetchall()}
+                for resultado, fila in nuevos:
+                    resultado['id'] = ids_nuevos.get((fila[0].casefold(), fila[3]))
+            
+            connection.commit()
+            al_confirmar(lambda: publicar('productos'))
+            return resultados
+        except Error as e:
+            connection.rollback()
+            raise e
+        finally:
+            cursor.close()
+            connection.close()
+    
     @staticmethod
     def eliminar(producto_id):
         """
@@ -965,4 +2110,113 @@ class Usuario:
             raise e
         finally:
             cursor.close()
-            connection.close()
\ No newline at end of file
+            connection.close()
+
+class ClaveIdempotencia:
+    """
+    Modelo para claves de idempotencia de pagos y recargas
+
+    Guarda la respuesta de cada operación confirmada para que un reintento
+    con la misma clave devuelva el resultado original sin volver a cobrar.
+    Las respuestas ya confirmadas se mantienen también en un caché en memoria.
+    """
+
+    _cache = CacheLRU('idempotencia', max_entradas=2048, ttl=3600)
+
+    @staticmethod
+    def obtener(endpoint, clave, bloquear=False):
+        """
+        Obtiene la respuesta guardada para una clave
+
+        Args:
+            endpoint (str): Operación a la que pertenece la clave
+            clave (str): Clave de idempotencia enviada por el cliente
+            bloquear (bool): Usar una lectura con bloqueo compartido, que ve
+                las claves confirmadas por otras transacciones en curso
+
+        Returns:
+            dict: {huella, codigo_estado, respuesta} o None si no existe.
+                  codigo_estado es None si la operación original no ha terminado
+        """
+        guardada = ClaveIdempotencia._cache.obtener((endpoint, clave))
+        if guardada:
+            return guardada
+
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(f"""
+                SELECT huella, codigo_estado, respuesta
+                FROM claves_idempotencia
+                WHERE endpoint = %s AND clave = %s
+                {'LOCK IN SHARE MODE' if bloquear else ''}
+            """, (endpoint, clave))
+            guardada = cursor.fetchone()
+            if guardada and guardada['codigo_estado'] is not None:
+                ClaveIdempotencia._cache.poner((endpoint, clave), guardada)
+            return guardada
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def reservar(endpoint, clave, huella):
+        """
+        Reserva una clave antes de ejecutar la operación
+
+        Si otra petición con la misma clave está en curso, el INSERT espera a
+        que termine: si se confirmó, la reserva falla; si se descartó, esta
+        petición se queda con la clave.
+
+        Returns:
+            bool: True si se reservó, False si la clave ya existía
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO claves_idempotencia (endpoint, clave, huella)
+                VALUES (%s, %s, %s)
+            """, (endpoint, clave, huella))
+            connection.commit()
+            return True
+        except Error as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                return False
+            connection.rollback()
+            raise e
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def completar(endpoint, clave, huella, codigo_estado, respuesta):
+        """
+        Guarda la respuesta de la operación junto a su clave
+
+        Args:
+            endpoint (str): Operación a la que pertenece la clave
+            clave (str): Clave de idempotencia
+            huella (str): Huella del cuerpo de la petición original
+            codigo_estado (int): Código HTTP de la respuesta
+            respuesta (str): Cuerpo JSON de la respuesta
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE claves_idempotencia
+                SET codigo_estado = %s, respuesta = %s
+                WHERE endpoint = %s AND clave = %s
+            """, (codigo_estado, respuesta, endpoint, clave))
+            connection.commit()
+        except Error as e:
+            connection.rollback()
+            raise e
+        finally:
+            cursor.close()
+            connection.close()
+
+        # Solo se cachea cuando la operación quedó confirmada
+        guardada = {'huella': huella, 'codigo_estado': codigo_estado, 'respuesta': respuesta}
+        al_confirmar(lambda: ClaveIdempotencia._cache.poner((endpoint, clave), guardada))
@@ -0,0 +1,47 @@
+"""
+Script para recalcular las tablas de resumen por hora desde transacciones
+
+Uso:
+    python reconstruir_resumenes.py                      # Todo el historial
+    python reconstruir_resumenes.py --desde 2026-01-07   # Desde una fecha (YYYY-MM-DD[ HH:MM])
+    python reconstruir_resumenes.py --dias 7             # Confirmar cada 7 días de historial
+
+Después de aplicar la migración 0007 hay que ejecutarlo una vez sin --desde
+para cargar los resúmenes del historial existente.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from models import ResumenVentas
+
+def leer_fecha(texto):
+    for formato in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"Fecha inválida: {texto} (usar YYYY-MM-DD o 'YYYY-MM-DD HH:MM')")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recalcular los resúmenes de ventas por hora')
+    parser.add_argument('--desde', type=leer_fecha, help='Recalcular desde esta fecha (default: todo)')
+    parser.add_argument('--dias', type=int, default=1, help='Días de historial por transacción (default: 1)')
+    args = parser.parse_args()
+    if args.dias < 1:
+        parser.error('--dias debe ser mayor a 0')
+
+    print("Recalculando resúmenes por hora...")
+    print("=" * 50)
+    inicio = time.monotonic()
+    try:
+        filas = ResumenVentas.reconstruir(
+            desde=args.desde,
+            dias_por_bloque=args.dias,
+            al_avanzar=lambda fecha: print(f"  ... hasta {fecha:%Y-%m-%d %H:%M}")
+        )
+    except Exception as e:
+        print(f"[ERROR] Error: {e}")
+        sys.exit(1)
+    print(f"[OK] {filas} filas de resumen generadas en {time.monotonic() - inicio:.1f}s")
+    print("=" * 50)
@@ -0,0 +1,113 @@
+"""
+Motor de formato de los reportes de transacciones por columnas
+
+Las filas llegan del cursor como tuplas (sin crear un diccionario por fila)
+y se separan en columnas: los montos y saldos en arrays de números y el
+resto en tuplas. Las conversiones, el estado de cada transacción y los
+campos derivados se calculan columna por columna con funciones nativas
+(map, operator, str.format) y los registros de salida solo se construyen
+para el rango de filas que se va a devolver.
+"""
+from array import array
+from itertools import repeat
+from operator import and_, eq, itemgetter, lt
+
+# Orden de las columnas de Transaccion._consulta_transacciones
+COLUMNAS_CONSULTA = (
+    'id', 'fecha_transaccion', 'tipo', 'monto', 'descripcion', 'saldo_anterior',
+    'saldo_nuevo', 'numero_tarjeta', 'asistente_nombre', 'asistente_id',
+    'punto_venta_id', 'punto_venta_nombre'
+)
+
+# Claves de cada registro del reporte (el orden de formatear_columnas)
+CLAVES_REGISTRO = (
+    'id', 'fecha_hora', 'tipo', 'monto', 'monto_formateado', 'tarjeta_ultimos_4',
+    'tarjeta_completa', 'asistente', 'asistente_id', 'punto_venta', 'punto_venta_id',
+    'usuario', 'estado', 'descripcion', 'saldo_anterior', 'saldo_nuevo'
+)
+
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+# Indexado por "es un pago con saldo anterior menor al monto"
+ESTADOS = ('exitosa', 'saldo_insuficiente')
+
+_ultimos_4 = itemgetter(slice(-4, None))
+_formatear_monto = '${:.2f}'.format
+
+def _formatear_fecha(fecha):
+    return fecha.strftime(FORMATO_FECHA) if fecha else None
+
+class ColumnasTransacciones:
+    """
+    Filas del reporte de transacciones guardadas por columnas
+
+    Args:
+        filas (list): Tuplas en el orden de COLUMNAS_CONSULTA
+    """
+
+    def __init__(self, filas):
+        columnas = list(zip(*filas)) if filas else [()] * len(COLUMNAS_CONSULTA)
+        (self.ids, self.fechas, self.tipos, montos, self.descripciones, saldos_anteriores,
+         saldos_nuevos, self.numeros_tarjeta, self.asistentes, self.asistente_ids,
+         self.punto_venta_ids, self.puntos_venta) = columnas
+        self.montos = array('d', map(float, montos))
+        self.saldos_anteriores = array('d', map(float, saldos_anteriores))
+        self.saldos_nuevos = array('d', map(float, saldos_nuevos))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def estados(self, inicio=0, fin=None):
+        """
+        Estado de cada transacción: los pagos con saldo anterior menor al monto
+        son 'saldo_insuficiente' y todo lo demás 'exitosa'
+        """
+        tramo = slice(inicio, fin)
+        es_pago = map(eq, self.tipos[tramo], repeat('pago'))
+        sin_saldo = map(lt, self.saldos_anteriores[tramo], self.montos[tramo])
+        return list(map(ESTADOS.__getitem__, map(and_, es_pago, sin_saldo)))
+
+    def formatear_columnas(self, inicio=0, fin=None):
+        """
+        Calcula las columnas de salida (en el orden de CLAVES_REGISTRO) del tramo pedido
+
+        Returns:
+            list: Una secuencia por columna
+        """
+        tramo = slice(inicio, fin)
+        montos = self.montos[tramo]
+        numeros = self.numeros_tarjeta[tramo]
+        return [
+            self.ids[tramo],
+            list(map(_formatear_fecha, self.fechas[tramo])),
+            self.tipos[tramo],
+            montos,
+            list(map(_formatear_monto, montos)),
+            list(map(_ultimos_4, numeros)),
+            numeros,
+            self.asistentes[tramo],
+            self.asistente_ids[tramo],
+            self.puntos_venta[tramo],
+            self.punto_venta_ids[tramo],
+            repeat('Sistema', len(montos)),  # Por ahora, no hay tracking de usuario
+            self.estados(inicio, fin),
+            self.descripciones[tramo],
+            self.saldos_anteriores[tramo],
+            self.saldos_nuevos[tramo]
+        ]
+
+    def registros(self, inicio=0, fin=None):
+        """
+        Construye los diccionarios del reporte solo para las filas [inicio, fin)
+
+        Returns:
+            list: Registros con las claves de CLAVES_REGISTRO
+        """
+        return [dict(zip(CLAVES_REGISTRO, valores)) for valores in zip(*self.formatear_columnas(inicio, fin))]
+
+    def filas(self, claves, inicio=0, fin=None):
+        """
+        Tuplas con las columnas `claves` del tramo pedido (para escribir un CSV)
+        """
+        columnas = self.formatear_columnas(inicio, fin)
+        return zip(*[columnas[CLAVES_REGISTRO.index(clave)] for clave in claves])
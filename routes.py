@@ -2,8 +2,15 @@
 Rutas y lógica de negocio del sistema de tarjetas inteligentes
 """
 from flask import request, jsonify, render_template, session
-from models import Asistente, Tarjeta, Transaccion, PuntoVenta, Producto, Usuario
-from database import get_db_connection
+from models import Asistente, Tarjeta, Transaccion, PuntoVenta, Producto, Usuario, ClaveIdempotencia, Catalogo
+from database import get_db_connection, obtener_estadisticas_pool
+from cache import CacheReportes, obtener_estadisticas_caches
+from reportes import ColumnasTransacciones
+from eventos import canal_transacciones
+from invalidacion import tabla_generaciones
+import codigos_qr
+from datetime import datetime, timedelta
+import math
 import os
 from werkzeug.utils import secure_filename
 
@@ -135,6 +142,7 @@ def asignar_tarjeta():
                             WHERE numero_tarjeta = %s
                         """, (asistente_id, numero_tarjeta))
                         connection.commit()
+                        Tarjeta.invalidar_cache(numero_tarjeta)
                         # Obtener el ID de la tarjeta actualizada
                         cursor.execute("SELECT id FROM tarjetas WHERE numero_tarjeta = %s", (numero_tarjeta,))
                         tarjeta_actualizada = cursor.fetchone()
@@ -152,6 +160,7 @@ def asignar_tarjeta():
                         VALUES (%s, %s, 0.00)
                     """, (asistente_id, numero_tarjeta))
                     connection.commit()
+                    Tarjeta.invalidar_cache(numero_tarjeta)
                     tarjeta_id = cursor.lastrowid
                 finally:
                     cursor.close()
@@ -180,16 +189,100 @@ def asignar_tarjeta():
             'error': str(e)
         }), 500
 
+# ============================================
+# IDEMPOTENCIA DE PAGOS Y RECARGAS
+# ============================================
+
+def obtener_clave_idempotencia():
+    """
+    Obtiene la clave de idempotencia de la petición actual
+    
+    Se acepta el header `Idempotency-Key` o el campo `idempotency_key` del body.
+    
+    Returns:
+        str: Clave enviada por el cliente o None
+    """
+    clave = request.headers.get('Idempotency-Key')
+    if not clave:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            clave = data.get('idempotency_key')
+    return str(clave).strip() if clave else None
+
+def ejecutar_idempotente(endpoint, procesar):
+    """
+    Ejecuta una operación de forma idempotente según la clave del cliente
+    
+    Si la clave ya se usó en una operación exitosa, se devuelve la respuesta
+    original sin volver a ejecutarla (header `Idempotent-Replayed: true`).
+    La clave se reserva y se completa dentro de la misma transacción que la
+    operación, así que solo queda guardada si la operación se confirma; las
+    respuestas de error no se guardan y el cliente puede reintentar.
+    
+    Args:
+        endpoint (str): Nombre de la operación ('pagar', 'recargar', ...)
+        procesar (callable): Función que procesa la petición y retorna (respuesta, código)
+    """
+    from flask import make_response
+    import hashlib
+    
+    clave = obtener_clave_idempotencia()
+    if not clave:
+        return procesar()
+    
+    if len(clave) > 100:
+        return jsonify({
+            'success': False,
+            'error': 'La clave de idempotencia no puede tener más de 100 caracteres'
+        }), 400
+    
+    huella = hashlib.sha256(request.get_data()).hexdigest()
+    
+    def repetir(guardada):
+        if guardada['huella'] != huella:
+            return jsonify({
+                'success': False,
+                'error': 'La clave de idempotencia ya se usó con datos diferentes'
+            }), 422
+        if guardada['codigo_estado'] is None:
+            return jsonify({
+                'success': False,
+                'error': 'Hay una operación en curso con la misma clave de idempotencia'
+            }), 409
+        respuesta = make_response(guardada['respuesta'], guardada['codigo_estado'])
+        respuesta.mimetype = 'application/json'
+        respuesta.headers['Idempotent-Replayed'] = 'true'
+        return respuesta
+    
+    guardada = ClaveIdempotencia.obtener(endpoint, clave)
+    if guardada:
+        return repetir(guardada)
+    
+    if not ClaveIdempotencia.reservar(endpoint, clave, huella):
+        # Otra petición con la misma clave se confirmó mientras esperábamos
+        guardada = ClaveIdempotencia.obtener(endpoint, clave, bloquear=True)
+        return repetir(guardada or {'huella': huella, 'codigo_estado': None})
+    
+    respuesta, codigo = procesar()
+    if codigo < 400:
+        ClaveIdempotencia.completar(endpoint, clave, huella, codigo, respuesta.get_data(as_text=True))
+    return respuesta, codigo
+
 def cargar_saldo():
     """
     Recarga saldo a una tarjeta
     
     Endpoint: POST /api/tarjetas/recargar
+    Header opcional: Idempotency-Key
     Body: {
         "numero_tarjeta": "string",
-        "monto": float
+        "monto": float,
+        "idempotency_key": "string (opcional, alternativa al header)"
     }
     """
+    return ejecutar_idempotente('recargar', _cargar_saldo)
+
+def _cargar_saldo():
     try:
         data = request.get_json() or request.form
         
@@ -223,59 +316,28 @@ def cargar_saldo():
                 'error': 'El monto debe ser mayor a cero'
             }), 400
         
-        # Obtener la tarjeta
-        tarjeta = Tarjeta.obtener_por_numero(numero_tarjeta)
-        if not tarjeta:
+        # Recargar, desbloquear y registrar la transacción en una sola operación
+        resultado = Tarjeta.acreditar(
+            numero_tarjeta,
+            monto,
+            descripcion=f'Recarga de ${monto:.2f}'
+        )
+        if not resultado:
             return jsonify({
                 'success': False,
-                'error': 'Tarjeta no encontrada o inactiva'
+                'error': 'Tarjeta no encontrada'
             }), 404
         
-        # Calcular nuevos saldos
-        saldo_anterior = float(tarjeta['saldo'])
-        saldo_nuevo = saldo_anterior + monto
-        
-        # Actualizar saldo en la tarjeta
-        Tarjeta.actualizar_saldo(tarjeta['id'], saldo_nuevo)
-        
-        # Desbloquear tarjeta si el saldo es mayor a 0
-        tarjeta_desbloqueada = False
-        if saldo_nuevo > 0:
-            from database import get_db_connection
-            connection = get_db_connection()
-            cursor = connection.cursor()
-            try:
-                cursor.execute("UPDATE tarjetas SET activa = TRUE WHERE id = %s", (tarjeta['id'],))
-                connection.commit()
-                tarjeta_desbloqueada = True
-            except Exception as e:
-                connection.rollback()
-                raise e
-            finally:
-                cursor.close()
-                connection.close()
-        
-        # Registrar la transacción
-        Transaccion.crear(
-            tarjeta_id=tarjeta['id'],
-            tipo='recarga',
-            monto=monto,
-            saldo_anterior=saldo_anterior,
-            saldo_nuevo=saldo_nuevo,
-            descripcion=f'Recarga de ${monto:.2f}'
-        )
-        
-        # Obtener tarjeta actualizada
-        tarjeta_actualizada = Tarjeta.obtener_por_id(tarjeta['id'])
+        tarjeta_desbloqueada = resultado['tarjeta_desbloqueada']
         
         return jsonify({
             'success': True,
             'message': f'Saldo recargado correctamente: ${monto:.2f}' + (' (Tarjeta desbloqueada)' if tarjeta_desbloqueada else ''),
             'data': {
-                'tarjeta': tarjeta_actualizada,
+                'tarjeta': resultado['tarjeta'],
                 'monto_recargado': monto,
-                'saldo_anterior': saldo_anterior,
-                'saldo_nuevo': saldo_nuevo,
+                'saldo_anterior': resultado['saldo_anterior'],
+                'saldo_nuevo': resultado['saldo_nuevo'],
                 'tarjeta_desbloqueada': tarjeta_desbloqueada
             }
         }), 200
@@ -286,18 +348,68 @@ def cargar_saldo():
             'error': str(e)
         }), 500
 
+def resolver_items_carrito(items):
+    """
+    Valida los productos de un carrito y obtiene sus precios actuales
+    
+    Args:
+        items (list): Lista de {"producto_id": int, "cantidad": int}
+        
+    Returns:
+        tuple: (items como tuplas (producto_id, cantidad, precio_unitario),
+                total del carrito, descripción "Producto x2, Producto x1")
+        
+    Raises:
+        ValueError: Si el carrito tiene un formato inválido o productos inexistentes
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError('Los items deben ser una lista de productos')
+    
+    # Agrupar por producto conservando el orden del carrito
+    cantidades = {}
+    for item in items:
+        try:
+            producto_id = int(item.get('producto_id'))
+            cantidad = int(item.get('cantidad', 1))
+        except (AttributeError, ValueError, TypeError):
+            raise ValueError('Cada item debe tener producto_id y cantidad numéricos')
+        if cantidad <= 0:
+            raise ValueError('La cantidad de cada producto debe ser mayor a cero')
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+    
+    productos_db = Producto.obtener_por_ids(list(cantidades))
+    faltantes = [str(pid) for pid in cantidades if pid not in productos_db]
+    if faltantes:
+        raise ValueError(f'Productos no encontrados o inactivos: {", ".join(faltantes)}')
+    
+    items_venta = [
+        (producto_id, cantidad, productos_db[producto_id]['precio'])
+        for producto_id, cantidad in cantidades.items()
+    ]
+    total = float(sum(precio * cantidad for _, cantidad, precio in items_venta))
+    descripcion = ', '.join(
+        f"{productos_db[producto_id]['nombre']} x{cantidad}" for producto_id, cantidad, _ in items_venta
+    )
+    return items_venta, total, descripcion
+
 def procesar_pago():
     """
     Procesa un pago con una tarjeta en un punto de venta
     
     Endpoint: POST /api/tarjetas/pagar
+    Header opcional: Idempotency-Key
     Body: {
         "numero_tarjeta": "string",
         "punto_venta_id": int,
-        "monto": float,
-        "descripcion": "string (opcional)"
+        "monto": float (opcional si se envían items; si se envía debe coincidir con el total),
+        "items": [{"producto_id": int, "cantidad": int}] (opcional),
+        "descripcion": "string (opcional)",
+        "idempotency_key": "string (opcional, alternativa al header)"
     }
     """
+    return ejecutar_idempotente('pagar', _procesar_pago)
+
+def _procesar_pago():
     try:
         data = request.get_json() or request.form
         
@@ -306,6 +418,7 @@ def procesar_pago():
         punto_venta_id = data.get('punto_venta_id')
         monto = data.get('monto')
         descripcion = data.get('descripcion', '')
+        items = data.get('items') if request.is_json else None
         
         if not numero_tarjeta:
             return jsonify({
@@ -319,6 +432,14 @@ def procesar_pago():
                 'error': 'El ID del punto de venta es obligatorio'
             }), 400
         
+        # Carrito estructurado: los precios se toman de la base de datos
+        items_venta = None
+        if items:
+            items_venta, total_items, descripcion_items = resolver_items_carrito(items)
+            if not monto:
+                monto = total_items
+            descripcion = descripcion or descripcion_items
+        
         if not monto:
             return jsonify({
                 'success': False,
@@ -339,19 +460,10 @@ def procesar_pago():
                 'error': 'El monto debe ser mayor a cero'
             }), 400
         
-        # Obtener la tarjeta
-        tarjeta = Tarjeta.obtener_por_numero(numero_tarjeta)
-        if not tarjeta:
-            return jsonify({
-                'success': False,
-                'error': 'Tarjeta no encontrada o inactiva'
-            }), 404
-        
-        # Verificar que la tarjeta esté activa
-        if not tarjeta.get('activa', False):
+        if items_venta and abs(monto - total_items) > 0.005:
             return jsonify({
                 'success': False,
-                'error': 'Tarjeta bloqueada. Recargue saldo para continuar.'
+                'error': f'El monto (${monto:.2f}) no coincide con el total de los productos (${total_items:.2f})'
             }), 400
         
         # Verificar que el punto de venta existe
@@ -362,65 +474,166 @@ def procesar_pago():
                 'error': 'Punto de venta no encontrado'
             }), 404
         
-        # Verificar saldo suficiente
-        saldo_actual = float(tarjeta['saldo'])
-        if saldo_actual < monto:
+        # Cobrar y registrar la transacción (descuento condicionado, sin leer-modificar-escribir)
+        resultado = Tarjeta.debitar(
+            numero_tarjeta,
+            monto,
+            punto_venta_id,
+            descripcion=descripcion or f'Pago en {punto_venta["nombre"]}',
+            items=items_venta
+        )
+        
+        if not resultado['exito']:
+            if resultado['motivo'] == 'no_encontrada':
+                return jsonify({
+                    'success': False,
+                    'error': 'Tarjeta no encontrada o inactiva'
+                }), 404
+            if resultado['motivo'] == 'bloqueada':
+                return jsonify({
+                    'success': False,
+                    'error': 'Tarjeta bloqueada. Recargue saldo para continuar.'
+                }), 400
             return jsonify({
                 'success': False,
-                'error': f'Saldo insuficiente. Saldo actual: ${saldo_actual:.2f}, Monto requerido: ${monto:.2f}'
+                'error': f'Saldo insuficiente. Saldo actual: ${resultado["saldo_actual"]:.2f}, Monto requerido: ${monto:.2f}'
             }), 400
         
-        # Calcular nuevo saldo
-        saldo_anterior = saldo_actual
-        saldo_nuevo = saldo_anterior - monto
-        
-        # Actualizar saldo en la tarjeta
-        Tarjeta.actualizar_saldo(tarjeta['id'], saldo_nuevo)
-        
-        # Bloquear tarjeta si el saldo llega a 0 o menos
-        tarjeta_bloqueada = False
-        if saldo_nuevo <= 0:
-            from database import get_db_connection
-            connection = get_db_connection()
-            cursor = connection.cursor()
-            try:
-                cursor.execute("UPDATE tarjetas SET activa = FALSE WHERE id = %s", (tarjeta['id'],))
-                connection.commit()
-                tarjeta_bloqueada = True
-            except Exception as e:
-                connection.rollback()
-                raise e
-            finally:
-                cursor.close()
-                connection.close()
-        
-        # Registrar la transacción
-        Transaccion.crear(
-            tarjeta_id=tarjeta['id'],
-            tipo='pago',
-            monto=monto,
-            saldo_anterior=saldo_anterior,
-            saldo_nuevo=saldo_nuevo,
-            punto_venta_id=punto_venta_id,
-            descripcion=descripcion or f'Pago en {punto_venta["nombre"]}'
-        )
-        
-        # Obtener tarjeta actualizada
-        tarjeta_actualizada = Tarjeta.obtener_por_id(tarjeta['id'])
+        tarjeta_bloqueada = resultado['tarjeta_bloqueada']
         
         return jsonify({
             'success': True,
             'message': f'Pago procesado correctamente: ${monto:.2f}' + (' (Tarjeta bloqueada por saldo insuficiente)' if tarjeta_bloqueada else ''),
             'data': {
-                'tarjeta': tarjeta_actualizada,
+                'tarjeta': resultado['tarjeta'],
                 'punto_venta': punto_venta['nombre'],
                 'monto_pagado': monto,
-                'saldo_anterior': saldo_anterior,
-                'saldo_nuevo': saldo_nuevo,
+                'saldo_anterior': resultado['saldo_anterior'],
+                'saldo_nuevo': resultado['saldo_nuevo'],
                 'tarjeta_bloqueada': tarjeta_bloqueada
             }
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# Máximo de pagos aceptados en una sola petición de lote
+MAX_PAGOS_POR_LOTE = 500
+
+def procesar_pagos_lote():
+    """
+    Procesa varios pagos en una sola petición y una sola transacción
+    
+    Pensado para terminales POS con mucho tráfico o que vuelven a estar en
+    línea y deben enviar los cobros pendientes.
+    
+    Endpoint: POST /api/tarjetas/pagar/lote
+    Header opcional: Idempotency-Key
+    Body: {
+        "pagos": [
+            {
+                "referencia": "string (referencia del cliente, opcional)",
+                "numero_tarjeta": "string",
+                "punto_venta_id": int,
+                "monto": float,
+                "descripcion": "string (opcional)"
+            }
+        ]
+    }
+    """
+    return ejecutar_idempotente('pagar_lote', _procesar_pagos_lote)
+
+def _procesar_pagos_lote():
+    try:
+        data = request.get_json(silent=True)
+        pagos = data.get('pagos') if isinstance(data, dict) else data
+        
+        if not isinstance(pagos, list) or not pagos:
+            return jsonify({
+                'success': False,
+                'error': 'Se requiere una lista de pagos'
+            }), 400
+        
+        if len(pagos) > MAX_PAGOS_POR_LOTE:
+            return jsonify({
+                'success': False,
+                'error': f'El lote no puede tener más de {MAX_PAGOS_POR_LOTE} pagos'
+            }), 400
+        
+        # Validar cada pago; los inválidos se reportan sin detener el lote
+        resultados = [None] * len(pagos)
+        validos = []
+        indices_validos = []
+        for i, pago in enumerate(pagos):
+            if not isinstance(pago, dict):
+                resultados[i] = {'estado': 'invalido', 'error': 'Formato de pago inválido'}
+                continue
+            
+            try:
+                monto = float(pago.get('monto'))
+            except (ValueError, TypeError):
+                monto = None
+            try:
+                punto_venta_id = int(pago.get('punto_venta_id'))
+            except (ValueError, TypeError):
+                punto_venta_id = None
+            
+            # Se informa solo el primer error del pago
+            error = None
+            if not pago.get('numero_tarjeta'):
+                error = 'El número de tarjeta es obligatorio'
+            elif monto is None or not math.isfinite(monto):
+                error = 'El monto debe ser un número válido'
+            elif monto <= 0:
+                error = 'El monto debe ser mayor a cero'
+            elif punto_venta_id is None:
+                error = 'El ID del punto de venta es obligatorio'
+            
+            if error:
+                resultados[i] = {'estado': 'invalido', 'error': error}
+                continue
+            
+            validos.append({
+                'numero_tarjeta': pago['numero_tarjeta'],
+                'punto_venta_id': punto_venta_id,
+                'monto': monto,
+                'descripcion': pago.get('descripcion')
+            })
+            indices_validos.append(i)
+        
+        for i, resultado in zip(indices_validos, Tarjeta.debitar_lote(validos)):
+            resultados[i] = resultado
+        
+        monto_total = 0
+        for pago, resultado in zip(pagos, resultados):
+            resultado['referencia'] = pago.get('referencia') if isinstance(pago, dict) else None
+            if resultado['estado'] == 'ok':
+                monto_total += float(pago['monto'])
+        
+        exitosos = sum(1 for r in resultados if r['estado'] == 'ok')
+        
+        return jsonify({
+            'success': True,
+            'message': f'{exitosos} de {len(pagos)} pagos procesados',
+            'data': {
+                'resultados': resultados,
+                'resumen': {
+                    'total_pagos': len(pagos),
+                    'exitosos': exitosos,
+                    'rechazados': len(pagos) - exitosos,
+                    'monto_total': round(monto_total, 2)
+                }
+            }
+        }), 200
+        
     except Exception as e:
         return jsonify({
             'success': False,
@@ -466,11 +679,19 @@ def consultar_saldo():
             'error': str(e)
         }), 500
 
+# Transacciones por página del historial de una tarjeta
+HISTORIAL_LIMITE_DEFAULT = 50
+HISTORIAL_LIMITE_MAXIMO = 200
+
 def obtener_historial():
     """
-    Obtiene el historial de transacciones de una tarjeta
+    Obtiene el historial de transacciones de una tarjeta, paginado por cursor
     
     Endpoint: GET /api/tarjetas/historial/<numero_tarjeta>
+    Query params:
+        - before_id: int (opcional) - Transacciones anteriores a este id (siguiente_before_id de la página previa)
+        - limit: int (opcional, default 50, máximo 200)
+        - resumen: 1 (opcional) - Incluir totales de todas las transacciones de la tarjeta
     """
     try:
         numero_tarjeta = request.view_args.get('numero_tarjeta')
@@ -481,6 +702,14 @@ def obtener_historial():
                 'error': 'El número de tarjeta es obligatorio'
             }), 400
         
+        before_id = request.args.get('before_id', type=int)
+        limite = request.args.get('limit', HISTORIAL_LIMITE_DEFAULT, type=int)
+        if limite < 1 or limite > HISTORIAL_LIMITE_MAXIMO:
+            return jsonify({
+                'success': False,
+                'error': f'limit debe estar entre 1 y {HISTORIAL_LIMITE_MAXIMO}'
+            }), 400
+        
         # Verificar que la tarjeta existe
         tarjeta = Tarjeta.obtener_por_numero(numero_tarjeta)
         if not tarjeta:
@@ -489,8 +718,10 @@ def obtener_historial():
                 'error': 'Tarjeta no encontrada o inactiva'
             }), 404
         
-        # Obtener historial
-        transacciones = Transaccion.obtener_por_tarjeta(numero_tarjeta)
+        # Obtener historial (una fila extra indica si hay más páginas)
+        transacciones = Transaccion.obtener_por_tarjeta(numero_tarjeta, before_id=before_id, limite=limite + 1)
+        hay_mas = len(transacciones) > limite
+        transacciones = transacciones[:limite]
         
         # Formatear transacciones
         transacciones_formateadas = []
@@ -507,15 +738,36 @@ def obtener_historial():
                 'fecha': trans['fecha_transaccion'].strftime('%Y-%m-%d %H:%M:%S') if trans.get('fecha_transaccion') else None
             })
         
+        datos = {
+            'numero_tarjeta': numero_tarjeta,
+            'asistente': tarjeta['asistente_nombre'],
+            'saldo_actual': float(tarjeta['saldo']),
+            'total_transacciones': None,
+            'transacciones': transacciones_formateadas,
+            'paginacion': {
+                'limit': limite,
+                'hay_mas': hay_mas,
+                'siguiente_before_id': transacciones[-1]['id'] if hay_mas else None
+            }
+        }
+        
+        if request.args.get('resumen') in ('1', 'true'):
+            resumen = Transaccion.obtener_resumen_tarjeta(tarjeta['id'])
+            datos['resumen'] = {
+                'total_transacciones': int(resumen['total_transacciones']),
+                'total_recargas': int(resumen['total_recargas']),
+                'monto_recargas': float(resumen['monto_recargas']),
+                'total_pagos': int(resumen['total_pagos']),
+                'monto_pagos': float(resumen['monto_pagos']),
+                'ultima_transaccion': resumen['ultima_transaccion'].strftime('%Y-%m-%d %H:%M:%S') if resumen['ultima_transaccion'] else None
+            }
+            datos['total_transacciones'] = datos['resumen']['total_transacciones']
+        else:
+            datos['total_transacciones'] = Transaccion.contar_por_tarjeta(tarjeta['id'])
+        
         return jsonify({
             'success': True,
-            'data': {
-                'numero_tarjeta': numero_tarjeta,
-                'asistente': tarjeta['asistente_nombre'],
-                'saldo_actual': float(tarjeta['saldo']),
-                'total_transacciones': len(transacciones_formateadas),
-                'transacciones': transacciones_formateadas
-            }
+            'data': datos
         }), 200
         
     except Exception as e:
@@ -706,15 +958,18 @@ def generar_qr():
     Genera un código QR para una tarjeta
     
     Endpoint: GET /api/tarjetas/qr/<numero_tarjeta>
+    Query params opcionales:
+        - formato: 'png' (default) o 'svg'
+    
+    La imagen de un número de tarjeta no cambia: se guarda en caché (ver
+    codigos_qr.py) y se envía con ETag y Cache-Control de larga duración.
     
     Returns:
-        Imagen PNG del código QR que contiene el número de tarjeta
+        Imagen PNG o SVG del código QR que contiene el número de tarjeta
     """
+    from flask import Response
+    
     try:
-        from flask import send_file
-        import qrcode
-        import io
-        
         # Obtener número de tarjeta de los argumentos de la ruta
         numero_tarjeta = request.view_args.get('numero_tarjeta')
         
@@ -724,6 +979,13 @@ def generar_qr():
                 'error': 'El número de tarjeta es obligatorio'
             }), 400
         
+        formato = request.args.get('formato', 'png')
+        if formato not in codigos_qr.FORMATOS:
+            return jsonify({
+                'success': False,
+                'error': "El formato debe ser 'png' o 'svg'"
+            }), 400
+        
         # Verificar que la tarjeta existe
         tarjeta = Tarjeta.obtener_por_numero(numero_tarjeta)
         if not tarjeta:
@@ -732,30 +994,18 @@ def generar_qr():
                 'error': 'Tarjeta no encontrada o inactiva'
             }), 404
         
-        # Generar QR con el número de tarjeta
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(numero_tarjeta)
-        qr.make(fit=True)
-        
-        # Crear imagen
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Guardar en buffer de memoria
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        return send_file(
-            img_buffer,
-            mimetype='image/png',
-            as_attachment=False,
-            download_name=f'QR_{numero_tarjeta}.png'
-        )
+        # El ETag se calcula sin dibujar: si el cliente ya tiene la imagen, 304
+        id_qr = codigos_qr.huella(numero_tarjeta, formato)
+        if id_qr in request.if_none_match:
+            respuesta = Response(status=304)
+        else:
+            id_qr, imagen = codigos_qr.obtener_qr(numero_tarjeta, formato)
+            respuesta = Response(imagen, mimetype=codigos_qr.FORMATOS[formato])
+            respuesta.headers['Content-Disposition'] = f'inline; filename=QR_{numero_tarjeta}.{formato}'
+        respuesta.set_etag(id_qr)
+        # private: el número de tarjeta no debe quedar en cachés compartidos
+        respuesta.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return respuesta
         
     except Exception as e:
         return jsonify({
@@ -774,11 +1024,21 @@ def listar_productos():
     Endpoint: GET /api/productos
     Query params opcionales:
         - tipo: Filtrar por tipo de producto
+        - punto_venta_id: Solo el menú de ese punto de venta (combinable con tipo)
     """
     try:
         tipo = request.args.get('tipo')
+        punto_venta_id = request.args.get('punto_venta_id', type=int)
+        
+        if request.args.get('punto_venta_id') and punto_venta_id is None:
+            return jsonify({
+                'success': False,
+                'error': 'punto_venta_id debe ser un número entero'
+            }), 400
         
-        if tipo:
+        if punto_venta_id is not None:
+            productos = Producto.listar_por_punto_venta(punto_venta_id, tipo)
+        elif tipo:
             productos = Producto.listar_por_tipo(tipo)
         else:
             productos = Producto.listar_todos()
@@ -814,6 +1074,86 @@ def obtener_tipos_productos():
             'error': str(e)
         }), 500
 
+# Columnas que usa el POS (formato=compacto): sin descripción ni fechas
+COLUMNAS_CATALOGO_COMPACTO = {
+    'productos': ('id', 'nombre', 'precio', 'tipo', 'punto_venta_id', 'imagen_url'),
+    'puntos_venta': ('id', 'nombre', 'tipo')
+}
+
+# Respuesta serializada por formato, junto con el catálogo del que salió
+_snapshots_catalogo = {}
+
+def construir_snapshot_catalogo(compacto=False):
+    """
+    Serializa el catálogo vigente y calcula su versión (hash del contenido)
+    
+    El resultado se reutiliza mientras Catalogo.obtener() retorne el mismo
+    catálogo: cada carga del POS solo compara la versión.
+    
+    Returns:
+        tuple: (version, cuerpo JSON de la respuesta)
+    """
+    from flask import json
+    import hashlib
+    
+    catalogo = Catalogo.obtener()
+    formato = 'compacto' if compacto else 'completo'
+    snapshot = _snapshots_catalogo.get(formato)
+    if snapshot is not None and snapshot[0] is catalogo:
+        return snapshot[1], snapshot[2]
+    
+    productos = catalogo['productos']
+    puntos_venta = catalogo['puntos_venta_activos']
+    if compacto:
+        columnas = COLUMNAS_CATALOGO_COMPACTO
+        productos = [{c: p[c] for c in columnas['productos']} for p in productos]
+        puntos_venta = [{c: pv[c] for c in columnas['puntos_venta']} for pv in puntos_venta]
+    datos = {'productos': productos, 'tipos': catalogo['tipos'], 'puntos_venta': puntos_venta}
+    
+    contenido = json.dumps(datos, sort_keys=True)
+    version = hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:32]
+    cuerpo = json.dumps({'success': True, 'data': dict(datos, version=version)})
+    _snapshots_catalogo[formato] = (catalogo, version, cuerpo)
+    return version, cuerpo
+
+def obtener_catalogo():
+    """
+    Productos activos, tipos y puntos de venta en una sola respuesta versionada
+    
+    Endpoint: GET /api/catalogo
+    Query params opcionales:
+        - formato: 'compacto' para enviar solo las columnas que usa el POS
+    Headers:
+        - If-None-Match: versión (ETag) que ya tiene el cliente; si no cambió
+          se responde 304 sin cuerpo
+    """
+    from flask import Response
+    
+    try:
+        formato = request.args.get('formato', 'completo')
+        if formato not in ('completo', 'compacto'):
+            return jsonify({
+                'success': False,
+                'error': "El formato debe ser 'completo' o 'compacto'"
+            }), 400
+        
+        version, cuerpo = construir_snapshot_catalogo(formato == 'compacto')
+        
+        if version in request.if_none_match:
+            respuesta = Response(status=304)
+        else:
+            respuesta = Response(cuerpo, mimetype='application/json')
+        respuesta.set_etag(version)
+        # El navegador puede guardarlo pero debe revalidar siempre (el 304 no tiene cuerpo)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 def crear_producto():
     """
     Crea un nuevo producto
@@ -1044,6 +1384,202 @@ def eliminar_producto(producto_id):
             'error': str(e)
         }), 500
 
+# Máximo de productos aceptados en una sola importación
+MAX_PRODUCTOS_POR_LOTE = 1000
+
+VALORES_ACTIVO = {'true': True, '1': True, 'si': True, 'sí': True, 'false': False, '0': False, 'no': False}
+
+def leer_productos_lote():
+    """
+    Lee los productos de la petición: JSON (lista o {"productos": [...]}) o CSV
+    
+    El CSV puede venir como archivo (campo `archivo`) o como cuerpo text/csv,
+    con encabezado. Las celdas vacías se toman como columnas no enviadas.
+    
+    Returns:
+        list: Tuplas (fila, diccionario) con la fila del CSV o la posición en la lista JSON
+        
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    import csv
+    import io
+    
+    archivo = request.files.get('archivo')
+    if archivo is not None or request.mimetype == 'text/csv':
+        datos = archivo.read() if archivo is not None else request.get_data()
+        try:
+            texto = datos.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValueError('El CSV debe estar codificado en UTF-8')
+        lector = csv.DictReader(io.StringIO(texto))
+        columnas = {(c or '').strip().lower() for c in (lector.fieldnames or [])}
+        desconocidas = columnas - {'id', *Producto.COLUMNAS_LOTE}
+        if desconocidas:
+            raise ValueError(f'Columnas desconocidas en el CSV: {", ".join(sorted(desconocidas))}')
+        return [
+            (lector.line_num, {
+                (c or '').strip().lower(): v.strip()
+                for c, v in fila.items() if isinstance(v, str) and v.strip()
+            })
+            for fila in lector
+        ]
+    
+    data = request.get_json(silent=True)
+    productos = data.get('productos') if isinstance(data, dict) else data
+    if not isinstance(productos, list):
+        raise ValueError('Se requiere una lista de productos (JSON) o un archivo CSV')
+    return list(enumerate(productos, start=1))
+
+def validar_producto_lote(producto):
+    """
+    Valida y normaliza un producto de la importación
+    
+    Returns:
+        tuple: (producto normalizado, None) o (None, mensaje de error)
+    """
+    from decimal import Decimal, InvalidOperation
+    
+    if not isinstance(producto, dict):
+        return None, 'Formato de producto inválido'
+    
+    normalizado = {}
+    if producto.get('id') not in (None, ''):
+        try:
+            normalizado['id'] = int(producto['id'])
+        except (ValueError, TypeError):
+            return None, 'El id debe ser un número entero'
+    
+    for campo in ('nombre', 'tipo'):
+        if campo in producto:
+            valor = str(producto[campo] or '').strip()
+            if not valor:
+                return None, f'El {campo} no puede estar vacío'
+            normalizado[campo] = valor
+    if 'id' not in normalizado and 'nombre' not in normalizado:
+        return None, 'Cada producto debe tener id o nombre'
+    
+    if 'precio' in producto:
+        try:
+            precio = Decimal(str(producto['precio'])).quantize(Decimal('0.01'))
+        except (InvalidOperation, ValueError):
+            return None, 'El precio debe ser un número válido'
+        if not precio.is_finite():
+            return None, 'El precio debe ser un número válido'
+        if precio <= 0:
+            return None, 'El precio debe ser mayor a 0'
+        normalizado['precio'] = precio
+    
+    if producto.get('punto_venta_id') not in (None, ''):
+        punto_venta = PuntoVenta.obtener_por_id(producto['punto_venta_id'])
+        if not punto_venta:
+            return None, 'Punto de venta no encontrado'
+        normalizado['punto_venta_id'] = punto_venta['id']
+    
+    for campo in ('descripcion', 'imagen_url'):
+        if campo in producto:
+            valor = str(producto[campo] or '').strip()
+            normalizado[campo] = valor or None
+    
+    if 'activo' in producto:
+        activo = producto['activo']
+        if isinstance(activo, str):
+            activo = VALORES_ACTIVO.get(activo.strip().lower())
+        if not isinstance(activo, bool):
+            return None, 'activo debe ser true o false'
+        normalizado['activo'] = activo
+    
+    return normalizado, None
+
+def importar_productos():
+    """
+    Crea o actualiza varios productos en una sola transacción (menús completos, cambios de precios)
+    
+    Endpoint: POST /api/productos/lote
+    Body: lista JSON (o {"productos": [...]}) o CSV con encabezado y las columnas
+        id, nombre, precio, tipo, punto_venta_id, descripcion, imagen_url, activo
+    
+    Los productos con id se actualizan; sin id se actualiza el producto con el
+    mismo nombre en el mismo punto de venta o se crea uno nuevo. Si algún
+    producto tiene errores no se guarda ninguno.
+    """
+    try:
+        try:
+            productos = leer_productos_lote()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if not productos:
+            return jsonify({
+                'success': False,
+                'error': 'No se recibió ningún producto'
+            }), 400
+        
+        if len(productos) > MAX_PRODUCTOS_POR_LOTE:
+            return jsonify({
+                'success': False,
+                'error': f'La importación no puede tener más de {MAX_PRODUCTOS_POR_LOTE} productos'
+            }), 400
+        
+        errores = []
+        validos = []
+        vistos = set()
+        for fila, producto in productos:
+            normalizado, error = validar_producto_lote(producto)
+            if normalizado is not None:
+                if 'id' in normalizado:
+                    clave = ('id', normalizado['id'])
+                else:
+                    clave = ('nombre', normalizado['nombre'].casefold(), normalizado.get('punto_venta_id'))
+                if clave in vistos:
+                    error = 'Producto repetido en la importación'
+                vistos.add(clave)
+            if error:
+                errores.append({'fila': fila, 'error': error})
+            else:
+                validos.append(normalizado)
+        
+        if not errores:
+            resultados = Producto.guardar_lote(validos)
+            mensajes = {
+                'no_encontrado': 'Producto no encontrado',
+                'incompleto': 'Los productos nuevos requieren nombre, precio y tipo',
+                'duplicado': 'Producto repetido en la importación'
+            }
+            errores = [
+                {'fila': fila, 'error': mensajes[r['estado']]}
+                for (fila, _), r in zip(productos, resultados) if r['estado'] in mensajes
+            ]
+        
+        if errores:
+            return jsonify({
+                'success': False,
+                'error': f'{len(errores)} productos con errores; no se guardó ninguno',
+                'data': {'errores': errores}
+            }), 400
+        
+        resumen = {'total_productos': len(resultados)}
+        for estado, clave in (('creado', 'creados'), ('actualizado', 'actualizados'), ('sin_cambios', 'sin_cambios')):
+            resumen[clave] = sum(1 for r in resultados if r['estado'] == estado)
+        
+        return jsonify({
+            'success': True,
+            'message': f"{resumen['creados']} productos creados y {resumen['actualizados']} actualizados",
+            'data': {
+                'resultados': [dict(r, fila=fila) for (fila, _), r in zip(productos, resultados)],
+                'resumen': resumen
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # ============================================
 # FUNCIONES DE REPORTES
 # ============================================
@@ -1051,6 +1587,7 @@ def eliminar_producto(producto_id):
 def parsear_productos_descripcion(descripcion):
     """
     Parsea la descripción de una transacción para extraer productos y cantidades
+    Solo se usa para ventas registradas sin items (anteriores a transaccion_items)
     Formato esperado: "Producto1 x2, Producto2 x1" o "Pago en Restaurante Principal"
     
     Returns:
@@ -1080,6 +1617,191 @@ def parsear_productos_descripcion(descripcion):
     
     return productos
 
+# Resultados de reportes por filtros, validados con el último id de transacciones
+# y con las generaciones de los catálogos de los que toman nombres
+_cache_reportes = CacheReportes(
+    'reportes', max_entradas=128, ambitos=('productos', 'puntos_venta'), tabla=tabla_generaciones
+)
+
+# Tiempo después del fin de un día durante el que su rango sigue abierto: una
+# transacción con fecha de las 23:59:59 puede confirmarse pasada la medianoche
+RANGO_CERRADO_GRACIA = timedelta(minutes=15)
+
+def normalizar_fecha(fecha):
+    """
+    Normaliza una fecha de los filtros de reportes a YYYY-MM-DD
+
+    Returns:
+        str: Fecha normalizada o None si viene vacía
+
+    Raises:
+        ValueError: Si la fecha no tiene el formato YYYY-MM-DD
+    """
+    if not fecha or not fecha.strip():
+        return None
+    return datetime.strptime(fecha.strip(), '%Y-%m-%d').date().isoformat()
+
+def rango_cerrado(fecha_fin):
+    """
+    Indica si un rango de fechas ya terminó: no puede recibir transacciones nuevas
+
+    Se considera cerrado cuando pasó RANGO_CERRADO_GRACIA desde el fin de su
+    último día, para que las transacciones confirmadas tarde entren en el cálculo.
+    """
+    if fecha_fin is None:
+        return False
+    return fecha_fin < (datetime.now() - RANGO_CERRADO_GRACIA).date().isoformat()
+
+def calcular_reporte_ventas(fecha_inicio=None, fecha_fin=None, punto_venta_id=None,
+                            before_id=None, limite=None):
+    """
+    Calcula los datos del reporte de ventas (lo que se guarda en el caché de reportes)
+    
+    Solo se leen y formatean las ventas de una página (`limite`, por defecto
+    REPORTE_LIMITE_DEFAULT); el resumen se calcula en SQL sobre todo el rango
+    y solo se incluye en la primera página. Para todas las ventas del rango
+    está la exportación en streaming de /api/reportes/transacciones.
+    
+    Returns:
+        dict: {'ventas': [...], 'paginacion': {...}, 'resumen': {...} (solo en la primera página)}
+    """
+    limite = limite or REPORTE_LIMITE_DEFAULT
+    
+    # Obtener ventas (una fila extra indica si hay más páginas)
+    columnas = ColumnasTransacciones(Transaccion.obtener_ventas(
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        punto_venta_id=punto_venta_id,
+        before_id=before_id,
+        limite=limite + 1,
+        como_tuplas=True
+    ))
+    hay_mas = len(columnas) > limite
+    ventas = columnas.registros(0, limite)
+    
+    # Productos de cada venta de la página, desde transaccion_items
+    items_por_venta = Transaccion.obtener_items_ventas([venta['id'] for venta in ventas])
+    
+    # Formatear ventas
+    ventas_formateadas = []
+    
+    for venta in ventas:
+        items = items_por_venta.get(venta['id'])
+        if items:
+            productos = [{
+                'nombre': item['nombre'] or 'Producto eliminado',
+                'cantidad': item['cantidad'],
+                'precio_unitario': float(item['precio_unitario']),
+                'total': item['cantidad'] * float(item['precio_unitario'])
+            } for item in items]
+        else:
+            # Ventas registradas sin carrito estructurado: parsear la descripción
+            productos = parsear_productos_descripcion(venta.get('descripcion', ''))
+        
+        # Si no se pudieron obtener productos, crear uno genérico
+        if not productos:
+            productos = [{
+                'nombre': venta['descripcion'] or 'Venta general',
+                'cantidad': 1,
+                'precio_unitario': venta['monto'],
+                'total': venta['monto']
+            }]
+        elif not items:
+            # Distribuir el monto total entre los productos
+            monto_total = venta['monto']
+            cantidad_total = sum(p['cantidad'] for p in productos)
+            if cantidad_total > 0:
+                precio_promedio = monto_total / cantidad_total
+                for producto in productos:
+                    producto['precio_unitario'] = precio_promedio
+                    producto['total'] = producto['cantidad'] * precio_promedio
+        
+        # Crear una entrada por cada producto
+        for producto in productos:
+            ventas_formateadas.append({
+                'id': venta['id'],
+                'fecha_hora': venta['fecha_hora'],
+                'punto_venta': venta['punto_venta'],
+                'punto_venta_id': venta['punto_venta_id'],
+                'producto': producto['nombre'],
+                'cantidad': producto['cantidad'],
+                'precio_unitario': producto.get('precio_unitario', 0),
+                'total': producto.get('total', venta['monto']),
+                'tarjeta_ultimos_4': venta['tarjeta_ultimos_4'],
+                'tarjeta_completa': venta['tarjeta_completa'],
+                'asistente': venta['asistente'],
+                'asistente_id': venta['asistente_id'],
+                'usuario': venta['usuario'],
+                'transaccion_id': venta['id']
+            })
+    
+    datos = {
+        'ventas': ventas_formateadas,
+        'paginacion': {
+            'limit': limite,
+            'hay_mas': hay_mas,
+            'siguiente_before_id': ventas[-1]['id'] if hay_mas else None
+        }
+    }
+    
+    # El resumen abarca todo el rango: se calcula en SQL y solo en la primera página
+    if not before_id:
+        resumen = Transaccion.obtener_resumen_ventas(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            punto_venta_id=punto_venta_id
+        )
+        productos_mas_vendidos = Transaccion.obtener_productos_mas_vendidos(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            punto_venta_id=punto_venta_id,
+            limite=10
+        )
+        ventas_por_tipo = Transaccion.obtener_ventas_por_tipo(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            punto_venta_id=punto_venta_id
+        )
+        datos['resumen'] = {
+            'total_ventas': resumen['totales'].get('total_ventas', 0) or 0,
+            'total_monto': float(resumen['totales'].get('total_monto', 0) or 0),
+            'promedio_venta': float(resumen['totales'].get('promedio_venta', 0) or 0),
+            'ventas_por_punto_venta': [
+                {
+                    'punto_venta': pv.get('nombre', 'N/A'),
+                    'total_ventas': pv.get('total_ventas', 0) or 0,
+                    'total_monto': float(pv.get('total_monto', 0) or 0)
+                }
+                for pv in resumen['ventas_por_punto_venta']
+            ],
+            'ventas_por_hora': [
+                {
+                    'hora': h['hora'].strftime('%Y-%m-%d %H:00'),
+                    'total_ventas': h['total_ventas'],
+                    'total_monto': float(h['total_monto'])
+                }
+                for h in resumen['ventas_por_hora']
+            ],
+            'productos_mas_vendidos': [
+                {
+                    'producto': p['producto'] or 'Producto eliminado',
+                    'cantidad': int(p['cantidad'] or 0),
+                    'total': float(p['total'] or 0)
+                }
+                for p in productos_mas_vendidos
+            ],
+            'ventas_por_tipo': [
+                {
+                    'tipo': t['tipo'] or 'Producto eliminado',
+                    'cantidad': int(t['cantidad'] or 0),
+                    'total': float(t['total'] or 0)
+                }
+                for t in ventas_por_tipo
+            ]
+        }
+    
+    return datos
+
 def obtener_reporte_ventas():
     """
     Obtiene reporte de ventas con filtros
@@ -1089,6 +1811,8 @@ def obtener_reporte_ventas():
         - fecha_inicio: YYYY-MM-DD (opcional)
         - fecha_fin: YYYY-MM-DD (opcional)
         - punto_venta_id: int (opcional)
+        - limit: int (opcional, default 100, máximo 1000) - Ventas por página
+        - before_id: int (opcional) - Ventas anteriores a este id
     """
     from flask import session
     from auth.auth_routes import obtener_rol_usuario
@@ -1102,120 +1826,138 @@ def obtener_reporte_ventas():
         }), 403
     
     try:
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
+        fecha_inicio = normalizar_fecha(request.args.get('fecha_inicio'))
+        fecha_fin = normalizar_fecha(request.args.get('fecha_fin'))
         punto_venta_id = request.args.get('punto_venta_id', type=int)
+        before_id = request.args.get('before_id', type=int)
+        limite = request.args.get('limit', REPORTE_LIMITE_DEFAULT, type=int)
+        if limite < 1 or limite > REPORTE_LIMITE_MAXIMO:
+            return jsonify({
+                'success': False,
+                'error': f'limit debe estar entre 1 y {REPORTE_LIMITE_MAXIMO}'
+            }), 400
         
-        # Obtener ventas
-        ventas = Transaccion.obtener_ventas(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            punto_venta_id=punto_venta_id
-        )
-        
-        # Obtener resumen
-        resumen = Transaccion.obtener_resumen_ventas(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            punto_venta_id=punto_venta_id
+        datos = _cache_reportes.obtener_o_calcular(
+            ('ventas', fecha_inicio, fecha_fin, punto_venta_id, before_id, limite),
+            Transaccion.obtener_ultimo_id,
+            rango_cerrado(fecha_fin),
+            lambda: calcular_reporte_ventas(fecha_inicio, fecha_fin, punto_venta_id, before_id, limite)
         )
         
-        # Formatear ventas
-        ventas_formateadas = []
-        productos_vendidos = {}  # Para contar productos más vendidos
-        
-        for venta in ventas:
-            # Extraer últimos 4 dígitos de la tarjeta
-            numero_tarjeta = venta.get('numero_tarjeta', '')
-            ultimos_4 = numero_tarjeta[-4:] if len(numero_tarjeta) > 4 else numero_tarjeta
-            
-            # Parsear productos de la descripción
-            productos = parsear_productos_descripcion(venta.get('descripcion', ''))
-            
-            # Si no se pudieron parsear productos, crear uno genérico
-            if not productos:
-                productos = [{
-                    'nombre': venta.get('descripcion', 'Venta general') or 'Venta general',
-                    'cantidad': 1,
-                    'precio_unitario': float(venta.get('monto', 0)),
-                    'total': float(venta.get('monto', 0))
-                }]
-            else:
-                # Distribuir el monto total entre los productos
-                monto_total = float(venta.get('monto', 0))
-                cantidad_total = sum(p['cantidad'] for p in productos)
-                if cantidad_total > 0:
-                    precio_promedio = monto_total / cantidad_total
-                    for producto in productos:
-                        producto['precio_unitario'] = precio_promedio
-                        producto['total'] = producto['cantidad'] * precio_promedio
-                        # Contar productos vendidos
-                        nombre_prod = producto['nombre']
-                        if nombre_prod not in productos_vendidos:
-                            productos_vendidos[nombre_prod] = {'cantidad': 0, 'total': 0}
-                        productos_vendidos[nombre_prod]['cantidad'] += producto['cantidad']
-                        productos_vendidos[nombre_prod]['total'] += producto['total']
-            
-            # Crear una entrada por cada producto
-            for producto in productos:
-                ventas_formateadas.append({
-                    'id': venta.get('id'),
-                    'fecha_hora': venta.get('fecha_transaccion').strftime('%Y-%m-%d %H:%M:%S') if venta.get('fecha_transaccion') else None,
-                    'punto_venta': venta.get('punto_venta_nombre', 'N/A'),
-                    'punto_venta_id': venta.get('punto_venta_id'),
-                    'producto': producto['nombre'],
-                    'cantidad': producto['cantidad'],
-                    'precio_unitario': producto.get('precio_unitario', 0),
-                    'total': producto.get('total', float(venta.get('monto', 0))),
-                    'tarjeta_ultimos_4': ultimos_4,
-                    'tarjeta_completa': numero_tarjeta,
-                    'asistente': venta.get('asistente_nombre', 'N/A'),
-                    'asistente_id': venta.get('asistente_id'),
-                    'usuario': 'Sistema',  # Por ahora, no hay tracking de usuario
-                    'transaccion_id': venta.get('id')
-                })
-        
-        # Ordenar productos más vendidos
-        productos_mas_vendidos = sorted(
-            productos_vendidos.items(),
-            key=lambda x: x[1]['cantidad'],
-            reverse=True
-        )[:10]  # Top 10
-        
         return jsonify({
             'success': True,
-            'data': {
-                'ventas': ventas_formateadas,
-                'resumen': {
-                    'total_ventas': resumen['totales'].get('total_ventas', 0) or 0,
-                    'total_monto': float(resumen['totales'].get('total_monto', 0) or 0),
-                    'promedio_venta': float(resumen['totales'].get('promedio_venta', 0) or 0),
-                    'ventas_por_punto_venta': [
-                        {
-                            'punto_venta': pv.get('nombre', 'N/A'),
-                            'total_ventas': pv.get('total_ventas', 0) or 0,
-                            'total_monto': float(pv.get('total_monto', 0) or 0)
-                        }
-                        for pv in resumen['ventas_por_punto_venta']
-                    ],
-                    'productos_mas_vendidos': [
-                        {
-                            'producto': nombre,
-                            'cantidad': datos['cantidad'],
-                            'total': datos['total']
-                        }
-                        for nombre, datos in productos_mas_vendidos
-                    ]
-                }
-            }
+            'data': datos
         }), 200
         
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Las fechas deben tener el formato YYYY-MM-DD'
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+# Transacciones por página del reporte en formato JSON
+REPORTE_LIMITE_DEFAULT = 100
+REPORTE_LIMITE_MAXIMO = 1000
+
+# Columnas del reporte exportado en CSV
+COLUMNAS_CSV_TRANSACCIONES = [
+    'id', 'fecha_hora', 'tipo', 'monto', 'tarjeta_completa', 'asistente',
+    'punto_venta', 'estado', 'descripcion', 'saldo_anterior', 'saldo_nuevo'
+]
+
+def exportar_reporte_transacciones(bloques, formato):
+    """
+    Envía el reporte (NDJSON o CSV) a medida que se leen los bloques de filas
+
+    El worker solo mantiene en memoria el bloque que está leyendo del servidor,
+    sin importar cuántas transacciones abarque el reporte. Cada bloque se
+    formatea por columnas con ColumnasTransacciones.
+    """
+    import csv
+    import io
+    import json
+    from flask import Response, stream_with_context
+    
+    def generar_ndjson():
+        for bloque in bloques:
+            yield ''.join(
+                json.dumps(registro, ensure_ascii=False) + '\n'
+                for registro in ColumnasTransacciones(bloque).registros()
+            )
+    
+    def generar_csv():
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(COLUMNAS_CSV_TRANSACCIONES)
+        for bloque in bloques:
+            escritor.writerows(ColumnasTransacciones(bloque).filas(COLUMNAS_CSV_TRANSACCIONES))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    
+    if formato == 'csv':
+        return Response(
+            stream_with_context(generar_csv()),
+            mimetype='text/csv',
+            headers={'Content-Disposition': 'attachment; filename=reporte_transacciones.csv'}
+        )
+    return Response(stream_with_context(generar_ndjson()), mimetype='application/x-ndjson')
+
+def calcular_pagina_transacciones(fecha_inicio=None, fecha_fin=None, tipo=None, punto_venta_id=None,
+                                  before_id=None, limite=REPORTE_LIMITE_DEFAULT):
+    """
+    Calcula una página del reporte de transacciones (lo que se guarda en el caché de reportes)
+    
+    Returns:
+        dict: {'transacciones': [...], 'paginacion': {...}, 'resumen': {...} (solo primera página)}
+    """
+    # Obtener transacciones (una fila extra indica si hay más páginas)
+    columnas = ColumnasTransacciones(Transaccion.obtener_todas_transacciones(
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        tipo=tipo,
+        punto_venta_id=punto_venta_id,
+        before_id=before_id,
+        limite=limite + 1,
+        como_tuplas=True
+    ))
+    hay_mas = len(columnas) > limite
+    transacciones = columnas.registros(0, limite)
+    
+    datos = {
+        'transacciones': transacciones,
+        'paginacion': {
+            'limit': limite,
+            'hay_mas': hay_mas,
+            'siguiente_before_id': transacciones[-1]['id'] if hay_mas else None
+        }
+    }
+    
+    # Los totales abarcan todo el rango: se calculan en SQL y solo en la primera página
+    if not before_id:
+        totales = Transaccion.obtener_totales_transacciones(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            tipo=tipo,
+            punto_venta_id=punto_venta_id
+        )
+        datos['resumen'] = {
+            'total_transacciones': totales['recarga']['cantidad'] + totales['pago']['cantidad'],
+            'total_recargas': totales['recarga']['cantidad'],
+            'total_pagos': totales['pago']['cantidad'],
+            'monto_total_recargas': totales['recarga']['monto'],
+            'monto_total_pagos': totales['pago']['monto'],
+            'diferencia': totales['recarga']['monto'] - totales['pago']['monto']
+        }
+    
+    return datos
+
 def obtener_reporte_transacciones():
     """
     Obtiene reporte de transacciones (recargas y pagos) con filtros
@@ -1226,6 +1968,9 @@ def obtener_reporte_transacciones():
         - fecha_fin: YYYY-MM-DD (opcional)
         - tipo: 'recarga' o 'pago' (opcional)
         - punto_venta_id: int (opcional)
+        - formato: 'json' (default, paginado), 'ndjson' o 'csv' (todas las filas en streaming)
+        - before_id: int (opcional, solo json) - Transacciones anteriores a este id
+        - limit: int (opcional, solo json, default 100, máximo 1000)
     """
     from flask import session
     from auth.auth_routes import obtener_rol_usuario
@@ -1239,82 +1984,318 @@ def obtener_reporte_transacciones():
         }), 403
     
     try:
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
+        fecha_inicio = normalizar_fecha(request.args.get('fecha_inicio'))
+        fecha_fin = normalizar_fecha(request.args.get('fecha_fin'))
         tipo = request.args.get('tipo')
         punto_venta_id = request.args.get('punto_venta_id', type=int)
+        formato = request.args.get('formato', 'json')
         
-        # Obtener transacciones
-        transacciones = Transaccion.obtener_todas_transacciones(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            tipo=tipo,
-            punto_venta_id=punto_venta_id
+        if formato not in ('json', 'ndjson', 'csv'):
+            return jsonify({
+                'success': False,
+                'error': "formato debe ser 'json', 'ndjson' o 'csv'"
+            }), 400
+        
+        if formato != 'json':
+            bloques = Transaccion.iterar_bloques_transacciones(
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                tipo=tipo,
+                punto_venta_id=punto_venta_id
+            )
+            return exportar_reporte_transacciones(bloques, formato)
+        
+        before_id = request.args.get('before_id', type=int)
+        limite = request.args.get('limit', REPORTE_LIMITE_DEFAULT, type=int)
+        if limite < 1 or limite > REPORTE_LIMITE_MAXIMO:
+            return jsonify({
+                'success': False,
+                'error': f'limit debe estar entre 1 y {REPORTE_LIMITE_MAXIMO}'
+            }), 400
+        
+        datos = _cache_reportes.obtener_o_calcular(
+            ('transacciones', fecha_inicio, fecha_fin, tipo, punto_venta_id, before_id, limite),
+            Transaccion.obtener_ultimo_id,
+            rango_cerrado(fecha_fin),
+            lambda: calcular_pagina_transacciones(
+                fecha_inicio, fecha_fin, tipo, punto_venta_id, before_id, limite
+            )
         )
         
-        # Formatear transacciones
-        transacciones_formateadas = []
-        totales = {'recargas': 0, 'pagos': 0, 'total_recargas': 0, 'total_pagos': 0}
+        return jsonify({
+            'success': True,
+            'data': datos
+        }), 200
         
-        for trans in transacciones:
-            # Extraer últimos 4 dígitos de la tarjeta
-            numero_tarjeta = trans.get('numero_tarjeta', '')
-            ultimos_4 = numero_tarjeta[-4:] if len(numero_tarjeta) > 4 else numero_tarjeta
-            
-            tipo_trans = trans.get('tipo', '')
-            monto = float(trans.get('monto', 0))
-            
-            # Determinar estado
-            saldo_anterior = float(trans.get('saldo_anterior', 0))
-            saldo_nuevo = float(trans.get('saldo_nuevo', 0))
-            
-            if tipo_trans == 'pago':
-                if saldo_anterior >= monto:
-                    estado = 'exitosa'
-                else:
-                    estado = 'saldo_insuficiente'
-            else:
-                estado = 'exitosa'
-            
-            transacciones_formateadas.append({
-                'id': trans.get('id'),
-                'fecha_hora': trans.get('fecha_transaccion').strftime('%Y-%m-%d %H:%M:%S') if trans.get('fecha_transaccion') else None,
-                'tipo': tipo_trans,
-                'monto': monto,
-                'monto_formateado': f"${monto:.2f}",
-                'tarjeta_ultimos_4': ultimos_4,
-                'tarjeta_completa': numero_tarjeta,
-                'asistente': trans.get('asistente_nombre', 'N/A'),
-                'asistente_id': trans.get('asistente_id'),
-                'punto_venta': trans.get('punto_venta_nombre', 'N/A' if tipo_trans == 'pago' else None),
-                'punto_venta_id': trans.get('punto_venta_id'),
-                'usuario': 'Sistema',  # Por ahora, no hay tracking de usuario
-                'estado': estado,
-                'descripcion': trans.get('descripcion', ''),
-                'saldo_anterior': saldo_anterior,
-                'saldo_nuevo': saldo_nuevo
-            })
-            
-            # Actualizar totales
-            if tipo_trans == 'recarga':
-                totales['recargas'] += 1
-                totales['total_recargas'] += monto
-            else:
-                totales['pagos'] += 1
-                totales['total_pagos'] += monto
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Las fechas deben tener el formato YYYY-MM-DD'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# Transacciones por página de la API incremental (delta)
+DELTA_LIMITE_DEFAULT = 500
+DELTA_LIMITE_MAXIMO = 5000
+
+# Segundos que se espera antes de entregar una transacción en el delta: los
+# ids se asignan al insertar, pero una transacción con id menor puede
+# confirmarse después de otra con id mayor; si se entregara la mayor, el
+# cliente avanzaría su marca de agua y nunca recibiría la menor
+DELTA_MARGEN_SEGUNDOS = 5
+
+def obtener_delta_transacciones():
+    """
+    Obtiene solo las transacciones nuevas desde la última sincronización
+    
+    Endpoint: GET /api/reportes/transacciones/delta
+    Query params:
+        - since_id: int (requerido) - Último id ya sincronizado (0 = desde el principio)
+        - limit: int (opcional, default 500, máximo 5000)
+        - tipo: 'recarga' o 'pago' (opcional)
+        - punto_venta_id: int (opcional)
+    """
+    from datetime import timedelta
+    from auth.auth_routes import obtener_rol_usuario
+    
+    # Verificar que solo admin puede ver reportes
+    rol = obtener_rol_usuario()
+    if rol != 'admin':
+        return jsonify({
+            'success': False,
+            'error': 'Solo los administradores pueden ver reportes'
+        }), 403
+    
+    try:
+        since_id = request.args.get('since_id', type=int)
+        if since_id is None or since_id < 0:
+            return jsonify({
+                'success': False,
+                'error': 'since_id es obligatorio y debe ser un entero mayor o igual a 0'
+            }), 400
+        
+        limite = request.args.get('limit', DELTA_LIMITE_DEFAULT, type=int)
+        if limite < 1 or limite > DELTA_LIMITE_MAXIMO:
+            return jsonify({
+                'success': False,
+                'error': f'limit debe estar entre 1 y {DELTA_LIMITE_MAXIMO}'
+            }), 400
         
+        # Un tipo mal escrito daría un delta vacío y el cliente se saltaría filas
+        tipo = request.args.get('tipo') or None
+        if tipo not in (None, 'recarga', 'pago'):
+            return jsonify({
+                'success': False,
+                'error': "tipo debe ser 'recarga' o 'pago'"
+            }), 400
+        
+        ahora, filas = Transaccion.obtener_transacciones_desde(
+            since_id,
+            limite + 1,
+            tipo=tipo,
+            punto_venta_id=request.args.get('punto_venta_id', type=int)
+        )
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+        
+        # Cortar en la primera transacción demasiado reciente (ver DELTA_MARGEN_SEGUNDOS)
+        limite_fecha = ahora - timedelta(seconds=DELTA_MARGEN_SEGUNDOS)
+        for posicion, fila in enumerate(filas):
+            if fila[1] is not None and fila[1] >= limite_fecha:
+                filas = filas[:posicion]
+                hay_mas = False
+                break
+        
+        transacciones = ColumnasTransacciones(filas).registros()
         return jsonify({
             'success': True,
             'data': {
-                'transacciones': transacciones_formateadas,
-                'resumen': {
-                    'total_transacciones': len(transacciones_formateadas),
-                    'total_recargas': totales['recargas'],
-                    'total_pagos': totales['pagos'],
-                    'monto_total_recargas': totales['total_recargas'],
-                    'monto_total_pagos': totales['total_pagos'],
-                    'diferencia': totales['total_recargas'] - totales['total_pagos']
-                }
+                'transacciones': transacciones,
+                'since_id': since_id,
+                'marca_agua': transacciones[-1]['id'] if transacciones else since_id,
+                'hay_mas': hay_mas
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# ============================================
+# FUNCIONES DE FEED EN VIVO
+# ============================================
+
+# Segundos entre comentarios de latido y duración máxima de cada conexión;
+# al cerrarse, EventSource reconecta solo y recibe los totales actualizados
+EN_VIVO_LATIDO = 15
+EN_VIVO_DURACION_MAXIMA = 300
+EN_VIVO_REINTENTO_MS = 3000
+
+# Segundos entre revisiones del aviso de otros workers y transacciones
+# leídas por consulta al feed
+EN_VIVO_SONDEO = 1
+EN_VIVO_LOTE = 500
+
+def evento_sse(tipo, datos, evento_id=None):
+    """
+    Formatea un evento de Server-Sent Events
+    """
+    import json
+    
+    lineas = f"id: {evento_id}\n" if evento_id is not None else ""
+    return f"{lineas}event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+def transmitir_transacciones_en_vivo():
+    """
+    Feed en vivo de pagos y recargas para el dashboard (Server-Sent Events)
+    
+    Endpoint: GET /api/reportes/en-vivo
+    Eventos:
+        - totales: totales del día al conectarse {fecha, recarga, pago, ultimo_id}
+        - transaccion: cada pago o recarga confirmado, con los totales del día acumulados
+        - error: falló una consulta; el servidor cierra la conexión
+    
+    Las transacciones se leen de la base de datos a partir del último id
+    enviado, así que llegan las de todos los workers. La consulta se hace
+    cuando eventos.canal_transacciones avisa de un pago en este worker, cuando
+    cambia la generación 'transacciones' de invalidacion.py (pagos en otros
+    workers o scripts) y, por si acaso, en cada latido.
+    """
+    import time
+    from datetime import timedelta
+    from flask import Response, stream_with_context
+    from eventos import CanalLleno
+    
+    try:
+        suscripcion = canal_transacciones.suscribir()
+    except CanalLleno:
+        return jsonify({
+            'success': False,
+            'error': 'Hay demasiadas conexiones al feed en vivo, intente más tarde'
+        }), 503
+    
+    try:
+        # Una sola transacción (la de la petición): los totales incluyen
+        # exactamente las transacciones hasta `desde` y las de `recientes`.
+        # El día es el de MySQL, que es el que pone fecha_transaccion
+        generacion = tabla_generaciones.generacion('transacciones')
+        hoy, desde, recientes = Transaccion.obtener_inicio_en_vivo(DELTA_MARGEN_SEGUNDOS)
+        totales = Transaccion.obtener_totales_transacciones(
+            fecha_inicio=hoy.isoformat(), fecha_fin=hoy.isoformat()
+        )
+    except Exception as e:
+        suscripcion.cerrar()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    def generar():
+        nonlocal hoy, totales, generacion, desde
+        # Como en el delta, una transacción con id menor puede confirmarse
+        # después de una con id mayor: la consulta empieza en `desde`, que solo
+        # avanza sobre transacciones con más de DELTA_MARGEN_SEGUNDOS, y
+        # `enviadas` evita repetir las más recientes (al empezar, las que ya
+        # están en los totales)
+        enviadas = set(recientes)
+        ultimo_id = max(recientes, default=desde)
+        try:
+            yield f"retry: {EN_VIVO_REINTENTO_MS}\n\n"
+            yield evento_sse('totales', {'fecha': hoy.isoformat(), 'ultimo_id': ultimo_id, **totales})
+            
+            fin = time.monotonic() + EN_VIVO_DURACION_MAXIMA
+            proximo_latido = time.monotonic() + EN_VIVO_LATIDO
+            while time.monotonic() < fin:
+                avisos = suscripcion.esperar(EN_VIVO_SONDEO)
+                generacion_actual = tabla_generaciones.generacion('transacciones')
+                latido = time.monotonic() >= proximo_latido
+                if not avisos and generacion_actual == generacion and not latido:
+                    continue
+                generacion = generacion_actual
+                
+                # La sesión de la petición ya terminó: cada consulta usa una conexión
+                # del pool. Se pide por páginas hasta alcanzar la última transacción
+                salida = []
+                cursor_id = desde
+                avanzar = True
+                while True:
+                    ahora, filas = Transaccion.obtener_transacciones_desde(cursor_id, EN_VIVO_LOTE)
+                    limite_fecha = ahora - timedelta(seconds=DELTA_MARGEN_SEGUNDOS)
+                    for columnas in filas:
+                        transaccion_id, fecha, tipo, monto = columnas[:4]
+                        punto_venta_id, punto_venta = columnas[10:12]
+                        # Avanzar `desde` sobre el prefijo que ya no puede cambiar
+                        avanzar = avanzar and fecha < limite_fecha
+                        if avanzar:
+                            desde = transaccion_id
+                        if transaccion_id in enviadas:
+                            continue
+                        enviadas.add(transaccion_id)
+                        if fecha.date() != hoy:
+                            # Cambio de día: los totales vuelven a empezar
+                            hoy = fecha.date()
+                            totales = {t: {'cantidad': 0, 'monto': 0.0} for t in totales}
+                        acumulado = totales[tipo]
+                        acumulado['cantidad'] += 1
+                        acumulado['monto'] = round(acumulado['monto'] + float(monto), 2)
+                        salida.append(evento_sse('transaccion', {
+                            'id': transaccion_id,
+                            'tipo': tipo,
+                            'monto': float(monto),
+                            'punto_venta_id': punto_venta_id,
+                            'punto_venta': punto_venta,
+                            'fecha_hora': fecha.strftime('%Y-%m-%d %H:%M:%S'),
+                            'totales': totales
+                        }, transaccion_id))
+                    if len(filas) < EN_VIVO_LOTE:
+                        break
+                    cursor_id = filas[-1][0]
+                enviadas = {i for i in enviadas if i > desde}
+                
+                if salida:
+                    yield ''.join(salida)
+                    proximo_latido = time.monotonic() + EN_VIVO_LATIDO
+                elif latido:
+                    yield ": latido\n\n"
+                    proximo_latido = time.monotonic() + EN_VIVO_LATIDO
+        except Exception as e:
+            # La respuesta ya empezó: se avisa con un evento y se cierra;
+            # EventSource reconecta solo y vuelve a recibir los totales
+            print(f"Error en el feed en vivo: {e}")
+            yield evento_sse('error', {'error': str(e)})
+        finally:
+            suscripcion.cerrar()
+    
+    return Response(
+        stream_with_context(generar()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# ============================================
+# FUNCIONES DE SISTEMA
+# ============================================
+
+def obtener_estadisticas_sistema():
+    """
+    Obtiene estadísticas de ejecución del worker actual (pool de conexiones, cachés y feed en vivo)
+    
+    Endpoint: GET /api/sistema/estadisticas
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'pool': obtener_estadisticas_pool(),
+                'caches': obtener_estadisticas_caches(),
+                'eventos': canal_transacciones.estadisticas(),
+                'invalidacion': tabla_generaciones.estadisticas()
             }
         }), 200
         
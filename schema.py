@@ -1,210 +1,282 @@
 """
-Archivo para crear el esquema de la base de datos (Paso 2)
-Este archivo contiene todas las funciones para crear tablas y datos iniciales
+Archivo para crear y actualizar el esquema de la base de datos (Paso 2)
+Aplica en orden las migraciones de la carpeta migraciones/ y registra
+cada una en la tabla schema_version
 """
+import importlib.util
+import os
+import re
+import time
 import mysql.connector
 from mysql.connector import Error
 from config import Config
 from database import get_db_connection
 
-def init_database():
+CARPETA_MIGRACIONES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migraciones')
+
+# Evita que dos procesos (p. ej. dos despliegues) migren al mismo tiempo
+NOMBRE_BLOQUEO = 'migraciones_esquema'
+TIMEOUT_BLOQUEO = 30
+
+class Migrador:
     """
-    Inicializa la base de datos creando todas las tablas necesarias.
-    Esta función:
-    1. Crea la base de datos si no existe
-    2. Crea todas las tablas (asistentes, tarjetas, puntos_venta, transacciones)
-    3. Inserta los puntos de venta por defecto
+    Operaciones disponibles para las migraciones
+
+    Las operaciones verifican el estado actual antes de crear algo, así que
+    una migración se puede aplicar sobre una base de datos que ya tiene el
+    cambio. En modo simulación solo se imprime el SQL que se ejecutaría.
+
+    Args:
+        cursor: Cursor de la base de datos (None si la base todavía no existe)
+        simular (bool): Imprimir el plan en lugar de ejecutarlo
+    """
+
+    def __init__(self, cursor, simular=False):
+        self.cursor = cursor
+        self.simular = simular
+
+    def ejecutar(self, sql, params=None):
+        """Ejecuta una sentencia (o la imprime en modo simulación)"""
+        if self.simular:
+            print("    " + " ".join(sql.split()))
+            return
+        self.cursor.execute(sql, params)
+
+    def _contar(self, sql, params):
+        if self.cursor is None:
+            return 0
+        self.cursor.execute(sql, params)
+        return self.cursor.fetchone()[0]
+
+    def existe_tabla(self, tabla):
+        return self._contar("""
+            SELECT COUNT(*) FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, (tabla,)) > 0
+
+    def existe_columna(self, tabla, columna):
+        return self._contar("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (tabla, columna)) > 0
+
+    def existe_indice(self, tabla, nombre):
+        return self._contar("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (tabla, nombre)) > 0
+
+    def agregar_columna(self, tabla, columna, definicion):
+        """
+        Agrega una columna si no existe, sin bloquear lecturas ni escrituras
+
+        Args:
+            tabla (str): Nombre de la tabla
+            columna (str): Nombre de la columna
+            definicion (str): Tipo y opciones, p. ej. "VARCHAR(500) AFTER descripcion"
+        """
+        if not self.existe_columna(tabla, columna):
+            self.ejecutar(
+                f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}, ALGORITHM=INPLACE, LOCK=NONE"
+            )
+
+    def crear_indice(self, tabla, nombre, columnas, unico=False):
+        """
+        Crea un índice si no existe, en línea (la tabla sigue aceptando escrituras)
+
+        Con ALGORITHM=INPLACE, LOCK=NONE MySQL falla en lugar de copiar la
+        tabla con bloqueo si el cambio no se puede hacer en línea, lo que en
+        pleno evento detendría los pagos.
+
+        Args:
+            tabla (str): Nombre de la tabla
+            nombre (str): Nombre del índice
+            columnas (str): Columnas del índice, p. ej. "tipo, fecha_transaccion"
+            unico (bool): Crear un índice UNIQUE
+        """
+        if not self.existe_indice(tabla, nombre):
+            tipo = 'UNIQUE INDEX' if unico else 'INDEX'
+            self.ejecutar(
+                f"ALTER TABLE {tabla} ADD {tipo} {nombre} ({columnas}), ALGORITHM=INPLACE, LOCK=NONE"
+            )
+
+    def insertar_si_vacia(self, tabla, sql, filas):
+        """Inserta datos por defecto solo si la tabla no tiene filas"""
+        if self.existe_tabla(tabla) and self._contar(f"SELECT COUNT(*) FROM {tabla}", None) > 0:
+            return
+        if self.simular:
+            print(f"    {' '.join(sql.split())} ({len(filas)} filas)")
+            return
+        self.cursor.executemany(sql, filas)
+
+def cargar_migraciones():
+    """
+    Carga las migraciones de la carpeta migraciones/ ordenadas por versión
+
+    Returns:
+        list: Tuplas (version, nombre, modulo)
     """
-    connection = None
+    migraciones = []
+    for archivo in sorted(os.listdir(CARPETA_MIGRACIONES)):
+        coincidencia = re.match(r'^(\d{4})_(\w+)\.py$', archivo)
+        if not coincidencia:
+            continue
+        version, nombre = int(coincidencia.group(1)), coincidencia.group(2)
+        spec = importlib.util.spec_from_file_location(
+            f'migraciones.m{version:04d}', os.path.join(CARPETA_MIGRACIONES, archivo)
+        )
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        migraciones.append((version, nombre, modulo))
+
+    versiones = [version for version, _, _ in migraciones]
+    if len(versiones) != len(set(versiones)):
+        raise ValueError("Hay dos migraciones con el mismo número de versión")
+    return migraciones
+
+def _existe_base_datos():
+    connection = mysql.connector.connect(
+        host=Config.MYSQL_HOST,
+        port=Config.MYSQL_PORT,
+        user=Config.MYSQL_USER,
+        password=Config.MYSQL_PASSWORD
+    )
+    cursor = connection.cursor()
     try:
-        # Paso 1: Conectar sin especificar base de datos para crearla si no existe
-        temp_connection = mysql.connector.connect(
-            host=Config.MYSQL_HOST,
-            port=Config.MYSQL_PORT,
-            user=Config.MYSQL_USER,
-            password=Config.MYSQL_PASSWORD
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.schemata WHERE schema_name = %s",
+            (Config.MYSQL_DATABASE,)
         )
-        cursor = temp_connection.cursor()
-        
-        # Crear base de datos si no existe
+        return cursor.fetchone()[0] > 0
+    finally:
+        cursor.close()
+        connection.close()
+
+def _crear_base_datos():
+    connection = mysql.connector.connect(
+        host=Config.MYSQL_HOST,
+        port=Config.MYSQL_PORT,
+        user=Config.MYSQL_USER,
+        password=Config.MYSQL_PASSWORD
+    )
+    cursor = connection.cursor()
+    try:
         cursor.execute(f"CREATE DATABASE IF NOT EXISTS {Config.MYSQL_DATABASE}")
+    finally:
         cursor.close()
-        temp_connection.close()
-        
-        # Paso 2: Conectar a la base de datos específica
+        connection.close()
+
+def _versiones_aplicadas(cursor):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = 'schema_version'
+    """)
+    if cursor.fetchone()[0] == 0:
+        return {}
+    cursor.execute("SELECT version, fecha_aplicacion FROM schema_version")
+    return dict(cursor.fetchall())
+
+def obtener_estado_migraciones():
+    """
+    Obtiene qué migraciones están aplicadas y cuáles pendientes
+
+    Returns:
+        list: Diccionarios con version, nombre, descripcion y fecha_aplicacion (None si pendiente)
+    """
+    aplicadas = {}
+    if _existe_base_datos():
         connection = get_db_connection()
         cursor = connection.cursor()
-        
-        # Paso 3: Crear tabla de asistentes
-        # Almacena información de cada asistente al evento
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS asistentes (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                email VARCHAR(100) UNIQUE,
-                telefono VARCHAR(20),
-                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                activo BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        # Paso 4: Crear tabla de tarjetas
-        # Cada tarjeta está vinculada a un asistente y tiene un saldo
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tarjetas (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                asistente_id INT NOT NULL,
-                numero_tarjeta VARCHAR(20) UNIQUE NOT NULL,
-                saldo DECIMAL(10, 2) DEFAULT 0.00,
-                fecha_asignacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                activa BOOLEAN DEFAULT TRUE,
-                FOREIGN KEY (asistente_id) REFERENCES asistentes(id) ON DELETE CASCADE
-            )
-        """)
-        
-        # Paso 5: Crear tabla de puntos de venta
-        # Restaurante, cafetería, tienda, etc.
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS puntos_venta (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                tipo VARCHAR(50) NOT NULL,
-                activo BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        # Paso 6: Crear tabla de productos
-        # Productos disponibles en los puntos de venta
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS productos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                precio DECIMAL(10, 2) NOT NULL,
-                tipo VARCHAR(50) NOT NULL,
-                punto_venta_id INT,
-                descripcion TEXT,
-                imagen_url VARCHAR(500),
-                activo BOOLEAN DEFAULT TRUE,
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (punto_venta_id) REFERENCES puntos_venta(id) ON DELETE SET NULL
-            )
-        """)
-        
-        # Agregar columna imagen_url si no existe (para bases de datos existentes)
         try:
-            cursor.execute("ALTER TABLE productos ADD COLUMN imagen_url VARCHAR(500) AFTER descripcion")
-        except Error:
-            pass  # La columna ya existe
-        
-        # Paso 7: Crear tabla de transacciones
-        # Registra todas las operaciones: recargas y pagos
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transacciones (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                tarjeta_id INT NOT NULL,
-                punto_venta_id INT,
-                tipo ENUM('recarga', 'pago') NOT NULL,
-                monto DECIMAL(10, 2) NOT NULL,
-                saldo_anterior DECIMAL(10, 2) NOT NULL,
-                saldo_nuevo DECIMAL(10, 2) NOT NULL,
-                fecha_transaccion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                descripcion TEXT,
-                FOREIGN KEY (tarjeta_id) REFERENCES tarjetas(id) ON DELETE CASCADE,
-                FOREIGN KEY (punto_venta_id) REFERENCES puntos_venta(id) ON DELETE SET NULL
-            )
-        """)
-        
-        # Paso 8: Insertar puntos de venta por defecto si no existen
-        cursor.execute("SELECT COUNT(*) FROM puntos_venta")
-        if cursor.fetchone()[0] == 0:
-            puntos_venta_default = [
-                ('Restaurante Principal', 'restaurante'),
-                ('Cafetería', 'cafeteria'),
-                ('Tienda de Souvenirs', 'souvenirs'),
-                ('Estacionamiento', 'estacionamiento'),
-                ('Bar', 'bar')
-            ]
-            cursor.executemany("""
-                INSERT INTO puntos_venta (nombre, tipo) VALUES (%s, %s)
-            """, puntos_venta_default)
-        
-        # Paso 9: Crear tabla de usuarios (para perfiles de administradores)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                usuario VARCHAR(50) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                rol ENUM('admin', 'punto_venta', 'recargas') NOT NULL,
-                nombre_completo VARCHAR(100),
-                email VARCHAR(100),
-                telefono VARCHAR(20),
-                foto_perfil VARCHAR(500),
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                activo BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        # Insertar usuarios por defecto si no existen
-        cursor.execute("SELECT COUNT(*) FROM usuarios")
-        if cursor.fetchone()[0] == 0:
-            usuarios_default = [
-                ('admin', 'admin123', 'admin', 'Administrador Principal', 'admin@evento.com', None, None),
-                ('punto_venta', 'venta123', 'punto_venta', 'Usuario Punto de Venta', 'venta@evento.com', None, None),
-                ('recargas', 'recarga123', 'recargas', 'Usuario Recargas', 'recargas@evento.com', None, None),
-            ]
-            cursor.executemany("""
-                INSERT INTO usuarios (usuario, password, rol, nombre_completo, email, telefono, foto_perfil) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, usuarios_default)
-        
-        # Paso 10: Insertar productos por defecto si no existen
-        cursor.execute("SELECT COUNT(*) FROM productos")
-        if cursor.fetchone()[0] == 0:
-            productos_default = [
-                # Restaurante
-                ('Hamburguesa', 80.00, 'restaurante', 1, 'Hamburguesa completa'),
-                ('Hot Dog', 50.00, 'restaurante', 1, 'Hot dog con papas'),
-                ('Pizza', 120.00, 'restaurante', 1, 'Pizza mediana'),
-                # Cafetería
-                ('Café', 30.00, 'cafeteria', 2, 'Café americano'),
-                ('Café con leche', 35.00, 'cafeteria', 2, 'Café con leche'),
-                ('Té', 25.00, 'cafeteria', 2, 'Té de hierbas'),
-                # Bebidas
-                ('Agua', 15.00, 'bebida', 1, 'Agua embotellada'),
-                ('Refresco', 25.00, 'bebida', 1, 'Refresco 500ml'),
-                ('Jugo', 30.00, 'bebida', 1, 'Jugo natural'),
-                # Comida
-                ('Tacos', 40.00, 'comida', 1, 'Orden de 3 tacos'),
-                ('Quesadillas', 45.00, 'comida', 1, 'Quesadillas de queso'),
-                # Postres
-                ('Postre', 45.00, 'postre', 1, 'Postre del día'),
-                ('Helado', 35.00, 'postre', 1, 'Helado de vainilla'),
-                # Ropa
-                ('Playera', 150.00, 'ropa', 3, 'Playera del evento'),
-                ('Gorra', 80.00, 'ropa', 3, 'Gorra con logo'),
-                # Souvenirs
-                ('Llavero', 25.00, 'souvenir', 3, 'Llavero conmemorativo'),
-                ('Taza', 60.00, 'souvenir', 3, 'Taza del evento'),
-            ]
-            cursor.executemany("""
-                INSERT INTO productos (nombre, precio, tipo, punto_venta_id, descripcion) 
-                VALUES (%s, %s, %s, %s, %s)
-            """, productos_default)
-        
-        connection.commit()
-        print("[OK] Base de datos inicializada correctamente")
-        print("[OK] Tablas creadas: usuarios, asistentes, tarjetas, puntos_venta, productos, transacciones")
-        print("[OK] Usuarios por defecto insertados")
-        print("[OK] Puntos de venta por defecto insertados")
-        print("[OK] Productos por defecto insertados")
-        
-    except Error as e:
-        print(f"[ERROR] Error al inicializar la base de datos: {e}")
-        if connection:
-            connection.rollback()
-        raise
-    finally:
-        if connection and connection.is_connected():
+            aplicadas = _versiones_aplicadas(cursor)
+        finally:
             cursor.close()
             connection.close()
+
+    return [{
+        'version': version,
+        'nombre': nombre,
+        'descripcion': getattr(modulo, 'DESCRIPCION', nombre),
+        'fecha_aplicacion': aplicadas.get(version)
+    } for version, nombre, modulo in cargar_migraciones()]
+
+def init_database(simular=False):
+    """
+    Crea la base de datos si no existe y aplica las migraciones pendientes.
+    Esta función:
+    1. Crea la base de datos si no existe
+    2. Crea la tabla schema_version
+    3. Aplica en orden cada migración que no esté registrada en schema_version
+
+    Args:
+        simular (bool): Solo imprimir el plan (no modifica la base de datos)
+
+    Returns:
+        list: Versiones aplicadas (o que se aplicarían al simular)
+    """
+    migraciones = cargar_migraciones()
+
+    if simular and not _existe_base_datos():
+        print(f"[PLAN] CREATE DATABASE {Config.MYSQL_DATABASE}")
+        migrador = Migrador(None, simular=True)
+        for version, nombre, modulo in migraciones:
+            print(f"[PLAN] {version:04d} {nombre}: {getattr(modulo, 'DESCRIPCION', nombre)}")
+            modulo.aplicar(migrador)
+        return [version for version, _, _ in migraciones]
+
+    if not simular:
+        _crear_base_datos()
+
+    connection = get_db_connection()
+    cursor = connection.cursor(buffered=True)
+    bloqueado = False
+    try:
+        if not simular:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (NOMBRE_BLOQUEO, TIMEOUT_BLOQUEO))
+            bloqueado = cursor.fetchone()[0] == 1
+            if not bloqueado:
+                raise Error(msg="Otro proceso está aplicando migraciones; intenta de nuevo más tarde")
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    nombre VARCHAR(100) NOT NULL,
+                    fecha_aplicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    duracion_ms INT
+                )
+            """)
+
+        aplicadas = _versiones_aplicadas(cursor)
+        pendientes = [m for m in migraciones if m[0] not in aplicadas]
+        if not pendientes:
+            print("[OK] El esquema está actualizado")
+            return []
+
+        migrador = Migrador(cursor, simular=simular)
+        for version, nombre, modulo in pendientes:
+            descripcion = getattr(modulo, 'DESCRIPCION', nombre)
+            if simular:
+                print(f"[PLAN] {version:04d} {nombre}: {descripcion}")
+                modulo.aplicar(migrador)
+                continue
+
+            inicio = time.monotonic()
+            try:
+                modulo.aplicar(migrador)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, nombre, duracion_ms) VALUES (%s, %s, %s)",
+                    (version, nombre, int((time.monotonic() - inicio) * 1000))
+                )
+                connection.commit()
+            except Error as e:
+                connection.rollback()
+                print(f"[ERROR] Migración {version:04d} {nombre}: {e}")
+                raise
+            print(f"[OK] {version:04d} {nombre}: {descripcion}")
+
+        return [version for version, _, _ in pendientes]
+    finally:
+        if bloqueado:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (NOMBRE_BLOQUEO,))
+        cursor.close()
+        connection.close()
@@ -58,6 +58,13 @@ window.cambiarSeccion = function cambiarSeccion(sectionName) {
         inicializarModuloTarjetas();
     }
     
+    // El feed en vivo solo se mantiene abierto mientras se ve el dashboard
+    if (sectionName === 'dashboard') {
+        iniciarFeedEnVivo();
+    } else {
+        detenerFeedEnVivo();
+    }
+    
     // NO cambiar hash en la URL
     // NO recargar la página
     // NO eliminar nodos del DOM
@@ -626,23 +633,36 @@ async function cargarPuntosVentaReportes() {
 // ============================================
 // REPORTE DE VENTAS
 // ============================================
-async function cargarReporteVentas() {
+// El reporte se pide por páginas (before_id) igual que el de transacciones;
+// la exportación descarga todos los pagos del filtro en streaming
+const VENTAS_POR_PAGINA = 100;
+let filtrosReporteVentas = '';
+let totalReporteVentas = 0;
+let ventasMostradas = 0;
+
+async function cargarReporteVentas(beforeId = null) {
     console.log('[Admin Base] Cargando reporte de ventas...');
     
-    const fechaInicio = document.getElementById('fechaInicioVentas')?.value;
-    const fechaFin = document.getElementById('fechaFinVentas')?.value;
-    const puntoVentaId = document.getElementById('puntoVentaVentas')?.value;
+    if (!beforeId) {
+        const fechaInicio = document.getElementById('fechaInicioVentas')?.value;
+        const fechaFin = document.getElementById('fechaFinVentas')?.value;
+        const puntoVentaId = document.getElementById('puntoVentaVentas')?.value;
+        
+        const filtros = new URLSearchParams();
+        if (fechaInicio) filtros.append('fecha_inicio', fechaInicio);
+        if (fechaFin) filtros.append('fecha_fin', fechaFin);
+        if (puntoVentaId) filtros.append('punto_venta_id', puntoVentaId);
+        filtrosReporteVentas = filtros.toString();
+    }
     
     try {
-        const params = new URLSearchParams();
-        if (fechaInicio) params.append('fecha_inicio', fechaInicio);
-        if (fechaFin) params.append('fecha_fin', fechaFin);
-        if (puntoVentaId) params.append('punto_venta_id', puntoVentaId);
+        const params = new URLSearchParams(filtrosReporteVentas);
+        params.append('limit', VENTAS_POR_PAGINA);
+        if (beforeId) params.append('before_id', beforeId);
         
         const { response, data, error } = await hacerPeticion(`/api/reportes/ventas?${params.toString()}`, {
             method: 'GET'
         });
-        
         if (error || !data.success) {
             if (typeof showAlert === 'function') {
                 showAlert('error', data?.error || 'Error al cargar el reporte de ventas');
@@ -652,7 +672,7 @@ async function cargarReporteVentas() {
             return;
         }
         
-        mostrarReporteVentas(data.data);
+        mostrarReporteVentas(data.data, Boolean(beforeId));
     } catch (error) {
         console.error('[Admin Base] Error cargando reporte de ventas:', error);
         if (typeof showAlert === 'function') {
@@ -663,20 +683,25 @@ async function cargarReporteVentas() {
     }
 }
 
-function mostrarReporteVentas(datos) {
+function mostrarReporteVentas(datos, agregar = false) {
     const ventas = datos.ventas || [];
-    const resumen = datos.resumen || {};
+    const paginacion = datos.paginacion || {};
     
-    // Mostrar resumen
-    const totalVentasEl = document.getElementById('totalVentas');
-    const montoTotalEl = document.getElementById('montoTotalVentas');
-    const promedioEl = document.getElementById('promedioVenta');
-    const resumenEl = document.getElementById('resumenVentas');
-    
-    if (totalVentasEl) totalVentasEl.textContent = formatearNumero(resumen.total_ventas || 0);
-    if (montoTotalEl) montoTotalEl.textContent = formatearMoneda(resumen.total_monto || 0);
-    if (promedioEl) promedioEl.textContent = formatearMoneda(resumen.promedio_venta || 0);
-    if (resumenEl) resumenEl.style.display = 'block';
+    // El resumen solo viene en la primera página y abarca todo el rango
+    if (!agregar) {
+        const resumen = datos.resumen || {};
+        totalReporteVentas = resumen.total_ventas || 0;
+        
+        const totalVentasEl = document.getElementById('totalVentas');
+        const montoTotalEl = document.getElementById('montoTotalVentas');
+        const promedioEl = document.getElementById('promedioVenta');
+        const resumenEl = document.getElementById('resumenVentas');
+        
+        if (totalVentasEl) totalVentasEl.textContent = formatearNumero(resumen.total_ventas || 0);
+        if (montoTotalEl) montoTotalEl.textContent = formatearMoneda(resumen.total_monto || 0);
+        if (promedioEl) promedioEl.textContent = formatearMoneda(resumen.promedio_venta || 0);
+        if (resumenEl) resumenEl.style.display = 'block';
+    }
     
     // Mostrar tabla
     const tbody = document.getElementById('tbodyVentas');
@@ -684,23 +709,26 @@ function mostrarReporteVentas(datos) {
     const sinDatos = document.getElementById('sinDatosVentas');
     const contador = document.getElementById('contadorVentas');
     const btnExportar = document.getElementById('btnExportarVentas');
+    const btnMas = document.getElementById('btnMasVentas');
     
     if (!tbody) {
         console.error('[Admin Base] No se encontró tbody de ventas');
         return;
     }
     
-    tbody.innerHTML = '';
-    
-    if (ventas.length === 0) {
-        if (tablaContainer) tablaContainer.style.display = 'none';
-        if (sinDatos) sinDatos.style.display = 'block';
-        return;
+    if (!agregar) {
+        tbody.innerHTML = '';
+        
+        if (ventas.length === 0) {
+            if (tablaContainer) tablaContainer.style.display = 'none';
+            if (sinDatos) sinDatos.style.display = 'block';
+            if (btnMas) btnMas.style.display = 'none';
+            return;
+        }
     }
     
     if (tablaContainer) tablaContainer.style.display = 'block';
     if (sinDatos) sinDatos.style.display = 'none';
-    if (contador) contador.textContent = `${ventas.length} registro(s)`;
     if (btnExportar) btnExportar.style.display = 'inline-block';
     
     ventas.forEach(venta => {
@@ -718,26 +746,129 @@ function mostrarReporteVentas(datos) {
         tbody.appendChild(row);
     });
     
+    // Una venta ocupa una fila por producto: el contador cuenta ventas
+    const ventasPagina = new Set(ventas.map(v => v.id)).size;
+    ventasMostradas = (agregar ? ventasMostradas : 0) + ventasPagina;
+    if (contador) {
+        contador.textContent = `${formatearNumero(ventasMostradas)} de ${formatearNumero(totalReporteVentas)} venta(s)`;
+    }
+    if (btnMas) {
+        btnMas.style.display = paginacion.hay_mas ? 'inline-block' : 'none';
+        btnMas.disabled = false;
+        btnMas.dataset.beforeId = paginacion.siguiente_before_id || '';
+    }
+    
     console.log('[Admin Base] Reporte de ventas mostrado:', ventas.length, 'registros');
 }
 
+// ============================================
+// FEED EN VIVO DEL DASHBOARD
+// ============================================
+// Una conexión Server-Sent Events recibe cada pago y recarga confirmado
+// con los totales del día, en lugar de volver a pedir los reportes
+const EN_VIVO_MAXIMO_FILAS = 20;
+let feedEnVivo = null;
+
+function iniciarFeedEnVivo() {
+    if (feedEnVivo || typeof EventSource === 'undefined') return;
+    
+    const estado = document.getElementById('estadoEnVivo');
+    feedEnVivo = new EventSource('/api/reportes/en-vivo');
+    
+    feedEnVivo.onopen = () => {
+        if (estado) estado.textContent = '🟢 En vivo';
+    };
+    feedEnVivo.onerror = () => {
+        // También llega aquí el evento `error` que el servidor envía antes de
+        // cerrar. EventSource reconecta solo; al volver llegan los totales actualizados.
+        // Si el servidor rechazó la conexión (p. ej. 503) queda cerrada
+        if (feedEnVivo && feedEnVivo.readyState === EventSource.CLOSED) {
+            feedEnVivo = null;
+            if (estado) estado.textContent = 'No disponible';
+        } else if (estado) {
+            estado.textContent = 'Reconectando...';
+        }
+    };
+    feedEnVivo.addEventListener('totales', (e) => {
+        mostrarTotalesEnVivo(JSON.parse(e.data));
+    });
+    feedEnVivo.addEventListener('transaccion', (e) => {
+        const trans = JSON.parse(e.data);
+        mostrarTotalesEnVivo(trans.totales);
+        agregarTransaccionEnVivo(trans);
+    });
+}
+
+function detenerFeedEnVivo() {
+    if (!feedEnVivo) return;
+    feedEnVivo.close();
+    feedEnVivo = null;
+    const estado = document.getElementById('estadoEnVivo');
+    if (estado) estado.textContent = 'Desconectado';
+}
+
+function mostrarTotalesEnVivo(totales) {
+    const ventasEl = document.getElementById('montoVentasEnVivo');
+    const recargasEl = document.getElementById('montoRecargasEnVivo');
+    const transaccionesEl = document.getElementById('totalTransacciones');
+    
+    if (ventasEl) ventasEl.textContent = formatearMoneda(totales.pago.monto);
+    if (recargasEl) recargasEl.textContent = formatearMoneda(totales.recarga.monto);
+    if (transaccionesEl) transaccionesEl.textContent = formatearNumero(totales.pago.cantidad + totales.recarga.cantidad);
+}
+
+function agregarTransaccionEnVivo(trans) {
+    const tbody = document.getElementById('tbodyEnVivo');
+    if (!tbody) return;
+    
+    // Celdas como texto: el nombre del punto de venta lo escribe un usuario
+    const row = document.createElement('tr');
+    [
+        trans.fecha_hora.slice(11),
+        trans.tipo === 'pago' ? '🛒 Pago' : '💵 Recarga',
+        trans.punto_venta || '-'
+    ].forEach(texto => {
+        row.insertCell().textContent = texto;
+    });
+    const monto = document.createElement('strong');
+    monto.textContent = formatearMoneda(trans.monto);
+    row.insertCell().appendChild(monto);
+    tbody.insertBefore(row, tbody.firstChild);
+    while (tbody.rows.length > EN_VIVO_MAXIMO_FILAS) {
+        tbody.deleteRow(-1);
+    }
+}
+
 // ============================================
 // REPORTE DE TRANSACCIONES
 // ============================================
-async function cargarReporteTransacciones() {
+// El reporte se pide por páginas (before_id); los filtros de la primera
+// página se guardan para "Cargar más" y para exportar el CSV completo
+const TRANSACCIONES_POR_PAGINA = 100;
+let filtrosReporteTransacciones = '';
+let totalReporteTransacciones = 0;
+
+async function cargarReporteTransacciones(beforeId = null) {
     console.log('[Admin Base] Cargando reporte de transacciones...');
     
-    const fechaInicio = document.getElementById('fechaInicioTransacciones')?.value;
-    const fechaFin = document.getElementById('fechaFinTransacciones')?.value;
-    const tipo = document.getElementById('tipoTransaccion')?.value;
-    const puntoVentaId = document.getElementById('puntoVentaTransacciones')?.value;
+    if (!beforeId) {
+        const fechaInicio = document.getElementById('fechaInicioTransacciones')?.value;
+        const fechaFin = document.getElementById('fechaFinTransacciones')?.value;
+        const tipo = document.getElementById('tipoTransaccion')?.value;
+        const puntoVentaId = document.getElementById('puntoVentaTransacciones')?.value;
+        
+        const filtros = new URLSearchParams();
+        if (fechaInicio) filtros.append('fecha_inicio', fechaInicio);
+        if (fechaFin) filtros.append('fecha_fin', fechaFin);
+        if (tipo) filtros.append('tipo', tipo);
+        if (puntoVentaId) filtros.append('punto_venta_id', puntoVentaId);
+        filtrosReporteTransacciones = filtros.toString();
+    }
     
     try {
-        const params = new URLSearchParams();
-        if (fechaInicio) params.append('fecha_inicio', fechaInicio);
-        if (fechaFin) params.append('fecha_fin', fechaFin);
-        if (tipo) params.append('tipo', tipo);
-        if (puntoVentaId) params.append('punto_venta_id', puntoVentaId);
+        const params = new URLSearchParams(filtrosReporteTransacciones);
+        params.append('limit', TRANSACCIONES_POR_PAGINA);
+        if (beforeId) params.append('before_id', beforeId);
         
         const { response, data, error } = await hacerPeticion(`/api/reportes/transacciones?${params.toString()}`, {
             method: 'GET'
@@ -752,7 +883,7 @@ async function cargarReporteTransacciones() {
             return;
         }
         
-        mostrarReporteTransacciones(data.data);
+        mostrarReporteTransacciones(data.data, Boolean(beforeId));
     } catch (error) {
         console.error('[Admin Base] Error cargando reporte de transacciones:', error);
         if (typeof showAlert === 'function') {
@@ -763,22 +894,27 @@ async function cargarReporteTransacciones() {
     }
 }
 
-function mostrarReporteTransacciones(datos) {
+function mostrarReporteTransacciones(datos, agregar = false) {
     const transacciones = datos.transacciones || [];
-    const resumen = datos.resumen || {};
+    const paginacion = datos.paginacion || {};
     
-    // Mostrar resumen
-    const totalTransEl = document.getElementById('totalTransaccionesReporte');
-    const totalRecargasEl = document.getElementById('totalRecargas');
-    const totalPagosEl = document.getElementById('totalPagos');
-    const diferenciaEl = document.getElementById('diferenciaTransacciones');
-    const resumenEl = document.getElementById('resumenTransacciones');
-    
-    if (totalTransEl) totalTransEl.textContent = formatearNumero(resumen.total_transacciones || 0);
-    if (totalRecargasEl) totalRecargasEl.textContent = formatearNumero(resumen.total_recargas || 0);
-    if (totalPagosEl) totalPagosEl.textContent = formatearNumero(resumen.total_pagos || 0);
-    if (diferenciaEl) diferenciaEl.textContent = formatearMoneda(resumen.diferencia || 0);
-    if (resumenEl) resumenEl.style.display = 'block';
+    // El resumen solo viene en la primera página y abarca todo el rango
+    if (!agregar) {
+        const resumen = datos.resumen || {};
+        totalReporteTransacciones = resumen.total_transacciones || 0;
+        
+        const totalTransEl = document.getElementById('totalTransaccionesReporte');
+        const totalRecargasEl = document.getElementById('totalRecargas');
+        const totalPagosEl = document.getElementById('totalPagos');
+        const diferenciaEl = document.getElementById('diferenciaTransacciones');
+        const resumenEl = document.getElementById('resumenTransacciones');
+        
+        if (totalTransEl) totalTransEl.textContent = formatearNumero(resumen.total_transacciones || 0);
+        if (totalRecargasEl) totalRecargasEl.textContent = formatearNumero(resumen.total_recargas || 0);
+        if (totalPagosEl) totalPagosEl.textContent = formatearNumero(resumen.total_pagos || 0);
+        if (diferenciaEl) diferenciaEl.textContent = formatearMoneda(resumen.diferencia || 0);
+        if (resumenEl) resumenEl.style.display = 'block';
+    }
     
     // Mostrar tabla
     const tbody = document.getElementById('tbodyTransacciones');
@@ -786,23 +922,26 @@ function mostrarReporteTransacciones(datos) {
     const sinDatos = document.getElementById('sinDatosTransacciones');
     const contador = document.getElementById('contadorTransacciones');
     const btnExportar = document.getElementById('btnExportarTransacciones');
+    const btnMas = document.getElementById('btnMasTransacciones');
     
     if (!tbody) {
         console.error('[Admin Base] No se encontró tbody de transacciones');
         return;
     }
     
-    tbody.innerHTML = '';
-    
-    if (transacciones.length === 0) {
-        if (tablaContainer) tablaContainer.style.display = 'none';
-        if (sinDatos) sinDatos.style.display = 'block';
-        return;
+    if (!agregar) {
+        tbody.innerHTML = '';
+        
+        if (transacciones.length === 0) {
+            if (tablaContainer) tablaContainer.style.display = 'none';
+            if (sinDatos) sinDatos.style.display = 'block';
+            if (btnMas) btnMas.style.display = 'none';
+            return;
+        }
     }
     
     if (tablaContainer) tablaContainer.style.display = 'block';
     if (sinDatos) sinDatos.style.display = 'none';
-    if (contador) contador.textContent = `${transacciones.length} registro(s)`;
     if (btnExportar) btnExportar.style.display = 'inline-block';
     
     transacciones.forEach(trans => {
@@ -827,6 +966,15 @@ function mostrarReporteTransacciones(datos) {
         tbody.appendChild(row);
     });
     
+    if (contador) {
+        contador.textContent = `${formatearNumero(tbody.rows.length)} de ${formatearNumero(totalReporteTransacciones)} registro(s)`;
+    }
+    if (btnMas) {
+        btnMas.style.display = paginacion.hay_mas ? 'inline-block' : 'none';
+        btnMas.disabled = false;
+        btnMas.dataset.beforeId = paginacion.siguiente_before_id || '';
+    }
+    
     console.log('[Admin Base] Reporte de transacciones mostrado:', transacciones.length, 'registros');
 }
 
@@ -2195,7 +2343,8 @@ async function procesarVentaPOS() {
                 numero_tarjeta: tarjetaActualPOS.numero_tarjeta,
                 punto_venta_id: puntoVentaSeleccionadoPOS.id,
                 monto: total,
-                descripcion: descripcion
+                descripcion: descripcion,
+                items: carritoPOS.map(item => ({ producto_id: item.id, cantidad: item.cantidad }))
             })
         });
         
@@ -2617,6 +2766,27 @@ function inicializarAdminBase() {
                 console.log('[Admin Base] Formulario de filtros de ventas inicializado');
             }
             
+            // Botón cargar más ventas (siguiente página)
+            const btnMasVentas = document.getElementById('btnMasVentas');
+            if (btnMasVentas) {
+                btnMasVentas.addEventListener('click', async function() {
+                    this.disabled = true;
+                    await cargarReporteVentas(this.dataset.beforeId);
+                    this.disabled = false;
+                });
+            }
+            
+            // Botón exportar ventas: todos los pagos del filtro, en streaming desde el servidor
+            const btnExportarVentasEl = document.getElementById('btnExportarVentas');
+            if (btnExportarVentasEl) {
+                btnExportarVentasEl.addEventListener('click', function() {
+                    const params = new URLSearchParams(filtrosReporteVentas);
+                    params.append('tipo', 'pago');
+                    params.append('formato', 'csv');
+                    window.location.href = `/api/reportes/transacciones?${params.toString()}`;
+                });
+            }
+            
             // Botón limpiar filtros ventas
             const btnLimpiarVentas = document.getElementById('btnLimpiarFiltrosVentas');
             if (btnLimpiarVentas) {
@@ -2653,6 +2823,26 @@ function inicializarAdminBase() {
                 console.log('[Admin Base] Formulario de filtros de transacciones inicializado');
             }
             
+            // Botón cargar más transacciones (siguiente página)
+            const btnMasTransacciones = document.getElementById('btnMasTransacciones');
+            if (btnMasTransacciones) {
+                btnMasTransacciones.addEventListener('click', async function() {
+                    this.disabled = true;
+                    await cargarReporteTransacciones(this.dataset.beforeId);
+                    this.disabled = false;
+                });
+            }
+            
+            // Botón exportar transacciones: el CSV completo se genera en streaming en el servidor
+            const btnExportarTransaccionesEl = document.getElementById('btnExportarTransacciones');
+            if (btnExportarTransaccionesEl) {
+                btnExportarTransaccionesEl.addEventListener('click', function() {
+                    const params = new URLSearchParams(filtrosReporteTransacciones);
+                    params.append('formato', 'csv');
+                    window.location.href = `/api/reportes/transacciones?${params.toString()}`;
+                });
+            }
+            
             // Botón limpiar filtros transacciones
             const btnLimpiarTransacciones = document.getElementById('btnLimpiarFiltrosTransacciones');
             if (btnLimpiarTransacciones) {
@@ -2671,6 +2861,8 @@ function inicializarAdminBase() {
                     if (tablaEl) tablaEl.style.display = 'none';
                     if (sinDatosEl) sinDatosEl.style.display = 'block';
                     if (btnExportarEl) btnExportarEl.style.display = 'none';
+                    const btnMasEl = document.getElementById('btnMasTransacciones');
+                    if (btnMasEl) btnMasEl.style.display = 'none';
                 });
                 console.log('[Admin Base] Botón limpiar filtros de transacciones inicializado');
             }
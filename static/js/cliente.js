@@ -127,7 +127,7 @@ document.getElementById('btnVerHistorial').addEventListener('click', async () =>
         return;
     }
     
-    const { response, data, error } = await hacerPeticionCliente(`/api/tarjetas/historial/${tarjetaActual.numero}`, {
+    const { response, data, error } = await hacerPeticionCliente(`/api/tarjetas/historial/${tarjetaActual.numero}?limit=${HISTORIAL_POR_PAGINA}&resumen=1`, {
         method: 'GET'
     });
     
@@ -166,7 +166,7 @@ document.getElementById('btnVerHistorial').addEventListener('click', async () =>
             </div>
             <div class="modal-info-item">
                 <strong>Total Transacciones</strong>
-                <span style="font-weight: bold;">${data.data.total_transacciones}</span>
+                <span style="font-weight: bold;">${data.data.resumen.total_transacciones}</span>
             </div>
         </div>
         <div class="modal-table-container">
@@ -182,28 +182,18 @@ document.getElementById('btnVerHistorial').addEventListener('click', async () =>
                         <th>Saldo Nuevo</th>
                     </tr>
                 </thead>
-                <tbody>
+                <tbody id="historialTbody">
     `;
     
     data.data.transacciones.forEach(trans => {
-        const tipoClass = trans.tipo === 'recarga' ? 'recarga' : 'pago';
-        const tipoIcon = trans.tipo === 'recarga' ? '➕' : '➖';
-        contenidoHTML += `
-            <tr>
-                <td>${trans.fecha || 'N/A'}</td>
-                <td><span class="tipo-badge ${tipoClass}">${tipoIcon} ${trans.tipo.toUpperCase()}</span></td>
-                <td><strong>${trans.monto_formateado}</strong></td>
-                <td>${trans.punto_venta}</td>
-                <td>${trans.descripcion || 'N/A'}</td>
-                <td>$${trans.saldo_anterior.toFixed(2)}</td>
-                <td><strong>$${trans.saldo_nuevo.toFixed(2)}</strong></td>
-            </tr>
-        `;
+        contenidoHTML += filaHistorial(trans);
     });
     
     contenidoHTML += '</tbody></table></div>';
+    contenidoHTML += botonMasHistorial(data.data.paginacion);
     
     modalBody.innerHTML = contenidoHTML;
+    activarMasHistorial(modalBody, data.data.numero_tarjeta, hacerPeticionCliente);
     modal.classList.add('show');
 });
 
@@ -342,6 +342,63 @@ if (formVerQR) {
 }
 
 // 7. Ver Historial de Transacciones (Modal)
+// El historial se pide por páginas; "Cargar más" trae las anteriores con before_id
+const HISTORIAL_POR_PAGINA = 50;
+
+function filaHistorial(trans) {
+    const tipoClass = trans.tipo === 'recarga' ? 'recarga' : 'pago';
+    const tipoIcon = trans.tipo === 'recarga' ? '➕' : '➖';
+    return `
+        <tr>
+            <td>${trans.fecha || 'N/A'}</td>
+            <td><span class="tipo-badge ${tipoClass}">${tipoIcon} ${trans.tipo.toUpperCase()}</span></td>
+            <td><strong>${trans.monto_formateado}</strong></td>
+            <td>${trans.punto_venta}</td>
+            <td>${trans.descripcion || 'N/A'}</td>
+            <td>$${trans.saldo_anterior.toFixed(2)}</td>
+            <td><strong>$${trans.saldo_nuevo.toFixed(2)}</strong></td>
+        </tr>
+    `;
+}
+
+function botonMasHistorial(paginacion) {
+    if (!paginacion.hay_mas) return '';
+    return `
+        <div style="text-align: center; margin-top: 15px;">
+            <button type="button" class="btn btn-secondary btn-historial-mas" data-before-id="${paginacion.siguiente_before_id}">Cargar más</button>
+        </div>
+    `;
+}
+
+function activarMasHistorial(contenedor, numeroTarjeta, peticion) {
+    const boton = contenedor.querySelector('.btn-historial-mas');
+    if (!boton) return;
+
+    boton.addEventListener('click', async () => {
+        boton.disabled = true;
+        const { data, error } = await peticion(
+            `/api/tarjetas/historial/${numeroTarjeta}?limit=${HISTORIAL_POR_PAGINA}&before_id=${boton.dataset.beforeId}`,
+            { method: 'GET' }
+        );
+
+        if (error || !data.success) {
+            boton.disabled = false;
+            showAlert('error', error ? `Error de conexión: ${error}` : data.error);
+            return;
+        }
+
+        contenedor.querySelector('#historialTbody').insertAdjacentHTML(
+            'beforeend', data.data.transacciones.map(filaHistorial).join('')
+        );
+        if (data.data.paginacion.hay_mas) {
+            boton.dataset.beforeId = data.data.paginacion.siguiente_before_id;
+            boton.disabled = false;
+        } else {
+            boton.parentElement.remove();
+        }
+    });
+}
+
 const formHistorial = document.getElementById('formHistorial');
 if (formHistorial) {
     formHistorial.addEventListener('submit', async (e) => {
@@ -349,7 +406,7 @@ if (formHistorial) {
     
     const numero_tarjeta = document.getElementById('numero_tarjeta_historial').value;
     
-    const { response, data, error } = await hacerPeticion(`/api/tarjetas/historial/${numero_tarjeta}`, {
+    const { response, data, error } = await hacerPeticion(`/api/tarjetas/historial/${numero_tarjeta}?limit=${HISTORIAL_POR_PAGINA}&resumen=1`, {
         method: 'GET'
     });
     
@@ -390,7 +447,7 @@ if (formHistorial) {
                 </div>
                 <div class="modal-info-item">
                     <strong>Total Transacciones</strong>
-                    <span style="font-weight: bold;">${data.data.total_transacciones}</span>
+                    <span style="font-weight: bold;">${data.data.resumen.total_transacciones}</span>
                 </div>
             </div>
             <div class="modal-table-container">
@@ -406,34 +463,24 @@ if (formHistorial) {
                             <th>Saldo Nuevo</th>
                         </tr>
                     </thead>
-                    <tbody>
+                    <tbody id="historialTbody">
         `;
         
         data.data.transacciones.forEach(trans => {
-            const tipoClass = trans.tipo === 'recarga' ? 'recarga' : 'pago';
-            const tipoIcon = trans.tipo === 'recarga' ? '➕' : '➖';
-            contenidoHTML += `
-                <tr>
-                    <td>${trans.fecha || 'N/A'}</td>
-                    <td><span class="tipo-badge ${tipoClass}">${tipoIcon} ${trans.tipo.toUpperCase()}</span></td>
-                    <td><strong>${trans.monto_formateado}</strong></td>
-                    <td>${trans.punto_venta}</td>
-                    <td>${trans.descripcion || 'N/A'}</td>
-                    <td>$${trans.saldo_anterior.toFixed(2)}</td>
-                    <td><strong>$${trans.saldo_nuevo.toFixed(2)}</strong></td>
-                </tr>
-            `;
+            contenidoHTML += filaHistorial(trans);
         });
         
         contenidoHTML += '</tbody></table></div>';
+        contenidoHTML += botonMasHistorial(data.data.paginacion);
         
         modalBody.innerHTML = contenidoHTML;
+        activarMasHistorial(modalBody, data.data.numero_tarjeta, hacerPeticion);
         modal.classList.add('show');
         
         // Limpiar formulario
         document.getElementById('formHistorial').reset();
         
-        showAlert('success', `Historial cargado: ${data.data.total_transacciones} transacción(es)`, 'Historial');
+        showAlert('success', `Historial cargado: ${data.data.resumen.total_transacciones} transacción(es)`, 'Historial');
     } else {
         showAlert('error', data.error);
     }
@@ -246,7 +246,8 @@ if (btnProcesarPagoAdmin) {
                 numero_tarjeta: tarjetaActualAdmin.numero,
                 punto_venta_id: punto_venta_id,
                 monto: total,
-                descripcion: descripcion
+                descripcion: descripcion,
+                items: carritoAdmin.map(item => ({ producto_id: item.id, cantidad: item.cantidad }))
             })
         });
         
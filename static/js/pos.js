@@ -26,8 +26,20 @@ if (typeof showAlert === 'undefined') {
     }
 }
 
+// Genera una clave de idempotencia para que un reintento no cobre dos veces
+if (typeof generarClaveIdempotencia === 'undefined') {
+    function generarClaveIdempotencia() {
+        if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+            return window.crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+}
+
 let tarjetaActual = null;
 let carrito = [];
+// Pago enviado sin respuesta del servidor: si se reintenta el mismo pago se reutiliza su clave
+let pagoPendiente = null;
 let productos = [];
 let tiposProductos = [];
 let tipoFiltroActual = '';
@@ -405,16 +417,30 @@ async function procesarPagoConfirmado() {
         const punto_venta_id = carrito[0].punto_venta_id || 1;
         const descripcion = carrito.map(item => `${item.nombre} x${item.cantidad}`).join(', ');
         
+        const cuerpo = JSON.stringify({
+            numero_tarjeta: tarjetaActual.numero,
+            punto_venta_id: punto_venta_id,
+            monto: total,
+            descripcion: descripcion,
+            items: carrito.map(item => ({ producto_id: item.id, cantidad: item.cantidad }))
+        });
+        if (!pagoPendiente || pagoPendiente.cuerpo !== cuerpo) {
+            pagoPendiente = { cuerpo, clave: generarClaveIdempotencia() };
+        }
+        
         const { response, data, error } = await hacerPeticion('/api/tarjetas/pagar', {
             method: 'POST',
             body: JSON.stringify({
-                numero_tarjeta: tarjetaActual.numero,
-                punto_venta_id: punto_venta_id,
-                monto: total,
-                descripcion: descripcion
+                ...JSON.parse(cuerpo),
+                idempotency_key: pagoPendiente.clave
             })
         });
         
+        // Con respuesta del servidor el pago quedó resuelto (exitoso o rechazado)
+        if (!error) {
+            pagoPendiente = null;
+        }
+        
         if (error || !data.success) {
             showAlert('error', data?.error || 'Error al procesar el pago');
             cerrarModalConfirmacion();
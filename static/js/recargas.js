@@ -26,6 +26,19 @@ if (typeof showAlert === 'undefined') {
     }
 }
 
+// Genera una clave de idempotencia para que un reintento no cobre dos veces
+if (typeof generarClaveIdempotencia === 'undefined') {
+    function generarClaveIdempotencia() {
+        if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+            return window.crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+}
+
+// Recarga enviada sin respuesta del servidor: si se reintenta la misma recarga se reutiliza su clave
+let recargaPendiente = null;
+
 // Recargar saldo
 document.getElementById('formRecargarRecargas').addEventListener('submit', async (e) => {
     e.preventDefault();
@@ -33,11 +46,21 @@ document.getElementById('formRecargarRecargas').addEventListener('submit', async
     const numero_tarjeta = document.getElementById('numero_tarjeta_recarga_estacion').value.trim().toUpperCase();
     const monto = parseFloat(document.getElementById('monto_recarga_estacion').value);
     
+    const cuerpo = JSON.stringify({ numero_tarjeta, monto });
+    if (!recargaPendiente || recargaPendiente.cuerpo !== cuerpo) {
+        recargaPendiente = { cuerpo, clave: generarClaveIdempotencia() };
+    }
+    
     const { response, data, error } = await hacerPeticion('/api/tarjetas/recargar', {
         method: 'POST',
-        body: JSON.stringify({ numero_tarjeta, monto })
+        body: JSON.stringify({ numero_tarjeta, monto, idempotency_key: recargaPendiente.clave })
     });
     
+    // Con respuesta del servidor la recarga quedó resuelta (exitosa o rechazada)
+    if (!error) {
+        recargaPendiente = null;
+    }
+    
     if (error) {
         showAlert('error', `Error de conexión: ${error}`);
         return;